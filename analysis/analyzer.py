@@ -3,15 +3,19 @@
 """
 import logging
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import numpy as np
 from database.db_manager import DatabaseManager
+from analysis.forecasting import LoadForecaster
+from analysis.tariffs import TariffCalculator, summarize_costs
 
 logger = logging.getLogger(__name__)
 
 class EnergyAnalyzer:
     def __init__(self, db_manager: DatabaseManager):
         self.db_manager = db_manager
+        self.forecaster = LoadForecaster(db_manager)
+        self.tariffs = TariffCalculator(db_manager)
     
     async def calculate_equipment_efficiency(self, equipment_id: int = None, 
                                            hours_back: int = 24) -> List[Dict[str, Any]]:
@@ -28,6 +32,9 @@ class EnergyAnalyzer:
             )
             
             efficiency_results = []
+            energy_cost_per_kwh = await self._get_energy_cost_per_kwh()
+            energy_prices = await self._get_energy_prices(start_time, end_time, 'equipment_id',
+                                                          equipment_id=equipment_id)
             
             for stat in statistics:
                 if not stat['total_measurements']:
@@ -54,9 +61,9 @@ class EnergyAnalyzer:
                 # Оценка эффективности
                 efficiency_data['efficiency_rating'] = self._rate_equipment_efficiency(efficiency_data)
                 
-                # Расчет стоимости энергопотребления
-                energy_cost_per_kwh = await self._get_energy_cost_per_kwh()
-                efficiency_data['energy_cost'] = efficiency_data['total_energy_kwh'] * energy_cost_per_kwh
+                # Расчет стоимости энергопотребления по зонам тарифа
+                price = energy_prices.get(stat['equipment_id'], energy_cost_per_kwh)
+                efficiency_data['energy_cost'] = efficiency_data['total_energy_kwh'] * price
                 
                 # Расчет удельного потребления (кВт·ч на час работы)
                 if hours_back > 0:
@@ -104,13 +111,23 @@ class EnergyAnalyzer:
             return 'poor'
     
     async def _get_energy_cost_per_kwh(self) -> float:
-        """Получение стоимости электроэнергии из настроек"""
+        """Получение стоимости электроэнергии из кэша системных настроек"""
+        return await self.db_manager.settings_cache.get('energy_cost_per_kwh', 4.5)
+    
+    async def _get_energy_prices(self, start_time: datetime, end_time: datetime, key: str,
+                                 equipment_id: int = None, area_id: int = None) -> Dict[Any, float]:
+        """Средняя цена кВт·ч по зонам тарифа за период для оборудования (key='equipment_id') или участков (только счетчики фильтра)"""
         try:
-            settings = await self.db_manager.get_system_settings('economics')
-            cost_setting = next((s for s in settings if s['setting_key'] == 'energy_cost_per_kwh'), None)
-            return float(cost_setting['setting_value']) if cost_setting else 4.5
-        except:
-            return 4.5  # Значение по умолчанию
+            costs = await self.tariffs.calculate(start_time, end_time, equipment_id=equipment_id, area_id=area_id)
+        except Exception as e:
+            logger.error(f"Ошибка расчета стоимости по тарифу: {e}")
+            return {}
+        
+        return {
+            group: totals['energy_cost'] / totals['energy_kwh']
+            for group, totals in summarize_costs(costs['meters'], key).items()
+            if totals['energy_kwh'] > 0
+        }
     
     async def analyze_area_consumption(self, area_id: int = None, 
                                      hours_back: int = 24) -> List[Dict[str, Any]]:
@@ -128,6 +145,8 @@ class EnergyAnalyzer:
                 area_stats = await self.db_manager.get_area_statistics(start_time, end_time)
             
             analysis_results = []
+            energy_cost_per_kwh = await self._get_energy_cost_per_kwh()
+            energy_prices = await self._get_energy_prices(start_time, end_time, 'area_id', area_id=area_id)
             
             for stat in area_stats:
                 if not stat['total_readings']:
@@ -156,8 +175,8 @@ class EnergyAnalyzer:
                 area_analysis['energy_efficiency_rating'] = self._rate_area_efficiency(area_analysis)
                 
                 # Расчет стоимости
-                energy_cost_per_kwh = await self._get_energy_cost_per_kwh()
-                area_analysis['energy_cost'] = area_analysis['total_energy_kwh'] * energy_cost_per_kwh
+                price = energy_prices.get(stat['area_id'], energy_cost_per_kwh)
+                area_analysis['energy_cost'] = area_analysis['total_energy_kwh'] * price
                 
                 analysis_results.append(area_analysis)
             
@@ -259,70 +278,29 @@ class EnergyAnalyzer:
     
     async def generate_energy_forecast(self, equipment_id: int = None, 
                                      forecast_hours: int = 24) -> Dict[str, Any]:
-        """Генерация прогноза энергопотребления"""
+        """Генерация почасового прогноза энергопотребления (см. analysis/forecasting.py)"""
         try:
-            # Получение исторических данных за последние 7 дней
-            end_time = datetime.now()
-            start_time = end_time - timedelta(days=7)
-            
-            historical_data = await self.db_manager.get_energy_readings_by_period(
-                start_time, end_time, equipment_id=equipment_id
-            )
-            
-            if not historical_data:
+            forecast = await self.forecaster.forecast(equipment_id, forecast_hours)
+            if forecast is None:
                 return {'error': 'Недостаточно исторических данных для прогноза'}
             
-            # Простой прогноз на основе средних значений по часам
-            hourly_averages = {}
-            for reading in historical_data:
-                hour = reading['energy_readings_timestamp'].hour
-                if hour not in hourly_averages:
-                    hourly_averages[hour] = []
-                hourly_averages[hour].append(reading['energy_readings_active_power_kw'])
-            
-            # Расчет средних значений по часам
-            hourly_forecast = {}
-            for hour, values in hourly_averages.items():
-                hourly_forecast[hour] = {
-                    'avg_power_kw': np.mean(values),
-                    'min_power_kw': np.min(values),
-                    'max_power_kw': np.max(values),
-                    'std_power_kw': np.std(values)
+            forecast_data = [
+                {
+                    'timestamp': timestamp,
+                    'predicted_power_kw': float(predicted),
+                    'confidence_interval_min': float(lower),
+                    'confidence_interval_max': float(upper)
                 }
+                for timestamp, predicted, lower, upper in zip(
+                    forecast['timestamps'], forecast['predicted_power_kw'], forecast['lower_kw'], forecast['upper_kw']
+                )
+            ]
             
-            # Генерация прогноза
-            forecast_data = []
-            current_time = datetime.now()
-            
-            for i in range(forecast_hours):
-                forecast_time = current_time + timedelta(hours=i)
-                hour = forecast_time.hour
-                
-                if hour in hourly_forecast:
-                    forecast_point = {
-                        'timestamp': forecast_time,
-                        'predicted_power_kw': hourly_forecast[hour]['avg_power_kw'],
-                        'confidence_interval_min': hourly_forecast[hour]['avg_power_kw'] - hourly_forecast[hour]['std_power_kw'],
-                        'confidence_interval_max': hourly_forecast[hour]['avg_power_kw'] + hourly_forecast[hour]['std_power_kw']
-                    }
-                else:
-                    # Если нет данных для этого часа, используем общее среднее
-                    all_values = [v for values in hourly_averages.values() for v in values]
-                    avg_power = np.mean(all_values) if all_values else 0
-                    
-                    forecast_point = {
-                        'timestamp': forecast_time,
-                        'predicted_power_kw': avg_power,
-                        'confidence_interval_min': avg_power * 0.8,
-                        'confidence_interval_max': avg_power * 1.2
-                    }
-                
-                forecast_data.append(forecast_point)
-            
-            # Расчет общих показателей прогноза
-            total_predicted_energy = sum(point['predicted_power_kw'] for point in forecast_data)
-            energy_cost_per_kwh = await self._get_energy_cost_per_kwh()
-            predicted_cost = total_predicted_energy * energy_cost_per_kwh
+            # Шаг прогноза - 1 час: энергия интервала равна средней мощности × 1 ч
+            total_predicted_energy = float(forecast['predicted_power_kw'].sum())
+            # Стоимость по цене зоны тарифа каждого часа прогноза
+            prices = await self.tariffs.price_profile(forecast['timestamps'])
+            predicted_cost = float(forecast['predicted_power_kw'] @ prices)
             
             return {
                 'equipment_id': equipment_id,
@@ -330,7 +308,8 @@ class EnergyAnalyzer:
                 'forecast_data': forecast_data,
                 'total_predicted_energy_kwh': total_predicted_energy,
                 'predicted_cost': predicted_cost,
-                'forecast_accuracy': 'medium',  # В реальной системе можно рассчитать на основе исторической точности
+                'forecast_accuracy': await self._get_forecast_accuracy(equipment_id, forecast_hours),
+                'model_fitted_at': forecast['fitted_at'],
                 'generated_at': datetime.now()
             }
             
@@ -338,63 +317,89 @@ class EnergyAnalyzer:
             logger.error(f"Ошибка генерации прогноза энергопотребления: {e}")
             return {'error': str(e)}
     
+    async def _get_forecast_accuracy(self, equipment_id: int, forecast_hours: int) -> Optional[Dict[str, Any]]:
+        """Точность прогноза по последней проверке на истории (analysis/backtesting.py)"""
+        try:
+            scores = await self.db_manager.get_forecast_accuracy(equipment_id, max_horizon=forecast_hours)
+        except Exception as e:
+            logger.error(f"Ошибка получения точности прогноза: {e}")
+            return None
+        
+        if not scores:
+            return None
+        
+        def number(value):
+            return float(value) if value is not None else None
+        
+        def mean(column):
+            values = [float(score[column]) for score in scores if score[column] is not None]
+            return sum(values) / len(values) if values else None
+        
+        return {
+            'mape_percent': mean('accuracy_mape'),
+            'rmse_kw': mean('accuracy_rmse'),
+            'bias_kw': mean('accuracy_bias'),
+            'by_horizon': [
+                {
+                    'horizon_hours': score['accuracy_horizon_hours'],
+                    'mape_percent': number(score['accuracy_mape']),
+                    'rmse_kw': number(score['accuracy_rmse']),
+                    'bias_kw': number(score['accuracy_bias'])
+                }
+                for score in scores
+            ],
+            'evaluated_at': scores[0]['accuracy_evaluated_at']
+        }
+    
     async def analyze_energy_trends(self, days_back: int = 30) -> Dict[str, Any]:
-        """Анализ трендов энергопотребления"""
+        """Анализ трендов энергопотребления по суточным агрегатам за завершенные сутки"""
         try:
-            end_time = datetime.now()
+            end_time = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
             start_time = end_time - timedelta(days=days_back)
             
-            # Получение данных по дням
-            daily_stats = []
-            current_date = start_time.date()
+            # Один запрос к суточным агрегатам по всем счетчикам вместо чтения сырых показаний
+            rows = await self.db_manager.get_energy_aggregates(
+                start_time, end_time, resolution_seconds=86400, group_by=None
+            )
             
-            while current_date <= end_time.date():
-                day_start = datetime.combine(current_date, datetime.min.time())
-                day_end = datetime.combine(current_date, datetime.max.time())
-                
-                day_data = await self.db_manager.get_energy_readings_by_period(day_start, day_end)
-                
-                if day_data:
-                    daily_power = [reading['energy_readings_active_power_kw'] for reading in day_data 
-                                 if reading['energy_readings_active_power_kw'] is not None]
-                    
-                    if daily_power:
-                        daily_stats.append({
-                            'date': current_date,
-                            'avg_power_kw': np.mean(daily_power),
-                            'max_power_kw': np.max(daily_power),
-                            'total_energy_kwh': sum(daily_power) / len(daily_power) * 24,  # Упрощенный расчет
-                            'readings_count': len(daily_power)
-                        })
-                
-                current_date += timedelta(days=1)
+            daily_stats = [
+                {
+                    'date': row['bucket_start'].date(),
+                    'avg_power_kw': float(row['avg_power_kw']),
+                    'max_power_kw': float(row['max_power_kw']),
+                    'total_energy_kwh': float(row['total_energy_kwh'] or 0),
+                    'readings_count': int(row['readings_count'])
+                }
+                for row in rows if row['readings_count'] and row['avg_power_kw'] is not None
+            ]
             
             if not daily_stats:
                 return {'error': 'Недостаточно данных для анализа трендов'}
             
             # Анализ трендов
-            avg_powers = [stat['avg_power_kw'] for stat in daily_stats]
-            total_energies = [stat['total_energy_kwh'] for stat in daily_stats]
+            avg_powers = np.array([stat['avg_power_kw'] for stat in daily_stats])
+            total_energies = np.array([stat['total_energy_kwh'] for stat in daily_stats])
             
-            # Расчет трендов (простая линейная регрессия)
-            days = list(range(len(avg_powers)))
-            power_trend = np.polyfit(days, avg_powers, 1)[0] if len(avg_powers) > 1 else 0
-            energy_trend = np.polyfit(days, total_energies, 1)[0] if len(total_energies) > 1 else 0
+            # Линейная регрессия мощности и энергии одним вызовом; ось X - номер суток (с учетом пропусков)
+            days = np.array([(stat['date'] - start_time.date()).days for stat in daily_stats], dtype=float)
+            power_trend, energy_trend = 0.0, 0.0
+            if len(daily_stats) > 1:
+                power_trend, energy_trend = np.polyfit(days, np.column_stack([avg_powers, total_energies]), 1)[0]
             
             return {
                 'analysis_period_days': days_back,
                 'daily_statistics': daily_stats,
                 'trends': {
-                    'power_trend_kw_per_day': power_trend,
-                    'energy_trend_kwh_per_day': energy_trend,
+                    'power_trend_kw_per_day': float(power_trend),
+                    'energy_trend_kwh_per_day': float(energy_trend),
                     'power_trend_direction': 'increasing' if power_trend > 0.1 else 'decreasing' if power_trend < -0.1 else 'stable',
                     'energy_trend_direction': 'increasing' if energy_trend > 1 else 'decreasing' if energy_trend < -1 else 'stable'
                 },
                 'summary': {
-                    'avg_daily_power_kw': np.mean(avg_powers),
-                    'avg_daily_energy_kwh': np.mean(total_energies),
-                    'max_daily_power_kw': np.max([stat['max_power_kw'] for stat in daily_stats]),
-                    'total_period_energy_kwh': sum(total_energies),
+                    'avg_daily_power_kw': float(avg_powers.mean()),
+                    'avg_daily_energy_kwh': float(total_energies.mean()),
+                    'max_daily_power_kw': max(stat['max_power_kw'] for stat in daily_stats),
+                    'total_period_energy_kwh': float(total_energies.sum()),
                     'data_coverage_percent': len(daily_stats) / days_back * 100
                 },
                 'generated_at': datetime.now()
@@ -0,0 +1,169 @@
+"""
+Проверка точности прогноза нагрузки на истории (скользящая точка прогноза)
+"""
+import asyncio
+import logging
+import warnings
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from database.db_manager import DatabaseManager
+from analysis.forecasting import FORECAST_MODELS, HOURS_PER_WEEK, hourly_matrix
+
+logger = logging.getLogger(__name__)
+
+# Часы с фактической мощностью ниже порога не учитываются в MAPE (деление на почти ноль)
+MAPE_MIN_ACTUAL_KW = 0.1
+
+
+def backtest_series(series: np.ndarray, model: str = 'seasonal', horizon: int = 24,
+                    history_hours: int = 28 * 24, step: int = 24, min_history: int = HOURS_PER_WEEK,
+                    **params):
+    """Прогнозы от скользящей точки по матрице (оборудование × часы, начало - понедельник 00:00).
+
+    От каждой точки (через step часов) модель строится по предшествующей истории
+    так же, как в LoadForecaster (начало истории выравнивается на понедельник),
+    и сразу для всего оборудования. Возвращает (predicted, actual) размером
+    (точки × оборудование × горизонт).
+    """
+    forecast = FORECAST_MODELS[model]
+    origins = range(min_history, series.shape[1] - horizon + 1, step)
+
+    predicted = np.full((len(origins), series.shape[0], horizon), np.nan)
+    actual = np.full_like(predicted, np.nan)
+    for position, origin in enumerate(origins):
+        history_start = max(0, origin - history_hours) // HOURS_PER_WEEK * HOURS_PER_WEEK
+        predicted[position] = forecast(series[:, history_start:origin], horizon, **params)
+        actual[position] = series[:, origin:origin + horizon]
+
+    return predicted, actual
+
+
+def plant_totals(predicted: np.ndarray, actual: np.ndarray):
+    """Суммы по цеху: для каждого часа складываются только оборудование с фактом и прогнозом"""
+    valid = ~np.isnan(predicted) & ~np.isnan(actual)
+    present = valid.any(axis=1)
+    total_predicted = np.where(present, np.where(valid, predicted, 0.0).sum(axis=1), np.nan)
+    total_actual = np.where(present, np.where(valid, actual, 0.0).sum(axis=1), np.nan)
+    return total_predicted[:, None, :], total_actual[:, None, :]
+
+
+def accuracy_metrics(predicted: np.ndarray, actual: np.ndarray) -> Dict[str, np.ndarray]:
+    """MAPE (%), RMSE и смещение (кВт) по рядам и горизонтам, усредненные по точкам прогноза.
+
+    Возвращает массивы размером (ряды × горизонт); NaN - нет ни одного сравнения.
+    """
+    valid = ~np.isnan(predicted) & ~np.isnan(actual)
+    error = np.where(valid, predicted - actual, np.nan)
+    relevant = valid & (np.abs(np.nan_to_num(actual)) >= MAPE_MIN_ACTUAL_KW)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        mape = 100 * np.nanmean(np.where(relevant, np.abs(error) / np.abs(np.where(relevant, actual, 1.0)), np.nan), axis=0)
+        rmse = np.sqrt(np.nanmean(error ** 2, axis=0))
+        bias = np.nanmean(error, axis=0)
+
+    return {
+        'mape': mape,
+        'rmse': rmse,
+        'bias': bias,
+        'samples': valid.sum(axis=0),
+    }
+
+
+class ForecastBacktester:
+    """Оценка точности моделей прогноза по часовым агрегатам и сохранение в forecast_accuracy.
+
+    История загружается одним запросом к часовым агрегатам на все оборудование;
+    оценки считаются по каждой единице оборудования и по цеху в целом
+    (equipment_id = NULL) для каждого часа горизонта.
+    """
+
+    def __init__(self, db_manager: DatabaseManager, days: int = None, horizon: int = 24):
+        self.db_manager = db_manager
+        self.days = days or getattr(db_manager.settings, 'FORECAST_BACKTEST_DAYS', 56)
+        self.horizon = horizon
+        self.running = False
+
+    async def run(self, models: List[str] = None, alpha: float = 0.3) -> Dict[str, Dict[str, Any]]:
+        """Проверка моделей на истории за последние days суток и сохранение оценок"""
+        end = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        start = end - timedelta(days=self.days)
+        start -= timedelta(days=start.weekday())
+
+        rows = await self.db_manager.get_energy_aggregates(start, end, resolution_seconds=3600,
+                                                           group_by='equipment')
+        equipment_ids, _, series = hourly_matrix(rows, start, end)
+        if not equipment_ids:
+            logger.warning("Нет часовых агрегатов для проверки прогноза")
+            return {}
+
+        results = {}
+        for model in models or list(FORECAST_MODELS):
+            params = {'alpha': alpha} if model == 'seasonal' else {}
+            predicted, actual = await asyncio.to_thread(backtest_series, series, model, self.horizon, **params)
+            if not len(predicted):
+                logger.warning(f"Недостаточно истории для проверки модели {model}")
+                continue
+
+            total_predicted, total_actual = plant_totals(predicted, actual)
+            metrics = accuracy_metrics(np.concatenate([predicted, total_predicted], axis=1),
+                                       np.concatenate([actual, total_actual], axis=1))
+
+            scores = self._scores(model, equipment_ids + [None], metrics, start, end)
+            await self.db_manager.save_forecast_accuracy(scores)
+
+            total = {name: values[-1] for name, values in metrics.items()}
+            results[model] = {
+                'origins': len(predicted),
+                'mape': float(np.nanmean(total['mape'])),
+                'rmse': float(np.nanmean(total['rmse'])),
+                'bias': float(np.nanmean(total['bias'])),
+            }
+            logger.info(f"Точность модели {model} по цеху: MAPE {results[model]['mape']:.1f}%, "
+                        f"RMSE {results[model]['rmse']:.2f} кВт ({len(predicted)} точек прогноза)")
+
+        return results
+
+    def _scores(self, model: str, equipment_ids: List[Optional[int]], metrics: Dict[str, np.ndarray],
+                start: datetime, end: datetime) -> List[Dict[str, Any]]:
+        """Строки forecast_accuracy для рядов с хотя бы одним сравнением"""
+        def value(array, position, horizon):
+            number = array[position, horizon]
+            return None if np.isnan(number) else float(number)
+
+        scores = []
+        for position, equipment_id in enumerate(equipment_ids):
+            for horizon in range(self.horizon):
+                samples = int(metrics['samples'][position, horizon])
+                if not samples:
+                    continue
+                scores.append({
+                    'model': model,
+                    'equipment_id': equipment_id,
+                    'horizon_hours': horizon + 1,
+                    'mape': value(metrics['mape'], position, horizon),
+                    'rmse': value(metrics['rmse'], position, horizon),
+                    'bias': value(metrics['bias'], position, horizon),
+                    'samples': samples,
+                    'period_start': start,
+                    'period_end': end,
+                })
+        return scores
+
+    async def run_forever(self, interval_hours: int = None):
+        """Периодическая проверка точности прогноза"""
+        interval_hours = interval_hours or getattr(self.db_manager.settings, 'FORECAST_BACKTEST_INTERVAL_HOURS', 24)
+        self.running = True
+
+        while self.running:
+            try:
+                await self.run()
+            except Exception as e:
+                logger.error(f"Ошибка проверки точности прогноза: {e}")
+            await asyncio.sleep(interval_hours * 3600)
+
+    def stop(self):
+        """Остановка периодической проверки"""
+        self.running = False
@@ -0,0 +1,223 @@
+"""
+Прогноз нагрузки по часовым агрегатам: недельный профиль (день недели × час) с экспоненциальным сглаживанием
+"""
+import asyncio
+import logging
+import warnings
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from database.db_manager import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+HOURS_PER_WEEK = 168
+
+# Границы поправки уровня по последним суткам относительно профиля
+LEVEL_RATIO_BOUNDS = (0.5, 2.0)
+
+# Разброс прогноза для ячеек профиля без истории (доля от прогноза)
+DEFAULT_RELATIVE_STD = 0.2
+
+
+def fit_seasonal_profile(series: np.ndarray, alpha: float):
+    """Недельный профиль рядов (оборудование × часы, начало - понедельник 00:00).
+
+    Для каждой из 168 ячеек (день недели × час) значения по неделям
+    экспоненциально сглаживаются, вместе с ними - дисперсия отклонений.
+    Пустые ячейки заполняются средним по часу суток, затем средним ряда.
+    Возвращает (profile, std) размером (оборудование × 168).
+    """
+    count = series.shape[0]
+    weeks = -(-series.shape[1] // HOURS_PER_WEEK)
+    padded = np.full((count, weeks * HOURS_PER_WEEK), np.nan)
+    padded[:, :series.shape[1]] = series
+    by_week = padded.reshape(count, weeks, HOURS_PER_WEEK)
+
+    level = np.full((count, HOURS_PER_WEEK), np.nan)
+    variance = np.full((count, HOURS_PER_WEEK), np.nan)
+    for week in range(weeks):
+        values = by_week[:, week, :]
+        present = ~np.isnan(values)
+        first = present & np.isnan(level)
+        update = present & ~first
+
+        deviation = np.where(update, values - level, 0.0)
+        level = np.where(first, values, level)
+        level = np.where(update, level + alpha * deviation, level)
+        variance = np.where(first, 0.0, variance)
+        variance = np.where(update, (1 - alpha) * (variance + alpha * deviation ** 2), variance)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        hour_of_day = np.nanmean(by_week.reshape(count, weeks * 7, 24), axis=1)
+        overall = np.nanmean(series, axis=1)
+
+    profile = np.where(np.isnan(level), np.tile(hour_of_day, 7), level)
+    profile = np.where(np.isnan(profile), overall[:, None], profile)
+
+    std = np.sqrt(variance)
+    std = np.where(np.isnan(std) | (std == 0), DEFAULT_RELATIVE_STD * np.abs(profile), std)
+    return profile, std
+
+
+def level_ratio(series: np.ndarray, profile: np.ndarray, start_slot: int, hours: int = 24) -> np.ndarray:
+    """Поправка уровня: отношение фактического потребления последних часов к профилю"""
+    recent = series[:, -hours:]
+    slots = (start_slot + np.arange(series.shape[1] - recent.shape[1], series.shape[1])) % HOURS_PER_WEEK
+    expected = np.where(np.isnan(recent), 0.0, profile[:, slots])
+    actual = np.nansum(recent, axis=1)
+    expected_sum = expected.sum(axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(expected_sum > 0, actual / expected_sum, 1.0)
+    ratio = np.where(np.isnan(recent).all(axis=1), 1.0, ratio)
+    return np.clip(ratio, *LEVEL_RATIO_BOUNDS)
+
+
+def hourly_matrix(rows: List[Dict[str, Any]], start: datetime, end: datetime):
+    """Часовые агрегаты по оборудованию в матрицу (оборудование × часы от start до end).
+
+    Возвращает (equipment_ids, names, series); часы без данных - NaN.
+    """
+    rows = [row for row in rows if start <= row['bucket_start'] < end and row['total_energy_kwh'] is not None]
+    equipment_ids = sorted({row['equipment_id'] for row in rows})
+    names = {row['equipment_id']: row['equipment_name'] for row in rows}
+    index = {equipment_id: position for position, equipment_id in enumerate(equipment_ids)}
+
+    series = np.full((len(equipment_ids), int((end - start).total_seconds() // 3600)), np.nan)
+    if rows:
+        rows_index = np.array([index[row['equipment_id']] for row in rows])
+        hours_index = np.array([int((row['bucket_start'] - start).total_seconds() // 3600) for row in rows])
+        # Энергия оборудования за час (сумма по его счетчикам, кВт·ч) численно равна средней мощности (кВт)
+        series[rows_index, hours_index] = [float(row['total_energy_kwh']) for row in rows]
+    return equipment_ids, names, series
+
+
+def seasonal_forecast(history: np.ndarray, horizon: int, alpha: float = 0.3) -> np.ndarray:
+    """Прогноз LoadForecaster на horizon часов после конца истории (история начинается с понедельника 00:00)"""
+    profile, _ = fit_seasonal_profile(history, alpha)
+    profile = profile * level_ratio(history, profile, start_slot=0)[:, None]
+    slots = (history.shape[1] + np.arange(horizon)) % HOURS_PER_WEEK
+    return profile[:, slots]
+
+
+def seasonal_naive_forecast(history: np.ndarray, horizon: int, **_) -> np.ndarray:
+    """Базовый прогноз: значение того же часа неделей раньше"""
+    slots = history.shape[1] - HOURS_PER_WEEK + np.arange(horizon) % HOURS_PER_WEEK
+    predicted = np.full((history.shape[0], horizon), np.nan)
+    valid = slots >= 0
+    predicted[:, valid] = history[:, slots[valid]]
+    return predicted
+
+
+# Модели прогноза по имени (для сравнения в analysis/backtesting.py)
+FORECAST_MODELS = {
+    'seasonal': seasonal_forecast,
+    'seasonal_naive': seasonal_naive_forecast,
+}
+
+
+class LoadForecaster:
+    """Прогноз почасового потребления всего оборудования одним векторным расчетом.
+
+    История берется из часовых агрегатов одним запросом на все оборудование.
+    Модель пересчитывается, только когда в агрегатах появился новый час (значит,
+    предыдущие часы завершены), до этого прогноз для любого оборудования
+    строится из сохраненных массивов. Прогноз начинается с текущего часа.
+    """
+
+    def __init__(self, db_manager: DatabaseManager, history_days: int = 28, alpha: float = 0.3):
+        self.db_manager = db_manager
+        self.history_days = history_days
+        self.alpha = alpha
+        self.model: Optional[Dict[str, Any]] = None
+        self.lock = asyncio.Lock()
+
+    async def get_model(self) -> Optional[Dict[str, Any]]:
+        """Модель по завершенным часам (пересчет при появлении в агрегатах нового часа)"""
+        fit_end = await self.db_manager.get_latest_rollup_hour()
+        if fit_end is None:
+            return None
+
+        async with self.lock:
+            if self.model is None or self.model['fit_end'] != fit_end:
+                self.model = await self._fit(fit_end)
+        return self.model
+
+    def _forecast_slots(self, model: Dict[str, Any], hours: int):
+        """Первый час прогноза (текущий) и ячейки недельного профиля горизонта"""
+        first_timestamp = datetime.now().replace(minute=0, second=0, microsecond=0)
+        first_hour = int((first_timestamp - model['start']).total_seconds() // 3600)
+        return first_timestamp, (first_hour + np.arange(hours)) % HOURS_PER_WEEK
+
+    async def _fit(self, fit_end: datetime) -> Optional[Dict[str, Any]]:
+        """Загрузка часовых агрегатов и расчет профилей"""
+        start = fit_end - timedelta(days=self.history_days)
+        start = start.replace(hour=0) - timedelta(days=start.weekday())
+
+        rows = await self.db_manager.get_energy_aggregates(start, fit_end, resolution_seconds=3600,
+                                                           group_by='equipment')
+        equipment_ids, names, series = hourly_matrix(rows, start, fit_end)
+        if not equipment_ids:
+            return None
+
+        profile, std = fit_seasonal_profile(series, self.alpha)
+        ratio = level_ratio(series, profile, start_slot=0)
+
+        index = {equipment_id: position for position, equipment_id in enumerate(equipment_ids)}
+        hours = series.shape[1]
+        logger.info(f"Модель прогноза пересчитана: {len(equipment_ids)} ед. оборудования, {hours} ч истории")
+        return {
+            'fit_end': fit_end,
+            'start': start,
+            'equipment_ids': equipment_ids,
+            'index': index,
+            'names': names,
+            'profile': profile * ratio[:, None],
+            'std': std,
+        }
+
+    async def forecast(self, equipment_id: int = None, hours: int = 24) -> Optional[Dict[str, Any]]:
+        """Почасовой прогноз оборудования или всего цеха (equipment_id=None) от текущего часа"""
+        model = await self.get_model()
+        if model is None or (equipment_id is not None and equipment_id not in model['index']):
+            return None
+
+        first_timestamp, slots = self._forecast_slots(model, hours)
+
+        if equipment_id is None:
+            predicted = model['profile'][:, slots].sum(axis=0)
+            # Отклонения оборудования считаются независимыми
+            std = np.sqrt((model['std'][:, slots] ** 2).sum(axis=0))
+        else:
+            position = model['index'][equipment_id]
+            predicted = model['profile'][position, slots]
+            std = model['std'][position, slots]
+
+        return {
+            'timestamps': [first_timestamp + timedelta(hours=int(hour)) for hour in range(hours)],
+            'predicted_power_kw': predicted,
+            'lower_kw': np.maximum(predicted - std, 0.0),
+            'upper_kw': predicted + std,
+            'fitted_at': model['fit_end'],
+        }
+
+    async def forecast_all(self, hours: int = 24) -> List[Dict[str, Any]]:
+        """Прогноз потребления за горизонт по каждой единице оборудования"""
+        model = await self.get_model()
+        if model is None:
+            return []
+
+        _, slots = self._forecast_slots(model, hours)
+        energies = model['profile'][:, slots].sum(axis=1)
+
+        return [
+            {
+                'equipment_id': equipment_id,
+                'equipment_name': model['names'].get(equipment_id),
+                'predicted_energy_kwh': float(energies[position]),
+            }
+            for equipment_id, position in model['index'].items()
+        ]
@@ -0,0 +1,263 @@
+"""
+Расчет стоимости электроэнергии по зонным тарифам (зоны суток, выходные, ставка за мощность)
+"""
+import logging
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+from database.db_manager import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+# Типы дней тарифного календаря (индекс - строка таблиц зон)
+DAY_TYPES = ('workday', 'weekend')
+WORKDAY, WEEKEND = 0, 1
+
+FLAT_ZONE = 'flat'
+
+
+class TariffSchedule:
+    """Тариф в виде таблиц (тип дня × час): индекс зоны и цена кВт·ч.
+
+    Тип дня определяется днем недели (суббота и воскресенье - выходные) с учетом
+    исключений календаря (праздники, рабочие дни переноса). Мощность для ставки
+    за мощность - среднее по рабочим дням месяца наибольшего часового потребления
+    цеха в часы зоны demand_zone (все часы, если зона не задана).
+    """
+
+    def __init__(self, name: str, zone_names: List[str], zone_table: np.ndarray, price_table: np.ndarray,
+                 demand_charge_per_kw: float = 0.0, demand_zone: Optional[str] = None,
+                 calendar_days: Dict[date, str] = None):
+        self.name = name
+        self.zone_names = zone_names
+        self.zone_table = zone_table
+        self.price_table = price_table
+        self.demand_charge_per_kw = demand_charge_per_kw
+        self.demand_zone = demand_zone
+        self.calendar_days = calendar_days or {}
+
+    @classmethod
+    def flat(cls, price_per_kwh: float) -> 'TariffSchedule':
+        """Одноставочный тариф без зон"""
+        return cls(FLAT_ZONE, [FLAT_ZONE], np.zeros((2, 24), dtype=np.int64),
+                   np.full((2, 24), float(price_per_kwh)))
+
+    @classmethod
+    def from_rows(cls, tariff: Dict[str, Any], calendar_rows: Iterable[Dict[str, Any]] = ()) -> 'TariffSchedule':
+        """Тариф из строк tariffs/tariff_zones/tariff_calendar (зоны - в tariff['zones'])"""
+        zone_names = sorted({zone['zone_name'] for zone in tariff['zones']})
+        zone_table = np.full((2, 24), -1, dtype=np.int64)
+        price_table = np.full((2, 24), np.nan)
+
+        for zone in tariff['zones']:
+            start, end = int(zone['zone_start_hour']), int(zone['zone_end_hour'])
+            # Зона через полночь (например, 23-7) задается концом меньше начала
+            hours = np.arange(start, end if end > start else end + 24) % 24
+            day_type = DAY_TYPES.index(zone['zone_day_type'])
+            zone_table[day_type, hours] = zone_names.index(zone['zone_name'])
+            price_table[day_type, hours] = float(zone['zone_price_per_kwh'])
+
+        missing = np.argwhere(zone_table < 0)
+        if len(missing):
+            gaps = ', '.join(f'{DAY_TYPES[day_type]} {hour}:00' for day_type, hour in missing[:5])
+            raise ValueError(f"Тариф {tariff['tariff_name']}: не заданы зоны для часов {gaps}")
+
+        return cls(
+            tariff['tariff_name'], zone_names, zone_table, price_table,
+            demand_charge_per_kw=float(tariff['tariff_demand_charge_per_kw'] or 0),
+            demand_zone=tariff['tariff_demand_zone'],
+            calendar_days={row['calendar_date']: row['calendar_day_type'] for row in calendar_rows}
+        )
+
+    def day_types(self, days: np.ndarray) -> np.ndarray:
+        """Тип дня (WORKDAY/WEEKEND) для массива дат datetime64[D]"""
+        # 1970-01-01 - четверг: день недели 0 - понедельник
+        weekday = (days.astype(np.int64) + 3) % 7
+        day_types = np.where(weekday >= 5, WEEKEND, WORKDAY)
+        for day, day_type in self.calendar_days.items():
+            day_types[days == np.datetime64(day, 'D')] = DAY_TYPES.index(day_type)
+        return day_types
+
+    def slots(self, hours: np.ndarray):
+        """Тип дня и час суток для массива часов datetime64[h]"""
+        days = hours.astype('datetime64[D]')
+        return self.day_types(days), (hours - days).astype(np.int64)
+
+    def zones_for(self, hours: np.ndarray) -> np.ndarray:
+        """Индекс зоны для каждого часа"""
+        day_types, hour_of_day = self.slots(hours)
+        return self.zone_table[day_types, hour_of_day]
+
+    def prices_for(self, hours: np.ndarray) -> np.ndarray:
+        """Цена кВт·ч для каждого часа"""
+        day_types, hour_of_day = self.slots(hours)
+        return self.price_table[day_types, hour_of_day]
+
+    def demand_mask(self, hours: np.ndarray) -> np.ndarray:
+        """Часы, по которым определяется мощность: рабочие дни в часы зоны demand_zone"""
+        day_types, hour_of_day = self.slots(hours)
+        mask = day_types == WORKDAY
+        if self.demand_zone is not None and self.demand_zone in self.zone_names:
+            mask &= self.zone_table[day_types, hour_of_day] == self.zone_names.index(self.demand_zone)
+        return mask
+
+
+def calculate_costs(schedule: TariffSchedule, first_day: np.datetime64, energy: np.ndarray) -> Dict[str, Any]:
+    """Стоимость по счетчикам за целые сутки одним векторным расчетом.
+
+    energy - почасовая энергия (счетчики × сутки*24, с полуночи first_day), NaN - нет данных.
+    Мощность определяется отдельно для каждого календарного месяца периода, ставка
+    за мощность месяца умножается на долю его суток в периоде. demand_kw - наибольшая
+    из месячных мощностей. Мощность распределяется по счетчикам по их потреблению
+    в часы максимума цеха (сумма мощностей счетчиков равна мощности цеха).
+    """
+    energy = np.nan_to_num(energy)
+    meters, hours_count = energy.shape
+    hours = np.datetime64(first_day, 'h') + np.arange(hours_count)
+
+    zones = schedule.zones_for(hours)
+    one_hot = zones[:, None] == np.arange(len(schedule.zone_names))
+    energy_by_zone = energy @ one_hot
+    energy_cost = energy @ schedule.prices_for(hours)
+
+    # Календарные месяцы периода и доля каждого из них (сутки в периоде / сутки в месяце)
+    day_months = hours[::24].astype('datetime64[M]')
+    months, month_index, month_days = np.unique(day_months, return_inverse=True, return_counts=True)
+    days_in_month = ((months + 1).astype('datetime64[D]') - months.astype('datetime64[D]')).astype(np.int64)
+    month_share = month_days / days_in_month
+
+    # Час наибольшего потребления цеха в каждые сутки среди часов определения мощности
+    by_day = energy.reshape(meters, hours_count // 24, 24)
+    mask = schedule.demand_mask(hours).reshape(-1, 24)
+    total = np.where(mask, by_day.sum(axis=0), -np.inf)
+    days = np.flatnonzero(mask.any(axis=1))
+    peak_hours = total[days].argmax(axis=1)
+
+    # Мощность месяца - среднее дневных максимумов его суток (0, если таких суток в периоде нет)
+    day_in_month = month_index[days][:, None] == np.arange(len(months))
+    demand_days = day_in_month.sum(axis=0)
+    monthly_kw = (by_day[:, days, peak_hours] @ day_in_month) / np.maximum(demand_days, 1)
+
+    demand_kw = monthly_kw.max(axis=1) if len(months) else np.zeros(meters)
+    demand_cost = monthly_kw @ month_share * schedule.demand_charge_per_kw
+
+    return {
+        'energy_kwh': energy.sum(axis=1),
+        'energy_by_zone': energy_by_zone,
+        'energy_cost': energy_cost,
+        'demand_kw': demand_kw,
+        'demand_cost': demand_cost,
+        'total_cost': energy_cost + demand_cost,
+    }
+
+
+class TariffCalculator:
+    """Стоимость потребления счетчиков по тарифу из БД.
+
+    Часовые агрегаты всех счетчиков за период загружаются одним запросом и
+    считаются одним вызовом calculate_costs. Если тариф не задан или задан
+    не полностью, используется одноставочная цена energy_cost_per_kwh.
+    """
+
+    def __init__(self, db_manager: DatabaseManager):
+        self.db_manager = db_manager
+
+    async def get_schedule(self, start: datetime, end: datetime) -> TariffSchedule:
+        """Тариф, действующий на начало периода, с исключениями календаря за период"""
+        try:
+            tariff = await self.db_manager.get_tariff(start.date())
+            if tariff is not None:
+                calendar_rows = await self.db_manager.get_tariff_calendar(start.date(), end.date())
+                return TariffSchedule.from_rows(tariff, calendar_rows)
+        except Exception as e:
+            logger.error(f"Ошибка загрузки тарифа, используется одноставочная цена: {e}")
+
+        return TariffSchedule.flat(await self.db_manager.settings_cache.get('energy_cost_per_kwh', 4.5))
+
+    async def calculate(self, start: datetime, end: datetime, equipment_id: int = None,
+                        area_id: int = None) -> Dict[str, Any]:
+        """Стоимость по каждому счетчику и по цеху за период (границы округляются до суток).
+
+        С фильтром по оборудованию или участку загружаются и считаются только их
+        счетчики; часы максимума для мощности определяются по их потреблению.
+        """
+        first_day = start.replace(hour=0, minute=0, second=0, microsecond=0)
+        end_day = end.replace(hour=0, minute=0, second=0, microsecond=0)
+        if end_day < end:
+            end_day += timedelta(days=1)
+
+        schedule = await self.get_schedule(first_day, end_day)
+        rows = await self.db_manager.get_energy_aggregates(first_day, end_day, resolution_seconds=3600,
+                                                           group_by='meter', equipment_id=equipment_id,
+                                                           area_id=area_id)
+        directory = await self.db_manager.get_meter_directory()
+
+        meter_ids = sorted({row['meter_id'] for row in rows})
+        index = {meter_id: position for position, meter_id in enumerate(meter_ids)}
+        energy = np.full((len(meter_ids), int((end_day - first_day).total_seconds() // 3600)), np.nan)
+        if rows:
+            energy[[index[row['meter_id']] for row in rows],
+                   [int((row['bucket_start'] - first_day).total_seconds() // 3600) for row in rows]] = [
+                float(row['total_energy_kwh'] or 0) for row in rows
+            ]
+
+        costs = calculate_costs(schedule, np.datetime64(first_day.date()), energy)
+
+        meters = []
+        for meter_id, position in index.items():
+            info = directory.get(meter_id, {})
+            meters.append({
+                'meter_id': meter_id,
+                'equipment_id': info.get('equipment_id'),
+                'equipment_name': info.get('equipment_name'),
+                'area_id': info.get('area_id'),
+                'area_name': info.get('area_name'),
+                'energy_kwh': float(costs['energy_kwh'][position]),
+                'energy_by_zone': dict(zip(schedule.zone_names, costs['energy_by_zone'][position].tolist())),
+                'energy_cost': float(costs['energy_cost'][position]),
+                'demand_kw': float(costs['demand_kw'][position]),
+                'demand_cost': float(costs['demand_cost'][position]),
+                'total_cost': float(costs['total_cost'][position]),
+            })
+
+        return {
+            'tariff_name': schedule.name,
+            'zones': schedule.zone_names,
+            'period_start': first_day,
+            'period_end': end_day,
+            'meters': meters,
+            'total': total_costs(meters, schedule.zone_names),
+        }
+
+    async def calculate_month(self, year: int, month: int) -> Dict[str, Any]:
+        """Стоимость за расчетный месяц"""
+        start = datetime(year, month, 1)
+        end = datetime(year + month // 12, month % 12 + 1, 1)
+        return await self.calculate(start, end)
+
+    async def price_profile(self, timestamps: List[datetime]) -> np.ndarray:
+        """Цена кВт·ч для каждого часа (например, для стоимости прогноза)"""
+        schedule = await self.get_schedule(min(timestamps), max(timestamps))
+        return schedule.prices_for(np.array(timestamps, dtype='datetime64[h]'))
+
+
+def total_costs(meters: List[Dict[str, Any]], zone_names: List[str]) -> Dict[str, Any]:
+    """Итог по счетчикам результата calculate (в т.ч. по отобранной части счетчиков)"""
+    total = {column: float(sum(meter[column] for meter in meters))
+             for column in ('energy_kwh', 'energy_cost', 'demand_kw', 'demand_cost', 'total_cost')}
+    total['energy_by_zone'] = {zone: float(sum(meter['energy_by_zone'][zone] for meter in meters))
+                               for zone in zone_names}
+    return total
+
+
+def summarize_costs(meters: List[Dict[str, Any]], key: str = 'equipment_id') -> Dict[Any, Dict[str, float]]:
+    """Сумма стоимости счетчиков по оборудованию или участку (key='area_id')"""
+    summary: Dict[Any, Dict[str, float]] = {}
+    for meter in meters:
+        totals = summary.setdefault(meter[key], {
+            'energy_kwh': 0.0, 'energy_cost': 0.0, 'demand_kw': 0.0, 'demand_cost': 0.0, 'total_cost': 0.0
+        })
+        for column in totals:
+            totals[column] += meter[column]
+    return summary
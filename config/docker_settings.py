@@ -20,12 +20,29 @@ class DatabaseConfig:
     database: str = os.getenv('DB_NAME', 'energy_monitoring')
     username: str = os.getenv('DB_USER', 'energy_user')
     password: str = os.getenv('DB_PASSWORD', 'energy_password_123')
+    local_infile: bool = os.getenv('DB_LOCAL_INFILE', 'true').lower() == 'true'
+    # Отдельные пулы: запись показаний, интерактивное чтение, аналитика и отчеты
+    write_pool_size: int = int(os.getenv('DB_WRITE_POOL_SIZE', '5'))
+    read_pool_size: int = int(os.getenv('DB_READ_POOL_SIZE', '10'))
+    analytics_pool_size: int = int(os.getenv('DB_ANALYTICS_POOL_SIZE', '3'))
+    # Реплика для пулов чтения и аналитики (пустой хост - только основной сервер)
+    replica_host: str = os.getenv('DB_REPLICA_HOST', '')
+    replica_port: int = int(os.getenv('DB_REPLICA_PORT', '3306'))
+    replica_max_lag_seconds: int = int(os.getenv('DB_REPLICA_MAX_LAG', '5'))
+    replica_check_interval_seconds: int = int(os.getenv('DB_REPLICA_CHECK_INTERVAL', '5'))
+    # Журнал медленных запросов и доля медленных SELECT, для которых снимается EXPLAIN ANALYZE
+    slow_query_seconds: float = float(os.getenv('DB_SLOW_QUERY_SECONDS', '1.0'))
+    explain_sample_rate: float = float(os.getenv('DB_EXPLAIN_SAMPLE_RATE', '0'))
 
 class DockerSettings:
     def __init__(self):
         # Интервал сбора данных (секунды)
         self.COLLECTION_INTERVAL = int(os.getenv('COLLECTION_INTERVAL', '5'))
         
+        # Контроль связи: период записи статуса и время без связи до перевода в offline (секунды)
+        self.COMMUNICATION_FLUSH_INTERVAL = int(os.getenv('COMMUNICATION_FLUSH_INTERVAL', '30'))
+        self.COMMUNICATION_OFFLINE_AFTER = int(os.getenv('COMMUNICATION_OFFLINE_AFTER', '300'))
+        
         # Конфигурация базы данных
         self.DATABASE = DatabaseConfig()
         
@@ -58,6 +75,42 @@ class DockerSettings:
             'discrete_inputs': 0x0200
         }
         
+        # Секционирование таблиц временных рядов ('month' или 'day')
+        self.PARTITION_GRANULARITY = os.getenv('PARTITION_GRANULARITY', 'month')
+        self.PARTITIONS_AHEAD = int(os.getenv('PARTITIONS_AHEAD', '3'))
+        self.MAINTENANCE_INTERVAL_HOURS = int(os.getenv('MAINTENANCE_INTERVAL_HOURS', '24'))
+        
+        # Фоновая очистка строк: размер пакета, период, допустимая задержка записи показаний (секунды)
+        self.PURGE_BATCH_SIZE = int(os.getenv('PURGE_BATCH_SIZE', '5000'))
+        self.PURGE_INTERVAL_HOURS = int(os.getenv('PURGE_INTERVAL_HOURS', '24'))
+        self.PURGE_MAX_INSERT_LATENCY = float(os.getenv('PURGE_MAX_INSERT_LATENCY', '0.5'))
+        
+        # Архив показаний в Parquet: каталог (пусто - архив отключен), возраст секций для переноса (дни),
+        # счетчиков в одной группе файлов, период запуска архивации
+        self.COLD_STORAGE_PATH = os.getenv('COLD_STORAGE_PATH', '')
+        self.COLD_STORAGE_AFTER_DAYS = int(os.getenv('COLD_STORAGE_AFTER_DAYS', '90'))
+        self.COLD_STORAGE_METER_GROUP_SIZE = int(os.getenv('COLD_STORAGE_METER_GROUP_SIZE', '50'))
+        self.COLD_STORAGE_INTERVAL_HOURS = int(os.getenv('COLD_STORAGE_INTERVAL_HOURS', '24'))
+        
+        # Резервное копирование: каталог, таблиц одновременно, период полной копии (дни), хранимых цепочек
+        self.BACKUP_DIR = os.getenv('BACKUP_DIR', '/app/backups')
+        self.BACKUP_PARALLEL = int(os.getenv('BACKUP_PARALLEL', '3'))
+        self.BACKUP_FULL_INTERVAL_DAYS = int(os.getenv('BACKUP_FULL_INTERVAL_DAYS', '7'))
+        self.BACKUP_KEEP_FULL = int(os.getenv('BACKUP_KEEP_FULL', '4'))
+        # Наибольшее ожидание транзакций, открытых при фиксации водяных знаков (секунды)
+        self.BACKUP_TRANSACTION_WAIT_SECONDS = int(os.getenv('BACKUP_TRANSACTION_WAIT_SECONDS', '300'))
+        
+        # Проверка точности прогноза на истории: глубина (дни) и период запуска
+        self.FORECAST_BACKTEST_DAYS = int(os.getenv('FORECAST_BACKTEST_DAYS', '56'))
+        self.FORECAST_BACKTEST_INTERVAL_HOURS = int(os.getenv('FORECAST_BACKTEST_INTERVAL_HOURS', '24'))
+        
+        # Кэш запросов чтения (секунды жизни записи, максимум записей)
+        self.QUERY_CACHE_TTL = float(os.getenv('QUERY_CACHE_TTL', '30'))
+        self.QUERY_CACHE_MAX_ENTRIES = int(os.getenv('QUERY_CACHE_MAX_ENTRIES', '256'))
+        
+        # Кэш системных настроек: как часто сверять версию настроек (секунды)
+        self.SETTINGS_CACHE_CHECK_SECONDS = float(os.getenv('SETTINGS_CACHE_CHECK_SECONDS', '5'))
+        
         # Настройки логирования
         self.LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
         self.LOG_FILE = os.getenv('LOG_FILE', '/app/logs/energy_monitoring.log')
@@ -20,12 +20,26 @@ class DatabaseConfig:
     database: str = 'energy_monitoring'
     username: str = 'root'
     password: str = 'root_password_123'
+    local_infile: bool = True  # Разрешает LOAD DATA LOCAL INFILE для массовой загрузки
+    write_pool_size: int = 5
+    read_pool_size: int = 10
+    analytics_pool_size: int = 3
+    replica_host: str = ''  # Реплика для чтения и аналитики (пусто - не используется)
+    replica_port: int = 3306
+    replica_max_lag_seconds: int = 5
+    replica_check_interval_seconds: int = 5
+    slow_query_seconds: float = 1.0
+    explain_sample_rate: float = 0.0  # Доля медленных SELECT с EXPLAIN ANALYZE (0 - отключено)
 
 class Settings:
     def __init__(self):
         # Интервал сбора данных (секунды)
         self.COLLECTION_INTERVAL = 5
         
+        # Контроль связи: период записи статуса и время без связи до перевода в offline (секунды)
+        self.COMMUNICATION_FLUSH_INTERVAL = 30
+        self.COMMUNICATION_OFFLINE_AFTER = 300
+        
         # Конфигурация базы данных
         self.DATABASE = DatabaseConfig()
         
@@ -0,0 +1,84 @@
+"""
+Контроль связи с оборудованием: время последней связи в памяти, пакетная запись в БД
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+from database.db_manager import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+class CommunicationWatchdog:
+    """Учет связи с оборудованием вместо обновления equipment на каждое показание.
+
+    Время последнего успешного опроса хранится в памяти и раз в flush_interval
+    секунд записывается одним UPDATE; оборудование без связи дольше
+    offline_after секунд переводится в статус 'offline'.
+    """
+
+    def __init__(self, db_manager: DatabaseManager, flush_interval: int = None, offline_after: int = None):
+        settings = db_manager.settings
+        self.db_manager = db_manager
+        self.flush_interval = flush_interval or getattr(settings, 'COMMUNICATION_FLUSH_INTERVAL', 30)
+        self.offline_after = offline_after or getattr(settings, 'COMMUNICATION_OFFLINE_AFTER', 300)
+        self.last_seen: Dict[int, datetime] = {}
+        self.pending: Dict[int, datetime] = {}
+        self.running = False
+
+    def record(self, equipment_id: int, timestamp: datetime = None):
+        """Отметка успешной связи с оборудованием"""
+        timestamp = timestamp or datetime.now()
+        if timestamp > self.last_seen.get(equipment_id, datetime.min):
+            self.last_seen[equipment_id] = timestamp
+            self.pending[equipment_id] = timestamp
+
+    def record_readings(self, readings: List[Dict[str, Any]]):
+        """Отметка связи по собранным показаниям (показания с ошибкой чтения не учитываются)"""
+        for reading in readings:
+            if reading.get('equipment_id') is not None and reading.get('data_quality') != 'bad':
+                self.record(reading['equipment_id'], reading.get('timestamp'))
+
+    async def flush(self) -> Dict[str, Any]:
+        """Запись накопленных отметок и перевод молчащего оборудования в 'offline'"""
+        result = {'updated': 0, 'offline': []}
+        pending, self.pending = self.pending, {}
+
+        try:
+            if pending:
+                result['updated'] = await self.db_manager.update_communication_status(pending)
+        except Exception as e:
+            # Отметки не теряются: вернутся в следующий пакет, если не появились более новые
+            for equipment_id, timestamp in pending.items():
+                if timestamp >= self.pending.get(equipment_id, datetime.min):
+                    self.pending[equipment_id] = timestamp
+            logger.error(f"Ошибка записи статуса связи оборудования: {e}")
+            return result
+
+        try:
+            silent_since = datetime.now() - timedelta(seconds=self.offline_after)
+            result['offline'] = await self.db_manager.mark_equipment_offline(silent_since)
+            for equipment_id in result['offline']:
+                logger.warning(f"Нет связи с оборудованием ID:{equipment_id} более {self.offline_after} с")
+                await self.db_manager.create_log({
+                    'equipment_id': equipment_id,
+                    'log_type': 'communication_error',
+                    'message': f'Нет связи с оборудованием более {self.offline_after} с',
+                    'severity': 'high'
+                })
+        except Exception as e:
+            logger.error(f"Ошибка перевода оборудования в статус offline: {e}")
+
+        return result
+
+    async def run_forever(self):
+        """Периодическая запись статуса связи"""
+        self.running = True
+
+        while self.running:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def stop(self):
+        """Остановка периодической записи"""
+        self.running = False
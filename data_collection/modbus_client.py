@@ -239,11 +239,6 @@ class ModbusDataCollector:
                     # Сохранение состояния оборудования
                     await self.db_manager.save_equipment_state(equipment_id, state_data)
             
-            # Обновление статуса связи
-            if all_data:
-                # Обновление будет выполнено триггером в БД
-                pass
-            
         except Exception as e:
             logger.error(f"Ошибка сбора данных с {equipment_name}: {e}")
             
@@ -258,8 +258,9 @@ class DataProcessor:
             return []
         
         # Обновление кэша порогов если необходимо
+        reload_seconds = await self.db_manager.settings_cache.get('threshold_reload_seconds', 300)
         if (not self.last_threshold_update or 
-            (datetime.now() - self.last_threshold_update).seconds > 300):  # 5 минут
+            (datetime.now() - self.last_threshold_update).total_seconds() > reload_seconds):
             await self.load_thresholds()
         
         processed_readings = []
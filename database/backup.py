@@ -0,0 +1,450 @@
+"""
+Инкрементное резервное копирование со сжатием zstd и быстрое восстановление через LOAD DATA
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+import aiomysql
+from database.db_manager import DatabaseManager
+from database.load_data import format_value
+
+logger = logging.getLogger(__name__)
+
+# Таблицы, копируемые от водяного знака предыдущей копии: ключ, его вид ('id' - AUTO_INCREMENT,
+# 'time' - время изменения) и столбец времени строки. Показания и состояния не меняются после
+# вставки, у логов меняется статус - поэтому они копируются по log_updated_at.
+INCREMENTAL_TABLES = {
+    'energy_readings': {'key': 'energy_readings_id', 'kind': 'id', 'time': 'energy_readings_timestamp'},
+    'equipment_states': {'key': 'state_id', 'kind': 'id', 'time': 'state_timestamp'},
+    'logs': {'key': 'log_updated_at', 'kind': 'time', 'time': 'log_timestamp'},
+}
+
+# Производные таблицы не копируются: после восстановления их заполняют пересчет агрегатов и триггеры
+DERIVED_TABLES = {
+    'energy_rollup_1m', 'energy_rollup_1h', 'energy_rollup_1d', 'meter_latest',
+    'active_alerts', 'alert_changes', 'alert_sequence', 'purge_progress',
+}
+
+MANIFEST = 'manifest.json'
+
+# Изменения последних секунд относятся к следующей копии: транзакции с более ранним временем
+# изменения к этому моменту уже зафиксированы
+TIME_WATERMARK_MARGIN = timedelta(seconds=5)
+
+# Изменяющие транзакции других соединений (autocommit-чтения не выделяют ключи AUTO_INCREMENT)
+OPEN_TRANSACTIONS_SQL = '''
+    SELECT trx_id FROM information_schema.INNODB_TRX
+    WHERE trx_mysql_thread_id <> CONNECTION_ID() AND trx_autocommit_non_locking = 0
+'''
+
+
+class BackupManager:
+    """Резервные копии в каталоге BACKUP_DIR: <backup_id>/manifest.json и файлы <таблица>.NNNNN.tsv.zst.
+
+    Справочные таблицы копируются целиком, таблицы INCREMENTAL_TABLES - только
+    строки после водяного знака предыдущей копии. Полная копия и следующие за ней
+    инкрементные образуют цепочку; новая цепочка начинается раз в
+    BACKUP_FULL_INTERVAL_DAYS дней. Таблицы выгружаются параллельно серверными
+    курсорами основного сервера через пул аналитики, сжатие выполняется в потоках.
+    """
+
+    def __init__(self, db_manager: DatabaseManager, backup_dir: str = None, parallel: int = None,
+                 chunk_rows: int = 500000, compression_level: int = 3):
+        settings = db_manager.settings
+        self.db_manager = db_manager
+        self.backup_dir = backup_dir or getattr(settings, 'BACKUP_DIR', './backups')
+        self.parallel = parallel or getattr(settings, 'BACKUP_PARALLEL', 3)
+        self.full_interval_days = getattr(settings, 'BACKUP_FULL_INTERVAL_DAYS', 7)
+        self.transaction_wait_seconds = getattr(settings, 'BACKUP_TRANSACTION_WAIT_SECONDS', 300)
+        self.chunk_rows = chunk_rows
+        self.compression_level = compression_level
+
+    def list_backups(self) -> List[Dict[str, Any]]:
+        """Манифесты завершенных копий от старых к новым"""
+        if not os.path.isdir(self.backup_dir):
+            return []
+
+        manifests = []
+        for name in sorted(os.listdir(self.backup_dir)):
+            path = os.path.join(self.backup_dir, name, MANIFEST)
+            if os.path.isfile(path):
+                with open(path, encoding='utf-8') as manifest_file:
+                    manifests.append(json.load(manifest_file))
+        return manifests
+
+    def _needs_full(self, previous: Optional[Dict[str, Any]]) -> bool:
+        """Пора ли начинать новую цепочку"""
+        if previous is None:
+            return True
+        full_created = datetime.fromisoformat(previous['full_created_at'])
+        return datetime.now() - full_created >= timedelta(days=self.full_interval_days)
+
+    async def create(self, full: bool = False) -> Dict[str, Any]:
+        """Создание копии: полной или от водяных знаков последней копии"""
+        started = time.monotonic()
+        backups = self.list_backups()
+        previous = backups[-1] if backups else None
+        if full or self._needs_full(previous):
+            previous = None
+
+        created_at = datetime.now()
+        backup_id = created_at.strftime('%Y%m%d_%H%M%S')
+        directory = os.path.join(self.backup_dir, backup_id)
+        staging = directory + '.partial'
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+
+        manifest = {
+            'backup_id': backup_id,
+            'type': 'incremental' if previous else 'full',
+            'created_at': created_at.isoformat(),
+            'base_backup_id': previous['backup_id'] if previous else None,
+            'full_created_at': previous['full_created_at'] if previous else created_at.isoformat(),
+            'tables': {},
+        }
+
+        try:
+            pool = self._pool()
+            async with pool.acquire() as conn:
+                async with conn.cursor() as cursor:
+                    tables = await self._base_tables(cursor)
+                    # Водяные знаки фиксируются до выгрузки: все таблицы копируются на один момент
+                    watermarks = {table: await self._current_watermark(cursor, table)
+                                  for table in INCREMENTAL_TABLES if table in tables}
+                    if any(INCREMENTAL_TABLES[table]['kind'] == 'id' for table in watermarks):
+                        await self._wait_for_open_transactions(cursor)
+
+            semaphore = asyncio.Semaphore(self.parallel)
+
+            async def export(table: str):
+                async with semaphore:
+                    manifest['tables'][table] = await self._export_table(table, staging, previous, watermarks)
+
+            await asyncio.gather(*(export(table) for table in tables))
+
+            manifest['seconds'] = round(time.monotonic() - started, 3)
+            with open(os.path.join(staging, MANIFEST), 'w', encoding='utf-8') as manifest_file:
+                json.dump(manifest, manifest_file, ensure_ascii=False, indent=2)
+            os.rename(staging, directory)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        rows = sum(entry['rows'] for entry in manifest['tables'].values())
+        logger.info(f"Создана {manifest['type']} копия {backup_id}: {rows} строк за {manifest['seconds']} с")
+        return manifest
+
+    def _pool(self):
+        """Пул аналитики основного сервера: на реплике водяные знаки могут отставать от данных"""
+        return self.db_manager.pools['analytics']
+
+    async def _base_tables(self, cursor: aiomysql.Cursor) -> List[str]:
+        """Копируемые таблицы базы"""
+        await cursor.execute('''
+            SELECT TABLE_NAME FROM information_schema.TABLES
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_TYPE = 'BASE TABLE'
+            ORDER BY TABLE_NAME
+        ''')
+        return [row[0] for row in await cursor.fetchall() if row[0] not in DERIVED_TABLES]
+
+    async def _table_columns(self, cursor: aiomysql.Cursor, table: str) -> List[str]:
+        """Хранимые столбцы таблицы (генерируемые восстанавливаются сервером)"""
+        await cursor.execute('''
+            SELECT COLUMN_NAME FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND EXTRA NOT LIKE %s
+            ORDER BY ORDINAL_POSITION
+        ''', (table, '%GENERATED%'))
+        return [row[0] for row in await cursor.fetchall()]
+
+    async def _current_watermark(self, cursor: aiomysql.Cursor, table: str) -> Any:
+        """Верхняя граница ключа для текущей копии"""
+        config = INCREMENTAL_TABLES[table]
+        if config['kind'] == 'id':
+            await cursor.execute(f"SELECT COALESCE(MAX({config['key']}), 0) FROM {table}")
+            (watermark,) = await cursor.fetchone()
+            return int(watermark)
+
+        await cursor.execute('SELECT NOW(3)')
+        (now,) = await cursor.fetchone()
+        return (now - TIME_WATERMARK_MARGIN).isoformat(sep=' ')
+
+    async def _wait_for_open_transactions(self, cursor: aiomysql.Cursor):
+        """Ожидание завершения транзакций, открытых при фиксации водяных знаков.
+
+        Ключ AUTO_INCREMENT выделяется при вставке, а строка видна после фиксации:
+        транзакция могла получить ключ ниже водяного знака и зафиксироваться позже,
+        и следующая копия (ключ > since) ее бы пропустила. Все ключи до водяного
+        знака выделены уже открытыми транзакциями, после их завершения такие строки
+        зафиксированы или отменены. Требуется привилегия PROCESS.
+        """
+        await cursor.execute(OPEN_TRANSACTIONS_SQL)
+        pending = {row[0] for row in await cursor.fetchall()}
+        deadline = time.monotonic() + self.transaction_wait_seconds
+
+        while pending:
+            if time.monotonic() >= deadline:
+                raise RuntimeError(
+                    f"За {self.transaction_wait_seconds} с не завершились транзакции "
+                    f"{', '.join(str(trx_id) for trx_id in sorted(pending))}, копия не создана"
+                )
+            await asyncio.sleep(1)
+            await cursor.execute(OPEN_TRANSACTIONS_SQL)
+            pending &= {row[0] for row in await cursor.fetchall()}
+
+    async def _export_table(self, table: str, directory: str, previous: Optional[Dict[str, Any]],
+                            watermarks: Dict[str, Any]) -> Dict[str, Any]:
+        """Выгрузка таблицы частями по chunk_rows строк"""
+        import zstandard
+
+        config = INCREMENTAL_TABLES.get(table)
+        entry: Dict[str, Any] = {'mode': 'full', 'rows': 0, 'files': []}
+        conditions, params = [], []
+
+        if config is not None:
+            since = previous['tables'].get(table, {}).get('until') if previous else None
+            entry.update(mode='incremental', key=config['key'], since=since, until=watermarks[table],
+                         first_time=None, last_time=None)
+            if since is not None:
+                conditions.append(f"{config['key']} > %s")
+                params.append(since)
+            conditions.append(f"{config['key']} <= %s")
+            params.append(watermarks[table])
+
+        compressor = zstandard.ZstdCompressor(level=self.compression_level)
+        pool = self._pool()
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                columns = await self._table_columns(cursor, table)
+            entry['columns'] = columns
+            time_index = columns.index(config['time']) if config else None
+
+            sql = f"SELECT {', '.join(f'`{column}`' for column in columns)} FROM {table}"
+            if conditions:
+                sql += f" WHERE {' AND '.join(conditions)}"
+
+            async with conn.cursor(aiomysql.SSCursor) as cursor:
+                await cursor.execute(sql, params)
+                while True:
+                    rows = await cursor.fetchmany(self.chunk_rows)
+                    if not rows:
+                        break
+
+                    name = f"{table}.{len(entry['files']):05d}.tsv.zst"
+                    size = await asyncio.to_thread(self._write_part, os.path.join(directory, name), rows, compressor)
+                    entry['files'].append({'name': name, 'rows': len(rows), 'bytes': size})
+                    entry['rows'] += len(rows)
+
+                    if time_index is not None:
+                        times = [row[time_index] for row in rows]
+                        first, last = min(times).isoformat(sep=' '), max(times).isoformat(sep=' ')
+                        if entry['first_time'] is None or first < entry['first_time']:
+                            entry['first_time'] = first
+                        if entry['last_time'] is None or last > entry['last_time']:
+                            entry['last_time'] = last
+
+        return entry
+
+    @staticmethod
+    def _write_part(path: str, rows: Sequence[tuple], compressor) -> int:
+        """Форматирование и сжатие части таблицы (выполняется в потоке)"""
+        data = ''.join('\t'.join(format_value(value) for value in row) + '\n' for row in rows)
+        compressed = compressor.compress(data.encode('utf-8'))
+        with open(path, 'wb') as part_file:
+            part_file.write(compressed)
+        return len(compressed)
+
+    def _chain(self, backup_id: str) -> List[Dict[str, Any]]:
+        """Цепочка копий от полной до указанной"""
+        manifests = {manifest['backup_id']: manifest for manifest in self.list_backups()}
+        if backup_id not in manifests:
+            raise ValueError(f"Резервная копия {backup_id} не найдена в {self.backup_dir}")
+
+        chain = [manifests[backup_id]]
+        while chain[-1]['base_backup_id'] is not None:
+            base_id = chain[-1]['base_backup_id']
+            if base_id not in manifests:
+                raise ValueError(f"Не найдена базовая копия {base_id} для {chain[-1]['backup_id']}")
+            chain.append(manifests[base_id])
+        return list(reversed(chain))
+
+    async def restore(self, backup_id: str = None) -> Dict[str, int]:
+        """Восстановление состояния на момент копии (по умолчанию последней).
+
+        Справочные таблицы заменяются данными указанной копии, строки
+        инкрементных таблиц загружаются из всех копий цепочки по порядку с
+        заменой по первичному ключу. Агрегаты и последние показания
+        пересчитываются за восстановленный период.
+        """
+        started = time.monotonic()
+        if backup_id is None:
+            backups = self.list_backups()
+            if not backups:
+                raise ValueError(f"В {self.backup_dir} нет резервных копий")
+            backup_id = backups[-1]['backup_id']
+        chain = self._chain(backup_id)
+        target = chain[-1]
+
+        result = {}
+        async with self.db_manager.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await self._begin_load(cursor)
+                try:
+                    for table, entry in target['tables'].items():
+                        if entry['mode'] != 'full':
+                            continue
+                        await cursor.execute(f'DELETE FROM {table}')
+                        result[table] = await self._load_entry(cursor, table, target['backup_id'], entry)
+                finally:
+                    await self._end_load(cursor)
+
+        semaphore = asyncio.Semaphore(self.parallel)
+
+        async def load(table: str):
+            async with semaphore:
+                async with self.db_manager.pool.acquire() as conn:
+                    async with conn.cursor() as cursor:
+                        await self._begin_load(cursor)
+                        try:
+                            result[table] = 0
+                            for manifest in chain:
+                                entry = manifest['tables'].get(table)
+                                if entry is not None:
+                                    result[table] += await self._load_entry(cursor, table, manifest['backup_id'], entry)
+                        finally:
+                            await self._end_load(cursor)
+
+        await asyncio.gather(*(load(table) for table in INCREMENTAL_TABLES if table in target['tables']))
+
+        times = [
+            (entry['first_time'], entry['last_time'])
+            for manifest in chain
+            for entry in [manifest['tables'].get('energy_readings')]
+            if entry is not None and entry['first_time'] is not None
+        ]
+        if times:
+            first_time = datetime.fromisoformat(min(first for first, _ in times))
+            last_time = datetime.fromisoformat(max(last for _, last in times))
+            await self.db_manager.rebuild_rollups(first_time, last_time)
+            await self.db_manager.refresh_meter_latest(first_time, last_time)
+
+        logger.info(
+            f"Восстановлена копия {backup_id} (цепочка из {len(chain)}): "
+            f"{sum(result.values())} строк за {round(time.monotonic() - started, 3)} с"
+        )
+        return result
+
+    @staticmethod
+    async def _begin_load(cursor: aiomysql.Cursor):
+        """Настройки сессии на время загрузки: без проверок ключей и триггеров показаний"""
+        await cursor.execute('SET @disable_energy_triggers = 1, unique_checks = 0, foreign_key_checks = 0')
+
+    @staticmethod
+    async def _end_load(cursor: aiomysql.Cursor):
+        """Возврат настроек сессии"""
+        await cursor.execute('SET @disable_energy_triggers = NULL, unique_checks = 1, foreign_key_checks = 1')
+
+    async def _load_entry(self, cursor: aiomysql.Cursor, table: str, backup_id: str, entry: Dict[str, Any]) -> int:
+        """Загрузка файлов таблицы из одной копии"""
+        import zstandard
+
+        decompressor = zstandard.ZstdDecompressor()
+        columns = ', '.join(f'`{column}`' for column in entry['columns'])
+        loaded = 0
+
+        for part in entry['files']:
+            source = os.path.join(self.backup_dir, backup_id, part['name'])
+            fd, path = tempfile.mkstemp(prefix=f'{table}_', suffix='.tsv')
+            os.close(fd)
+            try:
+                await asyncio.to_thread(self._decompress, decompressor, source, path)
+                await cursor.execute(f'''
+                    LOAD DATA LOCAL INFILE %s
+                    REPLACE INTO TABLE {table}
+                    CHARACTER SET utf8mb4
+                    FIELDS TERMINATED BY '\\t'
+                    LINES TERMINATED BY '\\n'
+                    ({columns})
+                ''', (path,))
+                loaded += part['rows']
+            finally:
+                os.unlink(path)
+
+        return loaded
+
+    @staticmethod
+    def _decompress(decompressor, source: str, path: str):
+        """Распаковка части во временный файл (выполняется в потоке)"""
+        with open(source, 'rb') as compressed, open(path, 'wb') as plain:
+            decompressor.copy_stream(compressed, plain)
+
+    def prune(self, keep_full: int = None) -> List[str]:
+        """Удаление цепочек копий, кроме keep_full последних"""
+        keep_full = keep_full or getattr(self.db_manager.settings, 'BACKUP_KEEP_FULL', 4)
+        backups = self.list_backups()
+        chains = sorted({manifest['full_created_at'] for manifest in backups})
+        expired_chains = set(chains[:-keep_full]) if len(chains) > keep_full else set()
+
+        removed = []
+        for manifest in backups:
+            if manifest['full_created_at'] in expired_chains:
+                shutil.rmtree(os.path.join(self.backup_dir, manifest['backup_id']))
+                removed.append(manifest['backup_id'])
+
+        if removed:
+            logger.info(f"Удалены старые резервные копии: {', '.join(removed)}")
+        return removed
+
+
+async def main(argv: Optional[List[str]] = None):
+    """Резервное копирование и восстановление из командной строки"""
+    parser = argparse.ArgumentParser(description='Резервное копирование базы мониторинга энергопотребления')
+    parser.add_argument('--backup-dir', help='Каталог резервных копий (по умолчанию BACKUP_DIR)')
+    parser.add_argument('--parallel', type=int, help='Таблиц, выгружаемых одновременно')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    create_parser = commands.add_parser('create', help='Создать копию (инкрементную, если цепочка не устарела)')
+    create_parser.add_argument('--full', action='store_true', help='Начать новую цепочку с полной копии')
+    commands.add_parser('list', help='Список копий')
+    restore_parser = commands.add_parser('restore', help='Восстановить базу из копии')
+    restore_parser.add_argument('backup_id', nargs='?', help='Идентификатор копии (по умолчанию последняя)')
+    prune_parser = commands.add_parser('prune', help='Удалить старые цепочки копий')
+    prune_parser.add_argument('--keep-full', type=int, help='Сколько последних цепочек оставить')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    db_manager = DatabaseManager()
+    manager = BackupManager(db_manager, backup_dir=args.backup_dir, parallel=args.parallel)
+
+    if args.command == 'list':
+        for manifest in manager.list_backups():
+            rows = sum(entry['rows'] for entry in manifest['tables'].values())
+            print(f"{manifest['backup_id']}  {manifest['type']:<11}  {rows:>12} строк")
+        return
+    if args.command == 'prune':
+        manager.prune(args.keep_full)
+        return
+
+    await db_manager.initialize()
+    try:
+        if args.command == 'create':
+            manifest = await manager.create(full=args.full)
+            rows = sum(entry['rows'] for entry in manifest['tables'].values())
+            print(f"Создана копия {manifest['backup_id']} ({manifest['type']}): {rows} строк за {manifest['seconds']} с")
+        else:
+            result = await manager.restore(args.backup_id)
+            print(f"Восстановлено {sum(result.values())} строк")
+    finally:
+        await db_manager.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,287 @@
+"""
+Массовая загрузка показаний энергопотребления (исторические данные, импорт)
+"""
+import argparse
+import asyncio
+import csv
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, AsyncIterable, Dict, Iterable, List, Optional, Tuple, Union
+
+import aiomysql
+from database.db_manager import DatabaseManager
+from database.compact_readings import COMPACT_MARKER_COLUMN, quality_flags_sql
+from database.load_data import NULL_VALUE, format_value
+
+logger = logging.getLogger(__name__)
+
+# Соответствие ключей записи (как в save_energy_readings) столбцам energy_readings
+READING_COLUMNS = [
+    ('meter_id', 'energy_readings_meter_id'),
+    ('timestamp', 'energy_readings_timestamp'),
+    ('active_power', 'energy_readings_active_power_kw'),
+    ('reactive_power', 'energy_readings_reactive_power_kvar'),
+    ('apparent_power', 'energy_readings_apparent_power_kva'),
+    ('power_factor', 'energy_readings_power_factor'),
+    ('voltage_l1', 'energy_readings_voltage_l1'),
+    ('voltage_l2', 'energy_readings_voltage_l2'),
+    ('voltage_l3', 'energy_readings_voltage_l3'),
+    ('current_l1', 'energy_readings_current_l1'),
+    ('current_l2', 'energy_readings_current_l2'),
+    ('current_l3', 'energy_readings_current_l3'),
+    ('frequency', 'energy_readings_frequency'),
+    ('data_quality', 'data_quality'),
+]
+
+Records = Union[Iterable[Dict[str, Any]], AsyncIterable[Dict[str, Any]]]
+
+
+def parse_timestamp(value: Any) -> Optional[datetime]:
+    """Время записи из datetime или строки ISO ('T' или пробел, с долями секунды или без)"""
+    if isinstance(value, datetime):
+        return value
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).strip())
+    except ValueError:
+        return None
+
+
+class BulkLoader:
+    """Загрузка больших объемов показаний через LOAD DATA LOCAL INFILE.
+
+    Записи пишутся порциями во временный TSV-файл и загружаются одной командой
+    на порцию. На время загрузки отключаются триггеры energy_readings
+    (переменная сессии @disable_energy_triggers), проверки уникальности и
+    внешних ключей; при необходимости вторичные индексы удаляются и
+    перестраиваются после загрузки. Агрегаты за загруженный период
+    пересчитываются процедурой RebuildEnergyRollups.
+    """
+
+    TABLE = 'energy_readings'
+
+    def __init__(self, db_manager: DatabaseManager, chunk_rows: int = 500000):
+        self.db_manager = db_manager
+        self.chunk_rows = chunk_rows
+
+    async def load_records(self, records: Records, rebuild_indexes: bool = False,
+                           rebuild_rollups: bool = True) -> Dict[str, Any]:
+        """Загрузка записей из произвольного (в т.ч. асинхронного) источника.
+
+        LOAD DATA не рассчитывает энергию интервалов: ее и агрегаты за загруженный
+        период пересчитывает rebuild_rollups. При rebuild_rollups=False (несколько
+        загрузок подряд) вызывающий должен сам вызвать db_manager.rebuild_rollups
+        за период stats['first_timestamp'] - stats['last_timestamp'], иначе энергия
+        загруженных показаний остается NULL и не входит в итоги.
+        """
+        stats = {'rows': 0, 'skipped': 0, 'chunks': 0, 'seconds': 0.0, 'rows_per_minute': 0.0,
+                 'first_timestamp': None, 'last_timestamp': None}
+        started = time.monotonic()
+        dropped_indexes = []
+
+        async with self.db_manager.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    'SET @disable_energy_triggers = 1, unique_checks = 0, foreign_key_checks = 0'
+                )
+                try:
+                    if rebuild_indexes:
+                        dropped_indexes = await self._drop_secondary_indexes(cursor)
+
+                    chunk = []
+                    async for record in self._iterate(records):
+                        chunk.append(record)
+                        if len(chunk) >= self.chunk_rows:
+                            await self._load_chunk(cursor, chunk, stats)
+                            chunk = []
+
+                    if chunk:
+                        await self._load_chunk(cursor, chunk, stats)
+                finally:
+                    if dropped_indexes:
+                        await self._restore_secondary_indexes(cursor, dropped_indexes)
+                    await cursor.execute(
+                        'SET @disable_energy_triggers = NULL, unique_checks = 1, foreign_key_checks = 1'
+                    )
+
+        # Энергия интервалов, агрегаты и последние показания не обновляются при LOAD DATA - пересчитываем затронутый период
+        if stats['rows']:
+            if rebuild_rollups:
+                await self.db_manager.rebuild_rollups(stats['first_timestamp'], stats['last_timestamp'])
+            else:
+                logger.warning(
+                    f"Энергия интервалов и агрегаты не пересчитаны: требуется rebuild_rollups за период "
+                    f"{stats['first_timestamp']} - {stats['last_timestamp']}"
+                )
+            await self.db_manager.refresh_meter_latest(stats['first_timestamp'], stats['last_timestamp'])
+
+        stats['seconds'] = round(time.monotonic() - started, 3)
+        if stats['seconds'] > 0:
+            stats['rows_per_minute'] = round(stats['rows'] / stats['seconds'] * 60)
+
+        logger.info(
+            f"Массовая загрузка завершена: {stats['rows']} записей за {stats['seconds']} с "
+            f"({stats['rows_per_minute']} записей/мин)"
+        )
+        if stats['skipped']:
+            logger.warning(f"Пропущено записей без корректного времени: {stats['skipped']}")
+        return stats
+
+    async def load_csv(self, path: str, delimiter: str = ',', **kwargs) -> Dict[str, Any]:
+        """Загрузка показаний из CSV-файла с заголовком (ключи как в save_energy_readings)"""
+        with open(path, newline='', encoding='utf-8') as csv_file:
+            reader = csv.DictReader(csv_file, delimiter=delimiter)
+            return await self.load_records(reader, **kwargs)
+
+    async def load_parquet(self, path: str, **kwargs) -> Dict[str, Any]:
+        """Потоковая загрузка показаний из Parquet-файла"""
+        import pyarrow.parquet as pq
+
+        def iterate_parquet():
+            parquet_file = pq.ParquetFile(path)
+            for batch in parquet_file.iter_batches(batch_size=self.chunk_rows):
+                yield from batch.to_pylist()
+
+        return await self.load_records(iterate_parquet(), **kwargs)
+
+    async def _iterate(self, records: Records):
+        """Единый асинхронный обход синхронных и асинхронных источников"""
+        if hasattr(records, '__aiter__'):
+            async for record in records:
+                yield record
+        else:
+            for record in records:
+                yield record
+
+    async def _load_chunk(self, cursor: aiomysql.Cursor, chunk: List[Dict[str, Any]], stats: Dict[str, Any]):
+        """Запись порции во временный файл и загрузка через LOAD DATA"""
+        rows = [row for row in (self._format_row(record) for record in chunk) if row is not None]
+        stats['skipped'] += len(chunk) - len(rows)
+        if not rows:
+            return
+
+        lines = [line for line, _ in rows]
+        first = min(timestamp for _, timestamp in rows)
+        last = max(timestamp for _, timestamp in rows)
+        if stats['first_timestamp'] is None or first < stats['first_timestamp']:
+            stats['first_timestamp'] = first
+        if stats['last_timestamp'] is None or last > stats['last_timestamp']:
+            stats['last_timestamp'] = last
+
+        fd, path = tempfile.mkstemp(prefix='energy_readings_', suffix='.tsv')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8', newline='') as tsv_file:
+                tsv_file.writelines(lines)
+
+            columns = ', '.join(column for _, column in READING_COLUMNS)
+            set_clause = ''
+            if self.db_manager.compact_readings:
+                # В компактной схеме качество пишется в битовое поле quality_flags
+                columns = columns.replace('data_quality', '@data_quality')
+                set_clause = f"SET {COMPACT_MARKER_COLUMN} = {quality_flags_sql('@data_quality')}"
+            sql = f'''
+                LOAD DATA LOCAL INFILE %s
+                INTO TABLE {self.TABLE}
+                CHARACTER SET utf8mb4
+                FIELDS TERMINATED BY '\\t'
+                LINES TERMINATED BY '\\n'
+                ({columns})
+                {set_clause}
+            '''
+            await cursor.execute(sql, (path,))
+            stats['rows'] += cursor.rowcount
+            stats['chunks'] += 1
+        finally:
+            os.unlink(path)
+
+    def _format_row(self, record: Dict[str, Any]) -> Optional[Tuple[str, datetime]]:
+        """Строка TSV (с экранированием LOAD DATA) и время записи; None - запись без корректного времени"""
+        timestamp = parse_timestamp(record.get('timestamp'))
+        if timestamp is None:
+            return None
+
+        values = []
+        for key, _ in READING_COLUMNS:
+            value = timestamp if key == 'timestamp' else record.get(key)
+            if value is None or value == '':
+                values.append('good' if key == 'data_quality' else NULL_VALUE)
+            elif isinstance(value, datetime):
+                values.append(value.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3])
+            else:
+                values.append(format_value(value))
+        return '\t'.join(values) + '\n', timestamp
+
+    async def _drop_secondary_indexes(self, cursor: aiomysql.Cursor) -> List[Dict[str, Any]]:
+        """Удаление неуникальных вторичных индексов на время загрузки"""
+        await cursor.execute('''
+            SELECT
+                INDEX_NAME,
+                GROUP_CONCAT(COLUMN_NAME ORDER BY SEQ_IN_INDEX) as columns_list,
+                MIN(NON_UNIQUE) as non_unique
+            FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME <> 'PRIMARY'
+            GROUP BY INDEX_NAME
+        ''', (self.TABLE,))
+        indexes = await cursor.fetchall()
+
+        # Один индекс по счетчику оставляем: на нем держатся запросы дашборда во время загрузки
+        meter_index_kept = False
+        dropped = []
+        for index_name, columns_list, non_unique in sorted(indexes, key=lambda i: len(i[1])):
+            columns = columns_list.split(',')
+            # Уникальные индексы и индекс столбца AUTO_INCREMENT удалять нельзя
+            if not non_unique or columns[0] == 'energy_readings_id':
+                continue
+            if columns[0] == 'energy_readings_meter_id' and not meter_index_kept:
+                meter_index_kept = True
+                continue
+
+            await cursor.execute(f'ALTER TABLE {self.TABLE} DROP INDEX {index_name}')
+            dropped.append({'name': index_name, 'columns': columns})
+            logger.info(f"Индекс {index_name} временно удален на время загрузки")
+
+        return dropped
+
+    async def _restore_secondary_indexes(self, cursor: aiomysql.Cursor, indexes: List[Dict[str, Any]]):
+        """Пересоздание удаленных индексов одной командой ALTER TABLE"""
+        clauses = ', '.join(
+            f"ADD INDEX {index['name']} ({', '.join(index['columns'])})" for index in indexes
+        )
+        await cursor.execute(f'ALTER TABLE {self.TABLE} {clauses}')
+        logger.info(f"Восстановлено индексов после загрузки: {len(indexes)}")
+
+
+async def main(argv: Optional[List[str]] = None):
+    """Запуск массовой загрузки из командной строки"""
+    parser = argparse.ArgumentParser(description='Массовая загрузка показаний энергопотребления')
+    parser.add_argument('path', help='Файл CSV или Parquet с показаниями')
+    parser.add_argument('--delimiter', default=',', help='Разделитель полей CSV')
+    parser.add_argument('--chunk-rows', type=int, default=500000, help='Записей в одной порции LOAD DATA')
+    parser.add_argument('--rebuild-indexes', action='store_true',
+                        help='Удалить вторичные индексы на время загрузки (только в окно обслуживания)')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    db_manager = DatabaseManager()
+    await db_manager.initialize()
+    loader = BulkLoader(db_manager, chunk_rows=args.chunk_rows)
+
+    try:
+        if args.path.endswith('.parquet'):
+            stats = await loader.load_parquet(args.path, rebuild_indexes=args.rebuild_indexes)
+        else:
+            stats = await loader.load_csv(args.path, delimiter=args.delimiter,
+                                          rebuild_indexes=args.rebuild_indexes)
+        print(f"Загружено {stats['rows']} записей за {stats['seconds']} с "
+              f"({stats['rows_per_minute']} записей/мин)")
+    finally:
+        await db_manager.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
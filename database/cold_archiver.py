@@ -0,0 +1,228 @@
+"""
+Перенос закрытых секций energy_readings в архив Parquet
+"""
+import asyncio
+import json
+import logging
+import os
+import shutil
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import aiomysql
+from database.db_manager import DatabaseManager
+from database.cold_storage import ARCHIVE_TABLE
+from database.partition_manager import PartitionManager
+
+logger = logging.getLogger(__name__)
+
+
+class ColdArchiver:
+    """Выгрузка секций показаний старше COLD_STORAGE_AFTER_DAYS в Parquet и удаление их из MySQL.
+
+    Секция выгружается серверным курсором во временные файлы, затем DuckDB
+    раскладывает строки по файлам месяц/группа счетчиков, упорядочивая их по
+    времени, со сжатием ZSTD. Секция удаляется только после сверки числа строк
+    в файлах с MySQL. Секции переносятся от старых к новым, поэтому архив всегда
+    покрывает непрерывный период до границы archived_until. Агрегаты (rollups)
+    остаются в MySQL.
+    """
+
+    def __init__(self, db_manager: DatabaseManager, partition_manager: PartitionManager = None,
+                 after_days: int = None):
+        self.db_manager = db_manager
+        self.storage = db_manager.cold_storage
+        self.partition_manager = partition_manager or PartitionManager(db_manager)
+        self.after_days = after_days or getattr(db_manager.settings, 'COLD_STORAGE_AFTER_DAYS', 90)
+        self.running = False
+
+    async def run(self) -> List[str]:
+        """Перенос всех секций старше срока; при ошибке перенос останавливается до следующего запуска"""
+        if self.storage is None:
+            logger.warning("COLD_STORAGE_PATH не задан, архивация показаний пропущена")
+            return []
+
+        await self._finish_exported()
+
+        cutoff = datetime.now() - timedelta(days=self.after_days)
+        partitions = await self.partition_manager.get_partitions(ARCHIVE_TABLE)
+
+        # Последняя датированная секция не переносится, как и в PartitionManager
+        dated = [p for p in partitions if p['upper_bound'] is not None]
+        archived = []
+        for index, partition in enumerate(dated[:-1]):
+            if partition['upper_bound'] > cutoff:
+                break
+            range_start = dated[index - 1]['upper_bound'] if index > 0 else None
+            try:
+                await self.archive_partition(partition['name'], range_start, partition['upper_bound'])
+                archived.append(partition['name'])
+            except Exception as e:
+                logger.error(f"Ошибка архивации секции {partition['name']}: {e}")
+                break
+
+        if archived:
+            logger.info(f"Перенесены в архив секции {ARCHIVE_TABLE}: {', '.join(archived)}")
+        return archived
+
+    async def archive_partition(self, partition: str, range_start: Optional[datetime], range_end: datetime) -> int:
+        """Выгрузка секции, сверка и удаление ее из MySQL"""
+        staging = os.path.join(self.storage.root, '_staging', partition)
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+
+        try:
+            exported = await self._export_partition(partition, staging)
+            files, file_rows = await asyncio.to_thread(self._write_groups, partition, staging)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        mysql_rows = await self._count_partition(partition)
+        if not exported == file_rows == mysql_rows:
+            for path in files:
+                os.remove(path)
+            raise RuntimeError(
+                f"Число строк не совпадает: MySQL {mysql_rows}, выгружено {exported}, в файлах {file_rows}"
+            )
+
+        async with self.db_manager.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute('''
+                    INSERT INTO cold_archive
+                    (archive_partition, archive_table, archive_range_start, archive_range_end,
+                     archive_rows, archive_files, archive_status)
+                    VALUES (%s, %s, %s, %s, %s, %s, 'exported')
+                    ON DUPLICATE KEY UPDATE
+                        archive_range_start = VALUES(archive_range_start),
+                        archive_range_end = VALUES(archive_range_end),
+                        archive_rows = VALUES(archive_rows),
+                        archive_files = VALUES(archive_files),
+                        archive_status = 'exported'
+                ''', (partition, ARCHIVE_TABLE, range_start, range_end, file_rows,
+                      json.dumps([os.path.relpath(path, self.storage.root) for path in files])))
+
+        await self._drop_partition(partition)
+        logger.info(f"Секция {partition} перенесена в архив: {file_rows} строк, {len(files)} файлов")
+        return file_rows
+
+    async def _export_partition(self, partition: str, staging: str, chunk_size: int = 100000) -> int:
+        """Выгрузка строк секции во временные файлы Parquet (по файлу на порцию)"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        exported = 0
+        part = 0
+        async with self.db_manager.pool.acquire() as conn:
+            async with conn.cursor(aiomysql.SSCursor) as cursor:
+                await cursor.execute(f'SELECT * FROM {ARCHIVE_TABLE} PARTITION ({partition})')
+                names = [column[0] for column in cursor.description]
+                while True:
+                    rows = await cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    table = pa.table({name: list(values) for name, values in zip(names, zip(*rows))})
+                    await asyncio.to_thread(pq.write_table, table, os.path.join(staging, f'part-{part:05d}.parquet'))
+                    exported += len(rows)
+                    part += 1
+
+        return exported
+
+    def _write_groups(self, partition: str, staging: str):
+        """Раскладка выгруженных строк по файлам месяц/группа счетчиков (выполняется в потоке)"""
+        import duckdb
+
+        if not os.listdir(staging):
+            return [], 0
+
+        size = int(self.storage.meter_group_size)
+        source = f"read_parquet('{os.path.join(staging, '*.parquet')}', union_by_name = true)"
+        month = "strftime(energy_readings_timestamp, '%Y-%m')"
+        group = f'energy_readings_meter_id // {size}'
+
+        connection = duckdb.connect()
+        try:
+            groups = connection.execute(f'SELECT DISTINCT {month}, {group} FROM {source}').fetchall()
+            files = []
+            for month_key, group_key in groups:
+                directory = os.path.join(self.storage.dataset_path, f'month={month_key}', f'meter_group={group_key}')
+                os.makedirs(directory, exist_ok=True)
+                path = os.path.join(directory, f'{partition}.parquet')
+                connection.execute(f'''
+                    COPY (
+                        SELECT * FROM {source}
+                        WHERE {month} = '{month_key}' AND {group} = {int(group_key)}
+                        ORDER BY energy_readings_timestamp, energy_readings_meter_id, energy_readings_id
+                    ) TO '{path}' (FORMAT PARQUET, COMPRESSION ZSTD)
+                ''')
+                files.append(path)
+
+            paths = ', '.join(f"'{path}'" for path in files)
+            (rows,) = connection.execute(f'SELECT COUNT(*) FROM read_parquet([{paths}], union_by_name = true)').fetchone()
+            return files, rows
+        finally:
+            connection.close()
+
+    async def _count_partition(self, partition: str) -> int:
+        """Число строк секции в MySQL"""
+        async with self.db_manager.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(f'SELECT COUNT(*) FROM {ARCHIVE_TABLE} PARTITION ({partition})')
+                (count,) = await cursor.fetchone()
+                return count
+
+    async def _drop_partition(self, partition: str):
+        """Удаление перенесенной секции и отметка о завершении переноса"""
+        async with self.db_manager.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute('''
+                    SELECT COUNT(*) FROM information_schema.PARTITIONS
+                    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME = %s
+                ''', (ARCHIVE_TABLE, partition))
+                (exists,) = await cursor.fetchone()
+                if exists:
+                    await cursor.execute(f'ALTER TABLE {ARCHIVE_TABLE} DROP PARTITION {partition}')
+                await cursor.execute('''
+                    UPDATE cold_archive SET archive_status = 'archived'
+                    WHERE archive_table = %s AND archive_partition = %s
+                ''', (ARCHIVE_TABLE, partition))
+
+        self.storage.archived_checked_at = 0.0
+
+    async def _finish_exported(self):
+        """Завершение переносов, прерванных между записью файлов и удалением секции"""
+        async with self.db_manager.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute('''
+                    SELECT archive_partition FROM cold_archive
+                    WHERE archive_table = %s AND archive_status = 'exported'
+                ''', (ARCHIVE_TABLE,))
+                pending = [row[0] for row in await cursor.fetchall()]
+
+        for partition in pending:
+            logger.info(f"Завершение прерванного переноса секции {partition}")
+            await self._drop_partition(partition)
+
+    async def get_archive(self) -> List[Dict[str, Any]]:
+        """Перенесенные секции"""
+        async with self.db_manager.pool.acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                await cursor.execute('''
+                    SELECT * FROM cold_archive WHERE archive_table = %s ORDER BY archive_range_end
+                ''', (ARCHIVE_TABLE,))
+                return await cursor.fetchall()
+
+    async def run_forever(self, interval_hours: int = None):
+        """Периодический перенос секций в архив"""
+        interval_hours = interval_hours or getattr(self.db_manager.settings, 'COLD_STORAGE_INTERVAL_HOURS', 24)
+        self.running = True
+
+        while self.running:
+            try:
+                await self.run()
+            except Exception as e:
+                logger.error(f"Ошибка переноса секций в архив: {e}")
+            await asyncio.sleep(interval_hours * 3600)
+
+    def stop(self):
+        """Остановка периодического переноса"""
+        self.running = False
@@ -0,0 +1,206 @@
+"""
+Холодное хранение показаний: чтение архива Parquet через встроенный DuckDB
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from database.columnar import ENERGY_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_TABLE = 'energy_readings'
+
+# Столбцы показаний, которые в горячей выборке берутся из справочников (см. _readings_period_query)
+DIRECTORY_COLUMNS = ('equipment_name', 'area_name', 'equipment_type')
+
+# Колоночная выборка из архива: выражения DuckDB для столбцов columnar.ENERGY_COLUMNS;
+# equipment_id и area_id определяются по справочнику счетчиков
+COLD_EXPRESSIONS = {
+    column: expression.replace('er.', '')
+    for column, (expression, _) in ENERGY_COLUMNS.items()
+    if expression.startswith(('er.', 'CAST(er.'))
+}
+COLD_EXPRESSIONS['timestamp'] = 'epoch_ms(energy_readings_timestamp)'
+
+
+def month_keys(start_time: datetime, end_time: datetime) -> List[str]:
+    """Месяцы периода в формате каталогов архива (month=YYYY-MM)"""
+    months = []
+    year, month = start_time.year, start_time.month
+    while (year, month) <= (end_time.year, end_time.month):
+        months.append(f'{year:04d}-{month:02d}')
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+class ColdStorage:
+    """Архив закрытых секций energy_readings в файлах Parquet.
+
+    Файлы лежат в <root>/energy_readings/month=YYYY-MM/meter_group=N/<секция>.parquet,
+    строки внутри файла упорядочены по времени. Все показания раньше границы
+    архива (archived_until) хранятся только в Parquet, более поздние - только в
+    MySQL, поэтому выборка за период - это архивная часть, за которой следует
+    горячая. Архив читается DuckDB с отбором файлов по каталогам месяца и группы
+    счетчиков.
+    """
+
+    def __init__(self, db_manager, root: str, meter_group_size: int = None):
+        self.db_manager = db_manager
+        self.root = root
+        self.meter_group_size = meter_group_size or getattr(db_manager.settings, 'COLD_STORAGE_METER_GROUP_SIZE', 50)
+        self.archived_until: Optional[datetime] = None
+        self.archived_checked_at = 0.0
+
+    @property
+    def dataset_path(self) -> str:
+        """Каталог архива показаний"""
+        return os.path.join(self.root, ARCHIVE_TABLE)
+
+    def meter_group(self, meter_id: int) -> int:
+        """Группа счетчиков (каталог meter_group=N)"""
+        return meter_id // self.meter_group_size
+
+    async def get_archived_until(self, max_age_seconds: float = 300.0) -> Optional[datetime]:
+        """Граница архива: показания раньше нее хранятся только в Parquet"""
+        if time.monotonic() - self.archived_checked_at < max_age_seconds:
+            return self.archived_until
+
+        pool = await self.db_manager.get_pool('read')
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute('''
+                    SELECT MAX(archive_range_end) FROM cold_archive
+                    WHERE archive_table = %s AND archive_status = 'archived'
+                ''', (ARCHIVE_TABLE,))
+                (self.archived_until,) = await cursor.fetchone()
+
+        self.archived_checked_at = time.monotonic()
+        return self.archived_until
+
+    async def covers(self, start_time: Optional[datetime],
+                     after: Optional[Tuple[datetime, int]] = None) -> Optional[datetime]:
+        """Граница архива, если выборка с start_time (или после ключа after) затрагивает архив"""
+        archived_until = await self.get_archived_until()
+        if archived_until is None:
+            return None
+        if after is not None and after[0] >= archived_until:
+            return None
+        if start_time is not None and start_time >= archived_until:
+            return None
+        return archived_until
+
+    def _build_query(self, select: str, archived_until: datetime, start_time: Optional[datetime],
+                     end_time: Optional[datetime], meter_ids: Optional[Sequence[int]],
+                     after: Optional[Tuple[datetime, int]] = None, limit: int = None) -> Tuple[str, List[Any]]:
+        """Запрос DuckDB к архиву с отбором файлов по месяцу и группе счетчиков"""
+        glob = os.path.join(self.dataset_path, '**', '*.parquet').replace("'", "''")
+        conditions = ['energy_readings_timestamp < ?']
+        params: List[Any] = [archived_until]
+
+        if start_time is not None:
+            conditions.append('energy_readings_timestamp >= ?')
+            params.append(start_time)
+            months = month_keys(start_time, min(end_time or archived_until, archived_until))
+            conditions.append(f"month IN ({', '.join(['?'] * len(months))})")
+            params.extend(months)
+        if end_time is not None:
+            conditions.append('energy_readings_timestamp <= ?')
+            params.append(end_time)
+        if meter_ids is not None:
+            if not meter_ids:
+                conditions.append('1 = 0')
+            else:
+                groups = sorted({self.meter_group(meter_id) for meter_id in meter_ids})
+                conditions.append(f"meter_group IN ({', '.join(['?'] * len(groups))})")
+                params.extend(groups)
+                conditions.append(f"energy_readings_meter_id IN ({', '.join(['?'] * len(meter_ids))})")
+                params.extend(meter_ids)
+        if after is not None:
+            conditions.append('(energy_readings_timestamp, energy_readings_id) > (?, ?)')
+            params.extend(after)
+
+        sql = (
+            f"SELECT {select} FROM read_parquet('{glob}', hive_partitioning = true, union_by_name = true) "
+            f"WHERE {' AND '.join(conditions)} "
+            f"ORDER BY energy_readings_timestamp, energy_readings_id"
+        )
+        if limit is not None:
+            sql += f' LIMIT {int(limit)}'
+        return sql, params
+
+    async def _directory(self) -> Dict[int, Dict[str, Any]]:
+        """Справочник счетчиков для дополнения архивных строк"""
+        return await self.db_manager.get_meter_directory()
+
+    async def _fetch_chunks(self, sql: str, params: List[Any], chunk_size: int) -> AsyncIterator[Tuple[List[str], List[tuple]]]:
+        """Выполнение запроса DuckDB в отдельном потоке с выдачей порций строк"""
+        import duckdb
+
+        connection = duckdb.connect()
+        try:
+            cursor = await asyncio.to_thread(connection.execute, sql, params)
+            names = [column[0] for column in cursor.description]
+            while True:
+                rows = await asyncio.to_thread(cursor.fetchmany, chunk_size)
+                if not rows:
+                    break
+                yield names, rows
+        finally:
+            connection.close()
+
+    async def iter_rows(self, archived_until: datetime, start_time: Optional[datetime], end_time: Optional[datetime],
+                        meter_ids: Optional[Sequence[int]], after: Optional[Tuple[datetime, int]] = None,
+                        limit: int = None, chunk_size: int = 10000) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Архивные показания порциями словарей с теми же ключами, что и горячая выборка"""
+        sql, params = self._build_query('* EXCLUDE (month, meter_group)', archived_until,
+                                        start_time, end_time, meter_ids, after, limit)
+        directory = await self._directory()
+
+        async for names, rows in self._fetch_chunks(sql, params, chunk_size):
+            chunk = []
+            for row in rows:
+                record = dict(zip(names, row))
+                meter = directory.get(record['energy_readings_meter_id'], {})
+                for column in DIRECTORY_COLUMNS:
+                    record[column] = meter.get(column)
+                chunk.append(record)
+            yield chunk
+
+    async def fetch_rows(self, archived_until: datetime, start_time: Optional[datetime],
+                         end_time: Optional[datetime], meter_ids: Optional[Sequence[int]],
+                         after: Optional[Tuple[datetime, int]] = None, limit: int = None) -> List[Dict[str, Any]]:
+        """Все архивные показания периода"""
+        result = []
+        async for chunk in self.iter_rows(archived_until, start_time, end_time, meter_ids, after, limit):
+            result.extend(chunk)
+        return result
+
+    async def iter_column_rows(self, archived_until: datetime, start_time: Optional[datetime],
+                               end_time: Optional[datetime], meter_ids: Optional[Sequence[int]],
+                               columns: Sequence[str], chunk_size: int = 50000) -> AsyncIterator[List[tuple]]:
+        """Архивные показания порциями кортежей в порядке columns (для columnar.decode_chunk)"""
+        expressions = [COLD_EXPRESSIONS.get(column, 'NULL') for column in columns]
+        select = ', '.join(expressions + ['energy_readings_meter_id'])
+        sql, params = self._build_query(select, archived_until, start_time, end_time, meter_ids)
+        directory = await self._directory()
+
+        # Номера столбцов, значения которых берутся из справочника счетчиков
+        derived = [(index, column) for index, column in enumerate(columns) if column not in COLD_EXPRESSIONS]
+
+        async for _, rows in self._fetch_chunks(sql, params, chunk_size):
+            if not derived:
+                yield [row[:-1] for row in rows]
+                continue
+
+            chunk = []
+            for row in rows:
+                values = list(row[:-1])
+                meter = directory.get(row[-1], {})
+                for index, column in derived:
+                    values[index] = meter.get(column)
+                chunk.append(tuple(values))
+            yield chunk
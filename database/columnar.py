@@ -0,0 +1,79 @@
+"""
+Колоночная выборка показаний: типизированные массивы NumPy вместо списков словарей
+"""
+import logging
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Значение NULL в целочисленных столбцах (идентификаторы положительны): например, area_id
+# оборудования без участка или equipment_id счетчика, отсутствующего в справочнике архива
+NULL_ID = -1
+
+# Имя столбца результата: (выражение SQL, тип NumPy).
+# DECIMAL приводится к DOUBLE на стороне сервера, время - к миллисекундам от эпохи,
+# поэтому драйвер не создает объекты Decimal и datetime для каждой строки.
+ENERGY_COLUMNS: Dict[str, Tuple[str, str]] = {
+    'timestamp': ("TIMESTAMPDIFF(MICROSECOND, '1970-01-01', er.energy_readings_timestamp) DIV 1000", 'datetime64[ms]'),
+    'reading_id': ('er.energy_readings_id', 'int64'),
+    'meter_id': ('er.energy_readings_meter_id', 'int32'),
+    'equipment_id': ('e.equipment_id', 'int32'),
+    'area_id': ('e.equipment_area_id', 'int32'),
+    'active_power': ('CAST(er.energy_readings_active_power_kw AS DOUBLE)', 'float64'),
+    'reactive_power': ('CAST(er.energy_readings_reactive_power_kvar AS DOUBLE)', 'float64'),
+    'apparent_power': ('CAST(er.energy_readings_apparent_power_kva AS DOUBLE)', 'float64'),
+    'power_factor': ('CAST(er.energy_readings_power_factor AS DOUBLE)', 'float64'),
+    'voltage_l1': ('CAST(er.energy_readings_voltage_l1 AS DOUBLE)', 'float64'),
+    'voltage_l2': ('CAST(er.energy_readings_voltage_l2 AS DOUBLE)', 'float64'),
+    'voltage_l3': ('CAST(er.energy_readings_voltage_l3 AS DOUBLE)', 'float64'),
+    'current_l1': ('CAST(er.energy_readings_current_l1 AS DOUBLE)', 'float64'),
+    'current_l2': ('CAST(er.energy_readings_current_l2 AS DOUBLE)', 'float64'),
+    'current_l3': ('CAST(er.energy_readings_current_l3 AS DOUBLE)', 'float64'),
+    'frequency': ('CAST(er.energy_readings_frequency AS DOUBLE)', 'float64'),
+}
+
+
+def select_expressions(columns: Sequence[str]) -> str:
+    """Список выражений SELECT для запрошенных столбцов"""
+    unknown = [column for column in columns if column not in ENERGY_COLUMNS]
+    if unknown:
+        raise ValueError(f"Неизвестные столбцы колоночной выборки: {', '.join(unknown)}")
+
+    return ', '.join(f'{ENERGY_COLUMNS[column][0]} as {column}' for column in columns)
+
+
+def decode_chunk(rows: List[tuple], columns: Sequence[str]) -> Dict[str, np.ndarray]:
+    """Преобразование порции строк-кортежей в типизированные массивы (NULL -> NaN, в целочисленных - NULL_ID)"""
+    result = {}
+    transposed = list(zip(*rows))
+
+    for index, column in enumerate(columns):
+        dtype = ENERGY_COLUMNS[column][1]
+        values = transposed[index]
+        if dtype == 'datetime64[ms]':
+            result[column] = np.array(values, dtype='int64').view('datetime64[ms]')
+        elif dtype.startswith('int') and None in values:
+            result[column] = np.array([NULL_ID if value is None else value for value in values], dtype=dtype)
+        else:
+            result[column] = np.array(values, dtype=dtype)
+
+    return result
+
+
+def concatenate_chunks(chunks: List[Dict[str, np.ndarray]], columns: Sequence[str]) -> Dict[str, np.ndarray]:
+    """Объединение порций в итоговые массивы столбцов"""
+    if not chunks:
+        return {column: np.empty(0, dtype=ENERGY_COLUMNS[column][1]) for column in columns}
+    if len(chunks) == 1:
+        return chunks[0]
+
+    return {column: np.concatenate([chunk[column] for chunk in chunks]) for column in columns}
+
+
+def to_dataframe(arrays: Dict[str, Any]):
+    """Представление столбцов в виде pandas.DataFrame"""
+    import pandas as pd
+
+    return pd.DataFrame(arrays, copy=False)
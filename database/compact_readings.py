@@ -0,0 +1,33 @@
+"""
+Компактная схема показаний: FLOAT вместо DECIMAL, качество данных в битовом поле quality_flags
+"""
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Биты quality_flags (остальные биты зарезервированы)
+QUALITY_FLAG_POOR = 0x01
+QUALITY_FLAG_BAD = 0x02
+
+QUALITY_FLAGS = {
+    'good': 0,
+    'poor': QUALITY_FLAG_POOR,
+    'bad': QUALITY_FLAG_BAD,
+}
+
+# Признак компактной схемы - наличие столбца quality_flags в energy_readings
+COMPACT_MARKER_COLUMN = 'quality_flags'
+
+
+def quality_to_flags(quality: Optional[str]) -> int:
+    """Битовое поле по значению data_quality"""
+    return QUALITY_FLAGS.get(quality or 'good', 0)
+
+
+def quality_flags_sql(expression: str) -> str:
+    """Выражение SQL, преобразующее значение data_quality в quality_flags"""
+    return (
+        f"CASE {expression} WHEN 'bad' THEN {QUALITY_FLAG_BAD} "
+        f"WHEN 'poor' THEN {QUALITY_FLAG_POOR} ELSE 0 END"
+    )
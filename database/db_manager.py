@@ -4,30 +4,86 @@
 import asyncio
 import aiomysql
 import logging
-from datetime import datetime
-from typing import List, Dict, Any, Optional
+import time
+from datetime import date, datetime
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator, Sequence, Union
 from config.docker_settings import DockerSettings
+from database.rollups import ROLLUP_UPSERT_SQL, RollupAccumulator, bucket_start, select_rollup_level
+from database.meter_latest import METER_LATEST_UPSERT_SQL, LatestReadingsCache, latest_rows_by_meter
+from database.query_cache import QueryCache, cached_query, invalidates
+from database.columnar import select_expressions, decode_chunk, concatenate_chunks, to_dataframe
+from database.query_builder import QueryBuilder
+from database.metrics import InstrumentedPool, QueryMetrics
+from database.compact_readings import COMPACT_MARKER_COLUMN, quality_to_flags
+from database.cold_storage import ColdStorage
+from database.settings_cache import SettingsCache
 
 logger = logging.getLogger(__name__)
 
 class DatabaseManager:
+    """Доступ к БД через отдельные пулы соединений.
+    
+    Пул 'write' (он же self.pool) обслуживает запись показаний и прочие изменения,
+    'read' - интерактивные запросы интерфейса, 'analytics' - тяжелые выборки для
+    анализа и отчетов. Тяжелый отчет не может занять соединения записи. При
+    настроенной реплике пулы чтения и аналитики направляются на нее, пока ее
+    отставание не превышает replica_max_lag_seconds.
+    """
+    
+    POOL_KINDS = ('write', 'read', 'analytics')
+    # Уведомлений в одном UPDATE при массовом изменении статуса (каждый - отдельная транзакция)
+    ALERT_UPDATE_BATCH_SIZE = 1000
+    
     def __init__(self, settings: DockerSettings = None):
         self.settings = settings or DockerSettings()
         self.pool = None
+        self.pools: Dict[str, InstrumentedPool] = {}
+        self.replica_pools: Dict[str, InstrumentedPool] = {}
+        self.replica_available = False
+        self.replica_checked_at = 0.0
+        self.replica_lag: Optional[int] = None
+        self.rollup_accumulator = RollupAccumulator()
+        self.latest_readings = LatestReadingsCache()
+        # Компактная схема energy_readings (FLOAT, quality_flags) определяется при инициализации
+        self.compact_readings = False
+        # Архив показаний в Parquet (COLD_STORAGE_PATH); None - архив не используется
+        cold_storage_path = getattr(self.settings, 'COLD_STORAGE_PATH', '')
+        self.cold_storage = ColdStorage(self, cold_storage_path) if cold_storage_path else None
+        # Системные настройки процесса, перечитываются при изменении версии
+        self.settings_cache = SettingsCache(self)
+        self.query_cache = QueryCache(
+            ttl_seconds=getattr(self.settings, 'QUERY_CACHE_TTL', 30.0),
+            max_entries=getattr(self.settings, 'QUERY_CACHE_MAX_ENTRIES', 256)
+        )
+        self.metrics = QueryMetrics(
+            slow_query_seconds=self.settings.DATABASE.slow_query_seconds,
+            explain_sample_rate=self.settings.DATABASE.explain_sample_rate
+        )
     
     async def initialize(self):
         """Инициализация подключения к БД"""
+        config = self.settings.DATABASE
+        
         try:
-            self.pool = await aiomysql.create_pool(
-                host=self.settings.DATABASE.host,
-                port=self.settings.DATABASE.port,
-                user=self.settings.DATABASE.username,
-                password=self.settings.DATABASE.password,
-                db=self.settings.DATABASE.database,
-                autocommit=True,
-                maxsize=10,
-                charset='utf8mb4'
-            )
+            pool_sizes = {
+                'write': config.write_pool_size,
+                'read': config.read_pool_size,
+                'analytics': config.analytics_pool_size
+            }
+            for kind, size in pool_sizes.items():
+                self.pools[kind] = await self._create_pool(config.host, config.port, size)
+            self.pool = self.pools['write']
+            
+            if config.replica_host:
+                for kind in ('read', 'analytics'):
+                    self.replica_pools[kind] = await self._create_pool(
+                        config.replica_host, config.replica_port, pool_sizes[kind]
+                    )
+                logger.info(f"Чтение и аналитика направляются на реплику {config.replica_host}")
+            
+            self.compact_readings = await self._detect_compact_readings()
+            if self.compact_readings:
+                logger.info("Таблица energy_readings использует компактную схему")
             
             logger.info("База данных инициализирована")
             
@@ -35,41 +91,151 @@ class DatabaseManager:
             logger.error(f"Ошибка инициализации БД: {e}")
             raise
     
+    async def _detect_compact_readings(self) -> bool:
+        """Проверка, переведена ли energy_readings на компактную схему"""
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute('''
+                    SELECT COUNT(*) FROM information_schema.COLUMNS
+                    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'energy_readings' AND COLUMN_NAME = %s
+                ''', (COMPACT_MARKER_COLUMN,))
+                (count,) = await cursor.fetchone()
+                return count > 0
+    
+    async def _create_pool(self, host: str, port: int, maxsize: int) -> InstrumentedPool:
+        """Создание пула соединений с учетом метрик запросов"""
+        pool = await aiomysql.create_pool(
+            host=host,
+            port=port,
+            user=self.settings.DATABASE.username,
+            password=self.settings.DATABASE.password,
+            db=self.settings.DATABASE.database,
+            autocommit=True,
+            minsize=1,
+            maxsize=maxsize,
+            charset='utf8mb4',
+            local_infile=self.settings.DATABASE.local_infile
+        )
+        return InstrumentedPool(pool, self.metrics)
+    
+    async def get_pool(self, kind: str = 'write') -> InstrumentedPool:
+        """Пул для вида нагрузки: реплика, если она доступна и не отстает, иначе основной сервер"""
+        if kind in self.replica_pools and await self._check_replica():
+            return self.replica_pools[kind]
+        return self.pools.get(kind, self.pool)
+    
+    async def _check_replica(self) -> bool:
+        """Проверка отставания реплики (результат кэшируется на replica_check_interval_seconds)"""
+        config = self.settings.DATABASE
+        now = time.monotonic()
+        if now - self.replica_checked_at < config.replica_check_interval_seconds:
+            return self.replica_available
+        self.replica_checked_at = now
+        
+        try:
+            async with self.replica_pools['read'].acquire() as conn:
+                async with conn.cursor(aiomysql.DictCursor) as cursor:
+                    await cursor.execute('SHOW REPLICA STATUS')
+                    status = await cursor.fetchone()
+            
+            lag = status.get('Seconds_Behind_Source') if status else None
+            self.replica_lag = lag
+            available = lag is not None and lag <= config.replica_max_lag_seconds
+            if not available:
+                logger.warning(f"Реплика недоступна или отстает (lag={lag}), запросы направлены на основной сервер")
+        except Exception as e:
+            logger.error(f"Ошибка проверки состояния реплики: {e}")
+            self.replica_lag = None
+            available = False
+        
+        if available and not self.replica_available:
+            logger.info("Реплика догнала основной сервер, чтение направлено на реплику")
+        self.replica_available = available
+        return available
+    
+    async def get_replica_lag(self) -> Optional[int]:
+        """Отставание реплики в секундах (None - реплика не настроена или недоступна)"""
+        if 'read' not in self.replica_pools:
+            return None
+        await self._check_replica()
+        return self.replica_lag
+    
+    async def close(self):
+        """Закрытие всех пулов соединений"""
+        for pool in list(self.pools.values()) + list(self.replica_pools.values()):
+            pool.close()
+            await pool.wait_closed()
+    
+    @invalidates('energy_readings', 'logs')
     async def save_energy_readings(self, readings_data: List[Dict[str, Any]]):
-        """Сохранение показаний энергопотребления"""
+        """Сохранение показаний энергопотребления, агрегатов и последних показаний одной транзакцией"""
         if not readings_data:
             return
         
-        sql = '''
+        # В компактной схеме data_quality - виртуальный столбец, качество пишется в quality_flags
+        quality_column = COMPACT_MARKER_COLUMN if self.compact_readings else 'data_quality'
+        sql = f'''
             INSERT INTO energy_readings 
             (energy_readings_meter_id, energy_readings_timestamp, energy_readings_active_power_kw, 
              energy_readings_reactive_power_kvar, energy_readings_apparent_power_kva, 
              energy_readings_power_factor, energy_readings_voltage_l1, energy_readings_voltage_l2, 
              energy_readings_voltage_l3, energy_readings_current_l1, energy_readings_current_l2, 
-             energy_readings_current_l3, energy_readings_frequency, data_quality)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+             energy_readings_current_l3, energy_readings_frequency, {quality_column},
+             energy_readings_interval_energy_kwh)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
         '''
         
+        rows = [
+            (
+                record.get('meter_id'),
+                record.get('timestamp'),
+                record.get('active_power'),
+                record.get('reactive_power'),
+                record.get('apparent_power'),
+                record.get('power_factor'),
+                record.get('voltage_l1'),
+                record.get('voltage_l2'),
+                record.get('voltage_l3'),
+                record.get('current_l1'),
+                record.get('current_l2'),
+                record.get('current_l3'),
+                record.get('frequency'),
+                record.get('data_quality', 'good')
+            )
+            for record in readings_data
+        ]
+        # Энергия интервала считается при записи, чтобы итоги были простыми SUM по столбцу
+        energies, last_readings = self.rollup_accumulator.interval_energies(readings_data)
+        if self.compact_readings:
+            insert_rows = [row[:-1] + (quality_to_flags(row[-1]), energy) for row, energy in zip(rows, energies)]
+        else:
+            insert_rows = [row + (energy,) for row, energy in zip(rows, energies)]
+        rollup_rows = self.rollup_accumulator.aggregate(readings_data, energies)
+        latest_rows = latest_rows_by_meter(rows)
+        
         async with self.pool.acquire() as conn:
-            async with conn.cursor() as cursor:
-                for record in readings_data:
-                    await cursor.execute(sql, (
-                        record.get('meter_id'),
-                        record.get('timestamp'),
-                        record.get('active_power'),
-                        record.get('reactive_power'),
-                        record.get('apparent_power'),
-                        record.get('power_factor'),
-                        record.get('voltage_l1'),
-                        record.get('voltage_l2'),
-                        record.get('voltage_l3'),
-                        record.get('current_l1'),
-                        record.get('current_l2'),
-                        record.get('current_l3'),
-                        record.get('frequency'),
-                        record.get('data_quality', 'good')
-                    ))
+            await conn.begin()
+            try:
+                async with conn.cursor() as cursor:
+                    await cursor.executemany(sql, insert_rows)
+                    
+                    for table, table_rows in rollup_rows.items():
+                        if table_rows:
+                            await cursor.executemany(ROLLUP_UPSERT_SQL.format(table=table), table_rows)
+                    
+                    if latest_rows:
+                        await cursor.executemany(METER_LATEST_UPSERT_SQL, latest_rows)
+                
+                await conn.commit()
+            except Exception:
+                await conn.rollback()
+                raise
+        
+        # Последние показания для энергии следующих интервалов - только после фиксации пакета
+        self.rollup_accumulator.advance(last_readings)
+        self.latest_readings.update(latest_rows)
     
+    @invalidates('equipment_states')
     async def save_equipment_state(self, equipment_id: int, state_data: Dict[str, Any]):
         """Сохранение состояния оборудования"""
         sql = '''
@@ -94,6 +260,7 @@ class DatabaseManager:
                     state_data.get('additional_data')
                 ))
     
+    @invalidates('logs')
     async def create_log(self, log_data: Dict[str, Any]):
         """Создание записи в логах"""
         sql = '''
@@ -118,6 +285,53 @@ class DatabaseManager:
                     log_data.get('additional_data')
                 ))
     
+    @invalidates('equipment')
+    async def update_communication_status(self, last_seen: Dict[int, datetime]) -> int:
+        """Пакетное обновление времени последней связи и статуса 'online' оборудования"""
+        if not last_seen:
+            return 0
+        
+        items = sorted(last_seen.items())
+        source = ' UNION ALL '.join(['SELECT %s AS equipment_id, %s AS seen_at'] * len(items))
+        sql = f'''
+            UPDATE equipment e
+            INNER JOIN ({source}) s ON e.equipment_id = s.equipment_id
+            SET 
+                e.last_communication = GREATEST(COALESCE(e.last_communication, s.seen_at), s.seen_at),
+                e.communication_status = 'online'
+        '''
+        params = [value for item in items for value in item]
+        
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(sql, params)
+                return cursor.rowcount
+    
+    @invalidates('equipment')
+    async def mark_equipment_offline(self, silent_since: datetime) -> List[int]:
+        """Перевод в 'offline' опрашиваемого (equipment_status = 'active') оборудования без связи с указанного момента"""
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute('''
+                    SELECT equipment_id FROM equipment
+                    WHERE equipment_status = 'active'
+                        AND communication_status <> 'offline'
+                        AND (last_communication IS NULL OR last_communication < %s)
+                ''', (silent_since,))
+                equipment_ids = [row[0] for row in await cursor.fetchall()]
+                
+                if equipment_ids:
+                    placeholders = ', '.join(['%s'] * len(equipment_ids))
+                    await cursor.execute(f'''
+                        UPDATE equipment SET communication_status = 'offline'
+                        WHERE equipment_id IN ({placeholders})
+                            AND equipment_status = 'active'
+                            AND (last_communication IS NULL OR last_communication < %s)
+                    ''', (*equipment_ids, silent_since))
+                
+                return equipment_ids
+    
+    @cached_query('equipment')
     async def get_equipment_list(self) -> List[Dict[str, Any]]:
         """Получение списка оборудования"""
         sql = '''
@@ -141,11 +355,13 @@ class DatabaseManager:
             ORDER BY a.name, e.equipment_name
         '''
         
-        async with self.pool.acquire() as conn:
+        pool = await self.get_pool('read')
+        async with pool.acquire() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cursor:
                 await cursor.execute(sql)
                 return await cursor.fetchall()
     
+    @cached_query('equipment')
     async def get_meters_by_equipment(self, equipment_id: int) -> List[Dict[str, Any]]:
         """Получение счетчиков для оборудования"""
         sql = '''
@@ -158,50 +374,352 @@ class DatabaseManager:
             ORDER BY m.meter_id
         '''
         
-        async with self.pool.acquire() as conn:
+        pool = await self.get_pool('read')
+        async with pool.acquire() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cursor:
                 await cursor.execute(sql, (equipment_id,))
                 return await cursor.fetchall()
     
-    async def get_latest_energy_readings(self, limit: int = 100, equipment_id: int = None) -> List[Dict[str, Any]]:
-        """Получение последних показаний энергопотребления"""
+    @cached_query('equipment')
+    async def resolve_meter_ids(self, equipment_id: int = None, area_id: int = None) -> Optional[List[int]]:
+        """Идентификаторы счетчиков оборудования/участка (None - фильтр не задан).
+        
+        Фильтр по счетчикам позволяет запросам к показаниям использовать
+        индекс (meter_id, timestamp) вместо соединения с equipment.
+        """
+        if equipment_id is None and area_id is None:
+            return None
+        
+        query = QueryBuilder('m.meter_id', 'meters m INNER JOIN equipment e ON m.meter_equipment_id = e.equipment_id')
+        query.where_equals('e.equipment_id', equipment_id)
+        query.where_equals('e.equipment_area_id', area_id)
+        query.order_by = 'm.meter_id'
+        sql, params = query.build()
+        
+        pool = await self.get_pool('read')
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(sql, params)
+                return [row[0] for row in await cursor.fetchall()]
+    
+    @cached_query('equipment')
+    async def get_meter_directory(self) -> Dict[int, Dict[str, Any]]:
+        """Оборудование, участок, тип и модель каждого счетчика (для дополнения показаний)"""
         sql = '''
-            SELECT * FROM latest_energy_readings
-            WHERE (%s IS NULL OR equipment_id = %s)
-            ORDER BY energy_readings_timestamp DESC 
-            LIMIT %s
+            SELECT
+                m.meter_id,
+                e.equipment_id,
+                e.equipment_area_id as area_id,
+                e.equipment_name,
+                e.equipment_nominal_power_kw,
+                e.equipment_status,
+                e.communication_status,
+                a.name as area_name,
+                et.type_name as equipment_type,
+                m.meter_model,
+                m.meter_serial_number
+            FROM meters m
+            INNER JOIN equipment e ON m.meter_equipment_id = e.equipment_id
+            INNER JOIN areas a ON e.equipment_area_id = a.area_id
+            INNER JOIN equipment_types et ON e.equipment_type_id = et.type_id
         '''
         
-        async with self.pool.acquire() as conn:
+        pool = await self.get_pool('read')
+        async with pool.acquire() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cursor:
-                await cursor.execute(sql, (equipment_id, equipment_id, limit))
-                return await cursor.fetchall()
+                await cursor.execute(sql)
+                return {row['meter_id']: row for row in await cursor.fetchall()}
     
-    async def get_energy_readings_by_period(self, start_time: datetime, end_time: datetime, 
-                                          equipment_id: int = None, area_id: int = None) -> List[Dict[str, Any]]:
-        """Получение показаний за период"""
-        sql = '''
-            SELECT 
+    async def get_latest_energy_readings(self, limit: int = 100, equipment_id: int = None) -> List[Dict[str, Any]]:
+        """Последние показания счетчиков (как в представлении latest_energy_readings) из кэша процесса"""
+        readings = await self._get_latest_readings()
+        directory = await self.get_meter_directory()
+        
+        rows = []
+        for meter_id, reading in readings.items():
+            meter = directory.get(meter_id)
+            if meter is None or (equipment_id is not None and meter['equipment_id'] != equipment_id):
+                continue
+            rows.append({**reading, **{key: value for key, value in meter.items() if key != 'meter_id'}})
+        
+        rows.sort(key=lambda row: row['energy_readings_timestamp'], reverse=True)
+        return rows[:limit]
+    
+    async def get_meter_latest_reading(self, meter_id: int) -> Optional[Dict[str, Any]]:
+        """Последнее показание счетчика из кэша процесса"""
+        return (await self._get_latest_readings()).get(meter_id)
+    
+    async def _get_latest_readings(self) -> Dict[int, Dict[str, Any]]:
+        """Последние показания всех счетчиков.
+        
+        Записи этого процесса попадают в кэш сразу после фиксации; записи других
+        процессов - при синхронизации с meter_latest, не реже раза в QUERY_CACHE_TTL.
+        """
+        if not self.latest_readings.is_fresh(getattr(self.settings, 'QUERY_CACHE_TTL', 30.0)):
+            pool = await self.get_pool('read')
+            async with pool.acquire() as conn:
+                async with conn.cursor(aiomysql.DictCursor) as cursor:
+                    await cursor.execute('SELECT * FROM meter_latest')
+                    self.latest_readings.sync(await cursor.fetchall())
+        
+        return self.latest_readings.readings
+    
+    async def _readings_period_query(self, start_time: datetime, end_time: datetime, equipment_id: int = None,
+                                     area_id: int = None, after: Optional[Tuple[datetime, int]] = None,
+                                     limit: int = None, select_columns: str = None) -> Tuple[str, List[Any]]:
+        """SQL выборки показаний за период в порядке (время, id) с фильтром по счетчикам"""
+        query = QueryBuilder(
+            select_columns or '''
                 er.*,
                 e.equipment_name,
                 a.name as area_name,
-                et.type_name as equipment_type
-            FROM energy_readings er
+                et.type_name as equipment_type''',
+            '''energy_readings er
             INNER JOIN meters m ON er.energy_readings_meter_id = m.meter_id
             INNER JOIN equipment e ON m.meter_equipment_id = e.equipment_id
             INNER JOIN areas a ON e.equipment_area_id = a.area_id
-            INNER JOIN equipment_types et ON e.equipment_type_id = et.type_id
-            WHERE er.energy_readings_timestamp BETWEEN %s AND %s
-                AND (%s IS NULL OR e.equipment_id = %s)
-                AND (%s IS NULL OR e.equipment_area_id = %s)
-            ORDER BY er.energy_readings_timestamp
+            INNER JOIN equipment_types et ON e.equipment_type_id = et.type_id'''
+        )
+        
+        meter_ids = await self.resolve_meter_ids(equipment_id, area_id)
+        if meter_ids is not None:
+            query.where_in('er.energy_readings_meter_id', meter_ids)
+        query.where_between('er.energy_readings_timestamp', start_time, end_time)
+        if after is not None:
+            query.where('(er.energy_readings_timestamp, er.energy_readings_id) > (%s, %s)', *after)
+        query.order_by = 'er.energy_readings_timestamp, er.energy_readings_id'
+        query.limit = limit
+        
+        return query.build()
+    
+    async def _cold_period(self, start_time: datetime, after: Optional[Tuple[datetime, int]] = None) -> Optional[datetime]:
+        """Граница архива Parquet, если выборка затрагивает архивные показания (иначе None)"""
+        if self.cold_storage is None:
+            return None
+        return await self.cold_storage.covers(start_time, after)
+    
+    async def get_energy_readings_by_period(self, start_time: datetime, end_time: datetime, 
+                                          equipment_id: int = None, area_id: int = None) -> List[Dict[str, Any]]:
+        """Получение показаний за период (для больших периодов - iter_energy_readings_by_period)"""
+        sql, params = await self._readings_period_query(start_time, end_time, equipment_id, area_id)
+        
+        pool = await self.get_pool('analytics')
+        async with pool.acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                await cursor.execute(sql, params)
+                rows = await cursor.fetchall()
+        
+        # Архивные показания старше горячих, поэтому порядок (время, id) сохраняется
+        archived_until = await self._cold_period(start_time)
+        if archived_until is None:
+            return rows
+        meter_ids = await self.resolve_meter_ids(equipment_id, area_id)
+        cold_rows = await self.cold_storage.fetch_rows(archived_until, start_time, end_time, meter_ids)
+        return cold_rows + list(rows)
+    
+    async def iter_energy_readings_by_period(self, start_time: datetime, end_time: datetime,
+                                             equipment_id: int = None, area_id: int = None,
+                                             chunk_size: int = 10000) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Потоковое чтение показаний за период порциями через серверный курсор.
+        
+        Соединение пула занято до конца обхода: генератор нужно дочитать
+        или закрыть (contextlib.aclosing). Архивные показания выдаются первыми.
+        """
+        archived_until = await self._cold_period(start_time)
+        if archived_until is not None:
+            meter_ids = await self.resolve_meter_ids(equipment_id, area_id)
+            async for rows in self.cold_storage.iter_rows(archived_until, start_time, end_time, meter_ids,
+                                                          chunk_size=chunk_size):
+                yield rows
+        
+        sql, params = await self._readings_period_query(start_time, end_time, equipment_id, area_id)
+        
+        pool = await self.get_pool('analytics')
+        async with pool.acquire() as conn:
+            async with conn.cursor(aiomysql.SSDictCursor) as cursor:
+                await cursor.execute(sql, params)
+                while True:
+                    rows = await cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield rows
+    
+    async def get_energy_readings_page(self, start_time: datetime, end_time: datetime,
+                                       after: Optional[Tuple[datetime, int]] = None, limit: int = 5000,
+                                       equipment_id: int = None, area_id: int = None) -> Dict[str, Any]:
+        """Страница показаний за период с пагинацией по ключу (время, id).
+        
+        next_after передается в after следующего вызова; None - страниц больше нет.
+        Страница может начинаться в архиве Parquet и продолжаться в MySQL.
+        """
+        rows = []
+        archived_until = await self._cold_period(start_time, after)
+        if archived_until is not None:
+            meter_ids = await self.resolve_meter_ids(equipment_id, area_id)
+            rows = await self.cold_storage.fetch_rows(archived_until, start_time, end_time, meter_ids,
+                                                      after=after, limit=limit)
+            # Горячие показания начинаются после архивных, ключ архива к ним не применяется
+            after = None
+        
+        if len(rows) < limit:
+            sql, params = await self._readings_period_query(start_time, end_time, equipment_id, area_id,
+                                                            after=after, limit=limit - len(rows))
+        
+            pool = await self.get_pool('analytics')
+            async with pool.acquire() as conn:
+                async with conn.cursor(aiomysql.DictCursor) as cursor:
+                    await cursor.execute(sql, params)
+                    rows = rows + list(await cursor.fetchall())
+        
+        next_after = None
+        if len(rows) == limit:
+            last = rows[-1]
+            next_after = (last['energy_readings_timestamp'], last['energy_readings_id'])
+        
+        return {'rows': rows, 'next_after': next_after}
+    
+    async def iter_energy_columns(self, start_time: datetime, end_time: datetime,
+                                  columns: Sequence[str] = ('timestamp', 'active_power'),
+                                  equipment_id: int = None, area_id: int = None,
+                                  chunk_size: int = 50000) -> AsyncIterator[Dict[str, Any]]:
+        """Потоковая колоночная выборка: порции {столбец: numpy.ndarray}.
+        
+        Выбираются только запрошенные столбцы (см. columnar.ENERGY_COLUMNS),
+        строки читаются серверным курсором без создания словарей и Decimal.
+        NULL в вещественных столбцах - NaN, в целочисленных - columnar.NULL_ID.
+        Архивные показания читаются из Parquet и выдаются первыми.
+        """
+        columns = list(columns)
+        sql, params = await self._readings_period_query(start_time, end_time, equipment_id, area_id,
+                                                        select_columns=select_expressions(columns))
+        
+        archived_until = await self._cold_period(start_time)
+        if archived_until is not None:
+            meter_ids = await self.resolve_meter_ids(equipment_id, area_id)
+            async for rows in self.cold_storage.iter_column_rows(archived_until, start_time, end_time,
+                                                                 meter_ids, columns, chunk_size):
+                yield decode_chunk(rows, columns)
+        
+        pool = await self.get_pool('analytics')
+        async with pool.acquire() as conn:
+            async with conn.cursor(aiomysql.SSCursor) as cursor:
+                await cursor.execute(sql, params)
+                while True:
+                    rows = await cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield decode_chunk(rows, columns)
+    
+    async def fetch_energy_columns(self, start_time: datetime, end_time: datetime,
+                                   columns: Sequence[str] = ('timestamp', 'active_power'),
+                                   equipment_id: int = None, area_id: int = None,
+                                   as_dataframe: bool = False, chunk_size: int = 50000):
+        """Колоночная выборка показаний за период: {столбец: numpy.ndarray} или pandas.DataFrame"""
+        chunks = [
+            chunk async for chunk in self.iter_energy_columns(start_time, end_time, columns,
+                                                              equipment_id, area_id, chunk_size)
+        ]
+        
+        arrays = concatenate_chunks(chunks, columns)
+        return to_dataframe(arrays) if as_dataframe else arrays
+    
+    @cached_query('energy_readings', 'equipment')
+    async def get_energy_aggregates(self, start_time: datetime, end_time: datetime, resolution_seconds: int = 3600,
+                                    group_by: str = 'meter', equipment_id: int = None,
+                                    area_id: int = None) -> List[Dict[str, Any]]:
+        """Агрегированные показания за период из самого крупного подходящего уровня агрегатов.
+        
+        group_by: 'meter', 'equipment', 'area' или None (итог по всем счетчикам).
+        Интервалы на границах периода включаются целиком.
+        """
+        _, table, level_seconds = select_rollup_level(start_time, end_time, resolution_seconds)
+        
+        # Перегруппировка в запрошенное разрешение, если оно крупнее уровня агрегатов
+        if resolution_seconds > level_seconds:
+            # TIMESTAMP(...) + INTERVAL дает DATETIME (DATE_ADD от строки вернул бы VARCHAR)
+            bucket_expr = (
+                "TIMESTAMP('1970-01-01') + INTERVAL FLOOR(TIMESTAMPDIFF(SECOND, '1970-01-01', r.rollup_bucket_start) "
+                f"/ {int(resolution_seconds)}) * {int(resolution_seconds)} SECOND"
+            )
+        else:
+            bucket_expr = 'r.rollup_bucket_start'
+        
+        group_columns = {
+            'meter': ['r.rollup_meter_id as meter_id', 'e.equipment_id', 'e.equipment_name'],
+            'equipment': ['e.equipment_id', 'e.equipment_name'],
+            'area': ['e.equipment_area_id as area_id', 'a.name as area_name'],
+            None: []
+        }[group_by]
+        group_keys = [column.split(' as ')[0] for column in group_columns]
+        
+        conditions = ['r.rollup_bucket_start >= %s', 'r.rollup_bucket_start < %s']
+        params = [bucket_start(start_time, level_seconds), end_time]
+        meter_ids = await self.resolve_meter_ids(equipment_id, area_id)
+        if meter_ids is not None:
+            conditions.append(f"r.rollup_meter_id IN ({', '.join(['%s'] * len(meter_ids)) or 'NULL'})")
+            params.extend(meter_ids)
+        
+        select_columns = ', '.join([f'{bucket_expr} as bucket_start'] + group_columns)
+        group_clause = ', '.join(['bucket_start'] + group_keys)
+        
+        sql = f'''
+            SELECT 
+                {select_columns},
+                SUM(r.readings_count) as readings_count,
+                SUM(r.active_power_sum) / NULLIF(SUM(r.active_power_count), 0) as avg_power_kw,
+                MIN(r.active_power_min) as min_power_kw,
+                MAX(r.active_power_max) as max_power_kw,
+                SUM(r.energy_kwh) as total_energy_kwh,
+                SUM(r.power_factor_sum) / NULLIF(SUM(r.power_factor_count), 0) as avg_power_factor,
+                MIN(r.power_factor_min) as min_power_factor,
+                SUM(r.good_count) as good_count,
+                SUM(r.poor_count) as poor_count,
+                SUM(r.bad_count) as bad_count,
+                MAX(r.last_timestamp) as last_timestamp
+            FROM {table} r
+            INNER JOIN meters m ON r.rollup_meter_id = m.meter_id
+            INNER JOIN equipment e ON m.meter_equipment_id = e.equipment_id
+            LEFT JOIN areas a ON e.equipment_area_id = a.area_id
+            WHERE {' AND '.join(conditions)}
+            GROUP BY {group_clause}
+            ORDER BY bucket_start
         '''
         
-        async with self.pool.acquire() as conn:
+        pool = await self.get_pool('read')
+        async with pool.acquire() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cursor:
-                await cursor.execute(sql, (start_time, end_time, equipment_id, equipment_id, area_id, area_id))
+                await cursor.execute(sql, params)
                 return await cursor.fetchall()
     
+    async def get_latest_rollup_hour(self) -> Optional[datetime]:
+        """Начало последнего часа с часовыми агрегатами (по индексу idx_bucket_start)"""
+        pool = await self.get_pool('read')
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute('SELECT MAX(rollup_bucket_start) FROM energy_rollup_1h WHERE rollup_bucket_start <= NOW()')
+                row = await cursor.fetchone()
+                return row[0] if row else None
+    
+    @invalidates('energy_readings')
+    async def rebuild_rollups(self, start_time: datetime, end_time: datetime):
+        """Пересчет агрегатов из сырых показаний (после массовой загрузки или запоздавших данных)"""
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.callproc('RebuildEnergyRollups', (start_time, end_time))
+        
+        logger.info(f"Агрегаты пересчитаны за период {start_time} - {end_time}")
+    
+    @invalidates('energy_readings')
+    async def refresh_meter_latest(self, start_time: datetime, end_time: datetime):
+        """Обновление последних показаний счетчиков по сырым данным периода"""
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.callproc('RefreshMeterLatest', (start_time, end_time))
+        
+        # Кэш процесса мог устареть - следующие запросы перечитают meter_latest
+        self.latest_readings.clear()
+    
+    @cached_query('logs')
     async def get_active_logs(self, limit: int = 50) -> List[Dict[str, Any]]:
         """Получение активных уведомлений"""
         sql = '''
@@ -210,11 +728,93 @@ class DatabaseManager:
             LIMIT %s
         '''
         
-        async with self.pool.acquire() as conn:
+        pool = await self.get_pool('read')
+        async with pool.acquire() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cursor:
                 await cursor.execute(sql, (limit,))
                 return await cursor.fetchall()
     
+    async def get_logs_page(self, after: Optional[Tuple[datetime, int]] = None, limit: int = 200,
+                            start_time: datetime = None, end_time: datetime = None, log_type: str = None,
+                            log_status: str = None, equipment_id: int = None, area_id: int = None,
+                            severity: str = None) -> Dict[str, Any]:
+        """Страница журнала событий от новых к старым с пагинацией по ключу (время, id).
+        
+        Фильтры по оборудованию (idx_equipment_timestamp, idx_logs_composite) и
+        по типу со статусом (idx_type_status) совпадают с индексами, строки которых
+        упорядочены по времени, поэтому сервер читает только limit строк.
+        next_after передается в after следующего вызова; None - страниц больше нет.
+        """
+        query = QueryBuilder(
+            'l.*, e.equipment_name',
+            'logs l LEFT JOIN equipment e ON l.log_equipment_id = e.equipment_id'
+        )
+        query.where_equals('l.log_equipment_id', equipment_id)
+        if area_id is not None:
+            query.where('l.log_equipment_id IN (SELECT equipment_id FROM equipment WHERE equipment_area_id = %s)', area_id)
+        query.where_equals('l.log_type', log_type)
+        query.where_equals('l.log_status', log_status)
+        query.where_equals('l.severity', severity)
+        query.where_between('l.log_timestamp', start_time, end_time)
+        if after is not None:
+            query.where('(l.log_timestamp, l.log_id) < (%s, %s)', *after)
+        query.order_by = 'l.log_timestamp DESC, l.log_id DESC'
+        query.limit = limit
+        sql, params = query.build()
+        
+        pool = await self.get_pool('read')
+        async with pool.acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                await cursor.execute(sql, params)
+                rows = await cursor.fetchall()
+        
+        next_after = None
+        if len(rows) == limit:
+            last = rows[-1]
+            next_after = (last['log_timestamp'], last['log_id'])
+        
+        return {'rows': rows, 'next_after': next_after}
+    
+    async def get_alert_changes(self, since_seq: int = 0) -> Dict[str, Any]:
+        """Изменения активных уведомлений после номера since_seq.
+        
+        Возвращает текущий номер 'seq', измененные или новые уведомления 'alerts'
+        и идентификаторы снятых уведомлений 'removed'. Если журнал изменений после
+        since_seq уже очищен, 'reset' = True и 'alerts' содержит весь активный набор.
+        """
+        pool = await self.get_pool('read')
+        async with pool.acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                await cursor.execute('SELECT sequence_value FROM alert_sequence WHERE sequence_id = 1')
+                row = await cursor.fetchone()
+                current_seq = row['sequence_value'] if row else 0
+                
+                await cursor.execute('SELECT MIN(change_seq) as first_seq FROM alert_changes')
+                first_seq = (await cursor.fetchone())['first_seq']
+                reset = since_seq > current_seq or (first_seq is not None and since_seq < first_seq - 1)
+                
+                # Изменения с номером больше current_seq попадут в следующий запрос
+                since = 0 if reset else since_seq
+                await cursor.execute('''
+                    SELECT * FROM active_logs
+                    WHERE alert_change_seq > %s AND alert_change_seq <= %s
+                    ORDER BY alert_change_seq
+                ''', (since, current_seq))
+                alerts = await cursor.fetchall()
+                
+                removed = []
+                if not reset:
+                    await cursor.execute('''
+                        SELECT DISTINCT change_log_id FROM alert_changes
+                        WHERE change_seq > %s AND change_seq <= %s AND change_type = 'remove'
+                    ''', (since, current_seq))
+                    active_ids = {alert['log_id'] for alert in alerts}
+                    removed = [row['change_log_id'] for row in await cursor.fetchall()
+                               if row['change_log_id'] not in active_ids]
+        
+        return {'seq': current_seq, 'reset': reset, 'alerts': alerts, 'removed': removed}
+    
+    @invalidates('logs')
     async def acknowledge_log(self, log_id: int, user_id: int):
         """Подтверждение уведомления"""
         sql = '''
@@ -229,6 +829,7 @@ class DatabaseManager:
             async with conn.cursor() as cursor:
                 await cursor.execute(sql, (user_id, log_id))
     
+    @invalidates('logs')
     async def resolve_log(self, log_id: int):
         """Разрешение уведомления"""
         sql = '''
@@ -242,6 +843,75 @@ class DatabaseManager:
             async with conn.cursor() as cursor:
                 await cursor.execute(sql, (log_id,))
     
+    async def _update_active_alerts(self, set_clause: str, set_params: Sequence[Any], statuses: Sequence[str],
+                                    log_ids: Sequence[int] = None, severity: Union[str, Sequence[str]] = None,
+                                    equipment_id: int = None, area_id: int = None, log_type: str = None,
+                                    older_than: datetime = None) -> int:
+        """Изменение активных уведомлений по списку или фильтру; число измененных.
+        
+        Ключи выбираются из небольшой таблицы active_alerts, а не сканированием
+        logs; обновить logs соединением с active_alerts нельзя - ее изменяют
+        триггеры logs. Статус повторно проверяется в UPDATE. Ключи обновляются
+        порциями по ALERT_UPDATE_BATCH_SIZE в отдельных транзакциях: список
+        остается в пределах оптимизатора диапазонов, а блокировка alert_sequence,
+        которую берут триггеры, не задерживает запись показаний надолго.
+        """
+        query = QueryBuilder(
+            'aa.log_id, aa.log_timestamp',
+            'active_alerts aa LEFT JOIN equipment e ON aa.log_equipment_id = e.equipment_id'
+        )
+        query.where_in('aa.log_status', statuses)
+        if log_ids is not None:
+            query.where_in('aa.log_id', log_ids)
+        if severity is not None:
+            query.where_in('aa.severity', [severity] if isinstance(severity, str) else severity)
+        query.where_equals('aa.log_equipment_id', equipment_id)
+        query.where_equals('e.equipment_area_id', area_id)
+        query.where_equals('aa.log_type', log_type)
+        if older_than is not None:
+            query.where('aa.log_timestamp < %s', older_than)
+        sql, params = query.build()
+        
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(sql, params)
+                keys = await cursor.fetchall()
+                
+                updated = 0
+                status_placeholders = ', '.join(['%s'] * len(statuses))
+                for offset in range(0, len(keys), self.ALERT_UPDATE_BATCH_SIZE):
+                    batch = keys[offset:offset + self.ALERT_UPDATE_BATCH_SIZE]
+                    # Поиск по первичному ключу (log_id, log_timestamp) с отбором секций
+                    key_placeholders = ', '.join(['(%s, %s)'] * len(batch))
+                    await cursor.execute(f'''
+                        UPDATE logs SET {set_clause}
+                        WHERE (log_id, log_timestamp) IN ({key_placeholders})
+                            AND log_status IN ({status_placeholders})
+                    ''', (*set_params, *(value for key in batch for value in key), *statuses))
+                    updated += cursor.rowcount
+                return updated
+    
+    @invalidates('logs')
+    async def acknowledge_logs(self, user_id: int, log_ids: Sequence[int] = None,
+                               severity: Union[str, Sequence[str]] = None, equipment_id: int = None,
+                               area_id: int = None, log_type: str = None, older_than: datetime = None) -> int:
+        """Подтверждение новых уведомлений по списку или фильтру (без фильтров - всех); число подтвержденных"""
+        return await self._update_active_alerts(
+            "log_status = 'acknowledged', log_acknowledged_by_user_id = %s, log_acknowledged_at = NOW()",
+            (user_id,), ('new',), log_ids, severity, equipment_id, area_id, log_type, older_than
+        )
+    
+    @invalidates('logs')
+    async def resolve_logs(self, log_ids: Sequence[int] = None, severity: Union[str, Sequence[str]] = None,
+                           equipment_id: int = None, area_id: int = None, log_type: str = None,
+                           older_than: datetime = None) -> int:
+        """Разрешение активных уведомлений по списку или фильтру (без фильтров - всех); число разрешенных"""
+        return await self._update_active_alerts(
+            "log_status = 'resolved', log_resolved_at = NOW()",
+            (), ('new', 'acknowledged'), log_ids, severity, equipment_id, area_id, log_type, older_than
+        )
+    
+    @cached_query('energy_readings', 'equipment')
     async def get_area_statistics(self, start_time: datetime = None, end_time: datetime = None) -> List[Dict[str, Any]]:
         """Получение статистики по участкам"""
         if start_time and end_time:
@@ -253,11 +923,7 @@ class DatabaseManager:
                     AVG(er.energy_readings_active_power_kw) as avg_power_kw,
                     MAX(er.energy_readings_active_power_kw) as max_power_kw,
                     MIN(er.energy_readings_active_power_kw) as min_power_kw,
-                    SUM(er.energy_readings_active_power_kw * 
-                        TIMESTAMPDIFF(SECOND, 
-                            LAG(er.energy_readings_timestamp) OVER (PARTITION BY a.area_id ORDER BY er.energy_readings_timestamp), 
-                            er.energy_readings_timestamp
-                        ) / 3600) as total_energy_kwh,
+                    SUM(er.energy_readings_interval_energy_kwh) as total_energy_kwh,
                     AVG(er.energy_readings_power_factor) as avg_power_factor,
                     COUNT(DISTINCT e.equipment_id) as equipment_count
                 FROM areas a
@@ -269,48 +935,53 @@ class DatabaseManager:
                 ORDER BY a.name
             '''
             
-            async with self.pool.acquire() as conn:
+            pool = await self.get_pool('analytics')
+            async with pool.acquire() as conn:
                 async with conn.cursor(aiomysql.DictCursor) as cursor:
                     await cursor.execute(sql, (start_time, end_time))
                     return await cursor.fetchall()
         else:
             sql = 'SELECT * FROM area_energy_stats_24h ORDER BY area_name'
             
-            async with self.pool.acquire() as conn:
+            pool = await self.get_pool('read')
+            async with pool.acquire() as conn:
                 async with conn.cursor(aiomysql.DictCursor) as cursor:
                     await cursor.execute(sql)
                     return await cursor.fetchall()
     
+    @cached_query('energy_readings', 'equipment')
     async def get_equipment_efficiency(self) -> List[Dict[str, Any]]:
         """Получение показателей эффективности оборудования"""
         sql = 'SELECT * FROM equipment_efficiency ORDER BY equipment_name'
         
-        async with self.pool.acquire() as conn:
+        pool = await self.get_pool('read')
+        async with pool.acquire() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cursor:
                 await cursor.execute(sql)
                 return await cursor.fetchall()
     
+    @cached_query('threshold')
     async def get_thresholds(self, equipment_id: int = None, area_id: int = None) -> List[Dict[str, Any]]:
         """Получение пороговых значений"""
-        sql = '''
-            SELECT 
-                t.*,
-                e.equipment_name,
-                a.name as area_name
-            FROM threshold t
+        query = QueryBuilder(
+            't.*, e.equipment_name, a.name as area_name',
+            '''threshold t
             LEFT JOIN equipment e ON t.threshold_equipment_id = e.equipment_id
-            LEFT JOIN areas a ON t.threshold_area_id = a.area_id
-            WHERE t.is_active = TRUE
-                AND (%s IS NULL OR t.threshold_equipment_id = %s)
-                AND (%s IS NULL OR t.threshold_area_id = %s)
-            ORDER BY t.parameter_name, e.equipment_name, a.name
-        '''
+            LEFT JOIN areas a ON t.threshold_area_id = a.area_id'''
+        )
+        query.where('t.is_active = TRUE')
+        query.where_equals('t.threshold_equipment_id', equipment_id)
+        query.where_equals('t.threshold_area_id', area_id)
+        query.order_by = 't.parameter_name, e.equipment_name, a.name'
+        sql, params = query.build()
         
-        async with self.pool.acquire() as conn:
+        pool = await self.get_pool('read')
+        async with pool.acquire() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cursor:
-                await cursor.execute(sql, (equipment_id, equipment_id, area_id, area_id))
+                await cursor.execute(sql, params)
                 return await cursor.fetchall()
     
+    @invalidates('threshold')
     async def update_threshold(self, threshold_id: int, threshold_data: Dict[str, Any]):
         """Обновление порогового значения"""
         sql = '''
@@ -349,7 +1020,8 @@ class DatabaseManager:
             ORDER BY user_username
         '''
         
-        async with self.pool.acquire() as conn:
+        pool = await self.get_pool('read')
+        async with pool.acquire() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cursor:
                 await cursor.execute(sql)
                 return await cursor.fetchall()
@@ -386,6 +1058,7 @@ class DatabaseManager:
                 
                 return user
     
+    @cached_query('system_settings')
     async def get_system_settings(self, category: str = None) -> List[Dict[str, Any]]:
         """Получение системных настроек"""
         if category:
@@ -399,13 +1072,15 @@ class DatabaseManager:
             sql = 'SELECT * FROM system_settings ORDER BY category, setting_key'
             params = ()
         
-        async with self.pool.acquire() as conn:
+        pool = await self.get_pool('read')
+        async with pool.acquire() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cursor:
                 await cursor.execute(sql, params)
                 return await cursor.fetchall()
     
+    @invalidates('system_settings')
     async def update_system_setting(self, setting_key: str, setting_value: str):
-        """Обновление системной настройки"""
+        """Обновление системной настройки (с увеличением версии настроек для кэшей всех процессов)"""
         sql = '''
             UPDATE system_settings 
             SET setting_value = %s, updated_at = NOW()
@@ -415,11 +1090,147 @@ class DatabaseManager:
         async with self.pool.acquire() as conn:
             async with conn.cursor() as cursor:
                 await cursor.execute(sql, (setting_value, setting_key))
+                await cursor.execute('UPDATE settings_version SET version_value = version_value + 1 WHERE version_id = 1')
+        
+        self.settings_cache.invalidate()
+    
+    @invalidates('forecast_accuracy')
+    async def save_forecast_accuracy(self, scores: List[Dict[str, Any]]):
+        """Сохранение оценок точности прогноза одного прогона проверки (analysis/backtesting.py)"""
+        if not scores:
+            return
+        
+        sql = '''
+            INSERT INTO forecast_accuracy
+            (accuracy_model, accuracy_equipment_id, accuracy_horizon_hours, accuracy_mape, accuracy_rmse,
+             accuracy_bias, accuracy_samples, accuracy_period_start, accuracy_period_end, accuracy_evaluated_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        '''
+        evaluated_at = datetime.now().replace(microsecond=0)
+        
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.executemany(sql, [
+                    (score['model'], score['equipment_id'], score['horizon_hours'], score['mape'], score['rmse'],
+                     score['bias'], score['samples'], score['period_start'], score['period_end'], evaluated_at)
+                    for score in scores
+                ])
+    
+    @cached_query('forecast_accuracy')
+    async def get_forecast_accuracy(self, equipment_id: int = None, model: str = 'seasonal',
+                                    max_horizon: int = None) -> List[Dict[str, Any]]:
+        """Оценки точности прогноза последней проверки по часам горизонта (equipment_id=None - весь цех)"""
+        query = QueryBuilder('*', 'forecast_accuracy')
+        query.where('accuracy_model = %s', model)
+        query.where('accuracy_equipment_id <=> %s', equipment_id)
+        query.where('''accuracy_evaluated_at = (
+            SELECT MAX(accuracy_evaluated_at) FROM forecast_accuracy WHERE accuracy_model = %s
+        )''', model)
+        if max_horizon is not None:
+            query.where('accuracy_horizon_hours <= %s', max_horizon)
+        query.order_by = 'accuracy_horizon_hours'
+        sql, params = query.build()
+        
+        pool = await self.get_pool('read')
+        async with pool.acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                await cursor.execute(sql, params)
+                return await cursor.fetchall()
+    
+    @cached_query('tariffs')
+    async def get_tariff(self, at: date) -> Optional[Dict[str, Any]]:
+        """Тариф, действующий на дату, с зонами (analysis/tariffs.py)"""
+        pool = await self.get_pool('read')
+        async with pool.acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                await cursor.execute('''
+                    SELECT * FROM tariffs
+                    WHERE tariff_is_active = TRUE AND tariff_valid_from <= %s
+                    ORDER BY tariff_valid_from DESC
+                    LIMIT 1
+                ''', (at,))
+                tariff = await cursor.fetchone()
+                if tariff is None:
+                    return None
+                
+                await cursor.execute('''
+                    SELECT * FROM tariff_zones WHERE zone_tariff_id = %s ORDER BY zone_day_type, zone_start_hour
+                ''', (tariff['tariff_id'],))
+                tariff['zones'] = await cursor.fetchall()
+                return tariff
     
+    @cached_query('tariffs')
+    async def get_tariff_calendar(self, start_date: date, end_date: date) -> List[Dict[str, Any]]:
+        """Исключения тарифного календаря (праздники, рабочие дни переноса) за даты включительно"""
+        pool = await self.get_pool('read')
+        async with pool.acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                await cursor.execute('''
+                    SELECT * FROM tariff_calendar WHERE calendar_date BETWEEN %s AND %s ORDER BY calendar_date
+                ''', (start_date, end_date))
+                return await cursor.fetchall()
+    
+    @cached_query('energy_readings', 'equipment')
     async def get_energy_statistics(self, equipment_id: int = None, area_id: int = None, 
                                   start_date: datetime = None, end_date: datetime = None) -> List[Dict[str, Any]]:
-        """Получение статистики энергопотребления через хранимую процедуру"""
-        async with self.pool.acquire() as conn:
+        """Получение статистики энергопотребления по оборудованию.
+        
+        Показания выбираются по списку счетчиков и периоду (индекс (meter_id, timestamp)),
+        энергия - сумма рассчитанной при записи энергии интервалов каждого счетчика
+        (энергия оборудования - сумма по его счетчикам).
+        """
+        sql, params = await self._energy_statistics_query(equipment_id, area_id, start_date, end_date)
+        
+        pool = await self.get_pool('analytics')
+        async with pool.acquire() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cursor:
-                await cursor.callproc('GetEnergyStatistics', (equipment_id, area_id, start_date, end_date))
+                await cursor.execute(sql, params)
                 return await cursor.fetchall()
+    
+    async def _energy_statistics_query(self, equipment_id: int = None, area_id: int = None,
+                                       start_date: datetime = None, end_date: datetime = None) -> Tuple[str, List[Any]]:
+        """SQL статистики по оборудованию с фильтром показаний по счетчикам"""
+        readings = QueryBuilder(
+            '''
+                m.meter_equipment_id,
+                er.energy_readings_id,
+                er.energy_readings_active_power_kw,
+                er.energy_readings_power_factor,
+                er.data_quality,
+                er.energy_readings_interval_energy_kwh''',
+            'energy_readings er INNER JOIN meters m ON er.energy_readings_meter_id = m.meter_id'
+        )
+        meter_ids = await self.resolve_meter_ids(equipment_id, area_id)
+        if meter_ids is not None:
+            readings.where_in('er.energy_readings_meter_id', meter_ids)
+        readings.where_between('er.energy_readings_timestamp', start_date, end_date)
+        readings_sql, readings_params = readings.build()
+        
+        query = QueryBuilder(
+            '''
+                e.equipment_id,
+                e.equipment_name,
+                a.name as area_name,
+                et.type_name as equipment_type,
+                COUNT(r.energy_readings_id) as total_measurements,
+                AVG(r.energy_readings_active_power_kw) as avg_active_power,
+                MAX(r.energy_readings_active_power_kw) as max_active_power,
+                MIN(r.energy_readings_active_power_kw) as min_active_power,
+                SUM(r.energy_readings_interval_energy_kwh) as total_energy_kwh,
+                AVG(r.energy_readings_power_factor) as avg_power_factor,
+                MIN(r.energy_readings_power_factor) as min_power_factor,
+                COUNT(CASE WHEN r.data_quality = 'poor' THEN 1 END) as poor_quality_count,
+                COUNT(CASE WHEN r.data_quality = 'bad' THEN 1 END) as bad_quality_count,
+                (AVG(r.energy_readings_active_power_kw) / e.equipment_nominal_power_kw * 100) as avg_load_factor_percent''',
+            f'''equipment e
+            LEFT JOIN areas a ON e.equipment_area_id = a.area_id
+            LEFT JOIN equipment_types et ON e.equipment_type_id = et.type_id
+            LEFT JOIN ({readings_sql}) r ON r.meter_equipment_id = e.equipment_id''',
+            source_params=readings_params
+        )
+        query.where_equals('e.equipment_id', equipment_id)
+        query.where_equals('e.equipment_area_id', area_id)
+        query.group_by = 'e.equipment_id, e.equipment_name, a.name, et.type_name, e.equipment_nominal_power_kw'
+        query.order_by = 'e.equipment_name'
+        
+        return query.build()
@@ -0,0 +1,277 @@
+"""
+Сравнение схем хранения energy_readings: скорость вставки, задержка выборки по счетчику, размер на диске
+"""
+import argparse
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from database.db_manager import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+BENCH_COLUMNS = '''
+    `energy_readings_id` BIGINT NOT NULL AUTO_INCREMENT,
+    `energy_readings_meter_id` INTEGER NOT NULL,
+    `energy_readings_timestamp` TIMESTAMP(3) NOT NULL,
+    `energy_readings_active_power_kw` DECIMAL(12,6),
+    `energy_readings_reactive_power_kvar` DECIMAL(12,6),
+    `energy_readings_apparent_power_kva` DECIMAL(12,6),
+    `energy_readings_power_factor` DECIMAL(5,3),
+    `energy_readings_voltage_l1` DECIMAL(8,2),
+    `energy_readings_voltage_l2` DECIMAL(8,2),
+    `energy_readings_voltage_l3` DECIMAL(8,2),
+    `energy_readings_current_l1` DECIMAL(8,3),
+    `energy_readings_current_l2` DECIMAL(8,3),
+    `energy_readings_current_l3` DECIMAL(8,3),
+    `energy_readings_frequency` DECIMAL(6,3),
+    `energy_readings_total_active_energy` DECIMAL(15,6),
+    `energy_readings_total_reactive_energy` DECIMAL(15,6),
+    `energy_readings_interval_energy_kwh` DOUBLE,
+    `data_quality` ENUM('good', 'poor', 'bad') DEFAULT 'good',
+    `created_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+'''
+
+# Компактная схема (docker/mysql/migrations/002_energy_readings_compact.sql)
+COMPACT_COLUMNS = '''
+    `energy_readings_id` BIGINT NOT NULL AUTO_INCREMENT,
+    `energy_readings_meter_id` INTEGER NOT NULL,
+    `energy_readings_timestamp` TIMESTAMP(3) NOT NULL,
+    `energy_readings_active_power_kw` FLOAT,
+    `energy_readings_reactive_power_kvar` FLOAT,
+    `energy_readings_apparent_power_kva` FLOAT,
+    `energy_readings_power_factor` FLOAT,
+    `energy_readings_voltage_l1` FLOAT,
+    `energy_readings_voltage_l2` FLOAT,
+    `energy_readings_voltage_l3` FLOAT,
+    `energy_readings_current_l1` FLOAT,
+    `energy_readings_current_l2` FLOAT,
+    `energy_readings_current_l3` FLOAT,
+    `energy_readings_frequency` FLOAT,
+    `energy_readings_total_active_energy` DOUBLE,
+    `energy_readings_total_reactive_energy` DOUBLE,
+    `energy_readings_interval_energy_kwh` DOUBLE,
+    `quality_flags` TINYINT UNSIGNED NOT NULL DEFAULT 0,
+    `data_quality` ENUM('good', 'poor', 'bad')
+        AS (CASE WHEN quality_flags & 2 THEN 'bad' WHEN quality_flags & 1 THEN 'poor' ELSE 'good' END) VIRTUAL,
+'''
+
+ID_CLUSTERED_INDEXES = '''
+    PRIMARY KEY(`energy_readings_id`, `energy_readings_timestamp`),
+    INDEX idx_meter_timestamp (energy_readings_meter_id, energy_readings_timestamp),
+    INDEX idx_timestamp (energy_readings_timestamp),
+    INDEX idx_data_quality (data_quality),
+    INDEX idx_energy_readings_composite (energy_readings_meter_id, energy_readings_timestamp,
+        energy_readings_active_power_kw, energy_readings_interval_energy_kwh)
+'''
+
+METER_CLUSTERED_INDEXES = '''
+    PRIMARY KEY(`energy_readings_meter_id`, `energy_readings_timestamp`, `energy_readings_id`),
+    INDEX idx_reading_id (energy_readings_id),
+    INDEX idx_timestamp (energy_readings_timestamp, energy_readings_id)
+'''
+
+# Схема: (столбцы, индексы). id_clustered - до миграции 001, meter_clustered - после нее,
+# compact - после миграции 002
+LAYOUTS = {
+    'id_clustered': (BENCH_COLUMNS, ID_CLUSTERED_INDEXES),
+    'meter_clustered': (BENCH_COLUMNS, METER_CLUSTERED_INDEXES),
+    'compact': (COMPACT_COLUMNS, METER_CLUSTERED_INDEXES),
+}
+
+INSERT_COLUMNS = (
+    'energy_readings_meter_id, energy_readings_timestamp, energy_readings_active_power_kw, '
+    'energy_readings_reactive_power_kvar, energy_readings_apparent_power_kva, energy_readings_power_factor, '
+    'energy_readings_voltage_l1, energy_readings_voltage_l2, energy_readings_voltage_l3, '
+    'energy_readings_current_l1, energy_readings_current_l2, energy_readings_current_l3, '
+    'energy_readings_frequency, energy_readings_total_active_energy, energy_readings_total_reactive_energy, '
+    'energy_readings_interval_energy_kwh'
+)
+
+# Выборка дашборда и аналитики: показания одного счетчика за период (время выборки включает
+# преобразование значений драйвером: Decimal для DECIMAL, float для FLOAT)
+RANGE_QUERY = '''
+    SELECT energy_readings_timestamp, energy_readings_active_power_kw, energy_readings_voltage_l1,
+           energy_readings_current_l1, energy_readings_power_factor
+    FROM {table}
+    WHERE energy_readings_meter_id = %s
+        AND energy_readings_timestamp BETWEEN %s AND %s
+    ORDER BY energy_readings_timestamp
+'''
+
+
+def generate_cycles(meters: int, days: int, interval_seconds: int, seed: int = 1):
+    """Синтетические показания по циклам опроса: в каждом цикле по одному показанию на счетчик"""
+    rng = random.Random(seed)
+    start = datetime.now().replace(microsecond=0) - timedelta(days=days)
+    cycles = days * 86400 // interval_seconds
+    totals = [0.0] * (meters + 1)
+
+    for cycle in range(cycles):
+        timestamp = start + timedelta(seconds=cycle * interval_seconds)
+        rows = []
+        for meter_id in range(1, meters + 1):
+            power = 50 + 30 * rng.random()
+            energy = power * interval_seconds / 3600
+            totals[meter_id] += energy
+            rows.append((
+                meter_id, timestamp, power, power * 0.3, power * 1.05, 0.95,
+                230 + rng.random(), 230 + rng.random(), 230 + rng.random(),
+                power / 0.7, power / 0.7, power / 0.7, 50.0, totals[meter_id], totals[meter_id] * 0.3, energy
+            ))
+        yield rows
+
+
+def percentile(values: List[float], share: float) -> float:
+    """Перцентиль по отсортированному списку"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+class LayoutBenchmark:
+    """Замер на временных таблицах energy_readings_bench_<схема> (рабочая таблица не затрагивается)"""
+
+    def __init__(self, db_manager: DatabaseManager, meters: int = 50, days: int = 7,
+                 interval_seconds: int = 60, range_hours: int = 24, queries: int = 200):
+        self.db_manager = db_manager
+        self.meters = meters
+        self.days = days
+        self.interval_seconds = interval_seconds
+        self.range_hours = range_hours
+        self.queries = queries
+
+    async def run(self, layouts: List[str] = None, keep_tables: bool = False) -> Dict[str, Dict[str, Any]]:
+        """Замер всех схем"""
+        results = {}
+        for layout in layouts or list(LAYOUTS):
+            table = f'energy_readings_bench_{layout}'
+            try:
+                await self._create_table(table, layout)
+                result = await self._measure_inserts(table)
+                result.update(await self._measure_size(table))
+                result.update(await self._measure_range_scans(table))
+                results[layout] = result
+                logger.info(f"Схема {layout}: {result}")
+            finally:
+                if not keep_tables:
+                    await self._execute(f'DROP TABLE IF EXISTS {table}')
+
+        return results
+
+    async def _execute(self, sql: str, args: Any = None):
+        async with self.db_manager.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(sql, args)
+
+    async def _create_table(self, table: str, layout: str):
+        """Создание пустой таблицы со схемой layout"""
+        await self._execute(f'DROP TABLE IF EXISTS {table}')
+        columns, indexes = LAYOUTS[layout]
+        await self._execute(
+            f'CREATE TABLE {table} ({columns} {indexes}) '
+            f'ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci'
+        )
+
+    async def _measure_inserts(self, table: str) -> Dict[str, Any]:
+        """Вставка циклами опроса, как save_energy_readings"""
+        placeholders = ', '.join(['%s'] * len(INSERT_COLUMNS.split(',')))
+        sql = f'INSERT INTO {table} ({INSERT_COLUMNS}) VALUES ({placeholders})'
+        rows = 0
+        batch_seconds = []
+
+        started = time.perf_counter()
+        async with self.db_manager.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                for cycle in generate_cycles(self.meters, self.days, self.interval_seconds):
+                    batch_started = time.perf_counter()
+                    await cursor.executemany(sql, cycle)
+                    batch_seconds.append(time.perf_counter() - batch_started)
+                    rows += len(cycle)
+        elapsed = time.perf_counter() - started
+
+        return {
+            'rows': rows,
+            'insert_rows_per_second': round(rows / elapsed) if elapsed > 0 else 0,
+            'insert_batch_p95_ms': round(percentile(batch_seconds, 0.95) * 1000, 2),
+        }
+
+    async def _measure_size(self, table: str) -> Dict[str, Any]:
+        """Размер данных и индексов после ANALYZE TABLE"""
+        async with self.db_manager.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(f'ANALYZE TABLE {table}')
+                await cursor.fetchall()
+                # Без этого information_schema отдает статистику из кэша (по умолчанию сутки)
+                await cursor.execute('SET SESSION information_schema_stats_expiry = 0')
+                await cursor.execute('''
+                    SELECT DATA_LENGTH, INDEX_LENGTH FROM information_schema.TABLES
+                    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+                ''', (table,))
+                data_length, index_length = await cursor.fetchone()
+
+        return {
+            'data_mb': round(data_length / 1048576, 1),
+            'index_mb': round(index_length / 1048576, 1),
+            'total_mb': round((data_length + index_length) / 1048576, 1),
+        }
+
+    async def _measure_range_scans(self, table: str) -> Dict[str, Any]:
+        """Задержка выборки одного счетчика за range_hours часов"""
+        rng = random.Random(2)
+        sql = RANGE_QUERY.format(table=table)
+        start = datetime.now() - timedelta(days=self.days)
+        span_seconds = max(self.days * 86400 - self.range_hours * 3600, 1)
+        latencies = []
+
+        async with self.db_manager.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                for _ in range(self.queries):
+                    range_start = start + timedelta(seconds=rng.randrange(span_seconds))
+                    range_end = range_start + timedelta(hours=self.range_hours)
+                    query_started = time.perf_counter()
+                    await cursor.execute(sql, (rng.randint(1, self.meters), range_start, range_end))
+                    await cursor.fetchall()
+                    latencies.append(time.perf_counter() - query_started)
+
+        return {
+            'range_scan_p50_ms': round(percentile(latencies, 0.5) * 1000, 2),
+            'range_scan_p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        }
+
+
+async def main(argv: Optional[List[str]] = None):
+    """Запуск сравнения из командной строки"""
+    parser = argparse.ArgumentParser(description='Сравнение схем хранения energy_readings')
+    parser.add_argument('--meters', type=int, default=50, help='Число счетчиков')
+    parser.add_argument('--days', type=int, default=7, help='Период синтетических данных, дни')
+    parser.add_argument('--interval', type=int, default=60, help='Интервал опроса, секунды')
+    parser.add_argument('--range-hours', type=int, default=24, help='Период выборки по счетчику, часы')
+    parser.add_argument('--queries', type=int, default=200, help='Число выборок по счетчику')
+    parser.add_argument('--layout', choices=list(LAYOUTS), action='append', help='Схема (по умолчанию все)')
+    parser.add_argument('--keep-tables', action='store_true', help='Не удалять временные таблицы')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    db_manager = DatabaseManager()
+    await db_manager.initialize()
+    benchmark = LayoutBenchmark(db_manager, meters=args.meters, days=args.days, interval_seconds=args.interval,
+                                range_hours=args.range_hours, queries=args.queries)
+
+    try:
+        results = await benchmark.run(args.layout, keep_tables=args.keep_tables)
+    finally:
+        await db_manager.close()
+
+    metrics = ['rows', 'insert_rows_per_second', 'insert_batch_p95_ms', 'range_scan_p50_ms',
+               'range_scan_p95_ms', 'data_mb', 'index_mb', 'total_mb']
+    print(f"{'':<24}" + ''.join(f'{layout:>18}' for layout in results))
+    for metric in metrics:
+        print(f'{metric:<24}' + ''.join(f'{result[metric]:>18}' for result in results.values()))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
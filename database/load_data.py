@@ -0,0 +1,20 @@
+"""
+Формат текстовых файлов LOAD DATA (массовая загрузка и резервные копии)
+"""
+from datetime import datetime
+from typing import Any
+
+# Значение NULL в файле LOAD DATA
+NULL_VALUE = '\\N'
+
+
+def format_value(value: Any) -> str:
+    """Значение в формате LOAD DATA (FIELDS ESCAPED BY '\\')"""
+    if value is None:
+        return NULL_VALUE
+    if isinstance(value, datetime):
+        text = value.isoformat(sep=' ')
+    else:
+        text = str(value)
+    return (text.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+            .replace('\r', '\\r').replace('\0', '\\0'))
@@ -0,0 +1,105 @@
+"""
+Последние показания по каждому счетчику (таблица meter_latest и кэш в памяти процесса)
+"""
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Столбцы meter_latest совпадают с одноименными столбцами energy_readings
+LATEST_READING_COLUMNS = [
+    'energy_readings_meter_id',
+    'energy_readings_timestamp',
+    'energy_readings_active_power_kw',
+    'energy_readings_reactive_power_kvar',
+    'energy_readings_apparent_power_kva',
+    'energy_readings_power_factor',
+    'energy_readings_voltage_l1',
+    'energy_readings_voltage_l2',
+    'energy_readings_voltage_l3',
+    'energy_readings_current_l1',
+    'energy_readings_current_l2',
+    'energy_readings_current_l3',
+    'energy_readings_frequency',
+    'data_quality',
+]
+
+# Значения заменяются только более новым показанием; метка времени обновляется последней,
+# так как присваивания ON DUPLICATE KEY UPDATE выполняются слева направо
+METER_LATEST_UPSERT_SQL = '''
+    INSERT INTO meter_latest ({columns})
+    VALUES ({placeholders})
+    ON DUPLICATE KEY UPDATE
+        {assignments},
+        energy_readings_timestamp = GREATEST(energy_readings_timestamp, VALUES(energy_readings_timestamp))
+'''.format(
+    columns=', '.join(LATEST_READING_COLUMNS),
+    placeholders=', '.join(['%s'] * len(LATEST_READING_COLUMNS)),
+    assignments=',\n        '.join(
+        f'{column} = IF(VALUES(energy_readings_timestamp) >= energy_readings_timestamp, VALUES({column}), {column})'
+        for column in LATEST_READING_COLUMNS[2:]
+    )
+)
+
+
+def latest_rows_by_meter(rows: List[tuple]) -> List[tuple]:
+    """Самая свежая строка пакета для каждого счетчика (строки в порядке LATEST_READING_COLUMNS)"""
+    latest: Dict[int, tuple] = {}
+
+    for row in rows:
+        meter_id, timestamp = row[0], row[1]
+        if meter_id is None or not isinstance(timestamp, datetime):
+            continue
+        current = latest.get(meter_id)
+        if current is None or timestamp >= current[1]:
+            latest[meter_id] = row
+
+    # Упорядочивание по счетчику исключает взаимоблокировки параллельных пакетов
+    return [latest[meter_id] for meter_id in sorted(latest)]
+
+
+class LatestReadingsCache:
+    """Кэш последних показаний счетчиков в памяти процесса.
+
+    Заполняется после фиксации транзакции записи пакета и при чтении из
+    meter_latest. Показание заменяется только более новым, поэтому порядок
+    поступления пакетов не важен. Записи других процессов попадают в кэш
+    при очередной синхронизации со всей таблицей meter_latest (sync).
+    """
+
+    def __init__(self):
+        self.readings: Dict[int, Dict[str, Any]] = {}
+        self.synced_at: Optional[float] = None
+
+    def update(self, rows: List[tuple]):
+        """Обновление кэша строками в порядке LATEST_READING_COLUMNS"""
+        for row in rows:
+            self.put(dict(zip(LATEST_READING_COLUMNS, row)))
+
+    def put(self, reading: Dict[str, Any]):
+        """Сохранение показания, если оно новее известного"""
+        meter_id = reading['energy_readings_meter_id']
+        current = self.readings.get(meter_id)
+        if current is None or reading['energy_readings_timestamp'] >= current['energy_readings_timestamp']:
+            self.readings[meter_id] = reading
+
+    def sync(self, readings: List[Dict[str, Any]]):
+        """Дополнение кэша всеми строками meter_latest"""
+        for reading in readings:
+            self.put(reading)
+        self.synced_at = time.monotonic()
+
+    def is_fresh(self, max_age: float) -> bool:
+        """Синхронизирован ли кэш с meter_latest не позднее max_age секунд назад"""
+        return self.synced_at is not None and time.monotonic() - self.synced_at < max_age
+
+    def get(self, meter_id: int) -> Optional[Dict[str, Any]]:
+        """Последнее показание счетчика или None"""
+        return self.readings.get(meter_id)
+
+    def clear(self):
+        """Очистка кэша"""
+        self.readings.clear()
+        self.synced_at = None
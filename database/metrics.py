@@ -0,0 +1,297 @@
+"""
+Инструментирование запросов к БД: гистограммы времени, счетчики строк и ошибок, журнал медленных запросов
+"""
+import asyncio
+import logging
+import random
+import re
+import sys
+import time
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger('database.slow_queries')
+
+# Верхние границы интервалов гистограмм, секунды
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Histogram:
+    """Гистограмма с фиксированными интервалами (формат Prometheus)"""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        """Добавление наблюдения"""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """Накопленные значения по границам интервалов, включая +Inf"""
+        result = []
+        total = 0
+        for bound, count in zip(list(self.buckets) + ['+Inf'], self.counts):
+            total += count
+            result.append((str(bound), total))
+        return result
+
+
+class QueryMetrics:
+    """Метрики запросов по методам DatabaseManager (фазы acquire, execute, fetch).
+
+    Запросы дольше slow_query_seconds пишутся в журнал database.slow_queries
+    без значений параметров. При explain_sample_rate > 0 для доли медленных
+    SELECT в фоне снимается план EXPLAIN ANALYZE.
+    """
+
+    def __init__(self, slow_query_seconds: float = 1.0, explain_sample_rate: float = 0.0):
+        self.slow_query_seconds = slow_query_seconds
+        self.explain_sample_rate = explain_sample_rate
+        self.histograms: Dict[Tuple[str, str], Histogram] = {}
+        self.rows: Dict[str, int] = {}
+        self.queries: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.background_tasks = set()
+
+    def observe(self, method: str, phase: str, seconds: float):
+        """Учет длительности фазы запроса"""
+        key = (method, phase)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.observe(seconds)
+
+    def add_rows(self, method: str, count: int):
+        """Учет числа прочитанных или измененных строк"""
+        if count and count > 0:
+            self.rows[method] = self.rows.get(method, 0) + count
+
+    def add_query(self, method: str):
+        """Учет выполненного запроса"""
+        self.queries[method] = self.queries.get(method, 0) + 1
+
+    def add_error(self, method: str):
+        """Учет ошибки запроса"""
+        self.errors[method] = self.errors.get(method, 0) + 1
+
+    def log_slow_query(self, method: str, seconds: float, sql: str, args: Any):
+        """Запись медленного запроса в журнал (параметры не раскрываются)"""
+        slow_query_logger.warning(
+            f"Медленный запрос {method}: {seconds * 1000:.1f} мс; "
+            f"{normalize_sql(sql)}; параметров: {count_params(args)} (скрыты)"
+        )
+
+    def should_explain(self, sql: str) -> bool:
+        """Нужно ли снять план EXPLAIN ANALYZE для медленного запроса"""
+        return (
+            self.explain_sample_rate > 0
+            and sql.lstrip().upper().startswith('SELECT')
+            and random.random() < self.explain_sample_rate
+        )
+
+    def render_prometheus(self) -> str:
+        """Метрики в текстовом формате Prometheus"""
+        lines = [
+            '# HELP db_query_duration_seconds Длительность фаз запросов к БД по методам',
+            '# TYPE db_query_duration_seconds histogram',
+        ]
+        for (method, phase), histogram in sorted(self.histograms.items()):
+            labels = f'method="{method}",phase="{phase}"'
+            for bound, total in histogram.cumulative():
+                lines.append(f'db_query_duration_seconds_bucket{{{labels},le="{bound}"}} {total}')
+            lines.append(f'db_query_duration_seconds_sum{{{labels}}} {histogram.sum:.6f}')
+            lines.append(f'db_query_duration_seconds_count{{{labels}}} {histogram.count}')
+
+        for name, help_text, values in (
+            ('db_queries_total', 'Число запросов по методам', self.queries),
+            ('db_query_rows_total', 'Число строк, прочитанных или измененных запросами', self.rows),
+            ('db_query_errors_total', 'Число ошибок запросов по методам', self.errors),
+        ):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} counter')
+            for method, value in sorted(values.items()):
+                lines.append(f'{name}{{method="{method}"}} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def normalize_sql(sql: str, max_length: int = 500) -> str:
+    """Однострочный текст запроса ограниченной длины"""
+    text = re.sub(r'\s+', ' ', sql).strip()
+    return text if len(text) <= max_length else text[:max_length] + '...'
+
+
+def count_params(args: Any) -> int:
+    """Число параметров запроса"""
+    if args is None:
+        return 0
+    if isinstance(args, (list, tuple, dict)):
+        return len(args)
+    return 1
+
+
+class InstrumentedCursor:
+    """Курсор с учетом времени выполнения, выборки и числа строк"""
+
+    def __init__(self, cursor, pool, metrics: QueryMetrics, method: str):
+        self._cursor = cursor
+        self._pool = pool
+        self._metrics = metrics
+        self._method = method
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    async def execute(self, query: str, args: Any = None):
+        return await self._timed_execute(self._cursor.execute, query, args)
+
+    async def executemany(self, query: str, args: Any):
+        return await self._timed_execute(self._cursor.executemany, query, args)
+
+    async def callproc(self, procname: str, args: Any = ()):
+        return await self._timed_execute(
+            lambda _, call_args: self._cursor.callproc(procname, call_args), f'CALL {procname}', args
+        )
+
+    async def fetchone(self):
+        row = await self._timed_fetch(self._cursor.fetchone)
+        self._metrics.add_rows(self._method, 1 if row is not None else 0)
+        return row
+
+    async def fetchmany(self, size: Optional[int] = None):
+        rows = await self._timed_fetch(self._cursor.fetchmany, size)
+        self._metrics.add_rows(self._method, len(rows))
+        return rows
+
+    async def fetchall(self):
+        rows = await self._timed_fetch(self._cursor.fetchall)
+        self._metrics.add_rows(self._method, len(rows))
+        return rows
+
+    async def _timed_execute(self, func, query: str, args: Any):
+        started = time.perf_counter()
+        try:
+            result = await func(query, args)
+        except Exception:
+            self._metrics.add_error(self._method)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self._metrics.observe(self._method, 'execute', elapsed)
+            self._metrics.add_query(self._method)
+
+        # Для SELECT строки учитываются при выборке, для изменений - по rowcount
+        if not query.lstrip().upper().startswith('SELECT'):
+            self._metrics.add_rows(self._method, self._cursor.rowcount)
+
+        if elapsed >= self._metrics.slow_query_seconds:
+            self._metrics.log_slow_query(self._method, elapsed, query, args)
+            if self._metrics.should_explain(query):
+                task = asyncio.create_task(explain_analyze(self._pool, self._method, query, args))
+                self._metrics.background_tasks.add(task)
+                task.add_done_callback(self._metrics.background_tasks.discard)
+
+        return result
+
+    async def _timed_fetch(self, func, *args):
+        started = time.perf_counter()
+        try:
+            return await func(*args)
+        except Exception:
+            self._metrics.add_error(self._method)
+            raise
+        finally:
+            self._metrics.observe(self._method, 'fetch', time.perf_counter() - started)
+
+
+class _InstrumentedCursorContext:
+    """Контекстный менеджер conn.cursor(...) с инструментированным курсором"""
+
+    def __init__(self, connection, pool, metrics: QueryMetrics, method: str, args: tuple):
+        self._connection = connection
+        self._pool = pool
+        self._metrics = metrics
+        self._method = method
+        self._args = args
+        self._cursor = None
+
+    async def __aenter__(self):
+        self._cursor = await self._connection.cursor(*self._args)
+        return InstrumentedCursor(self._cursor, self._pool, self._metrics, self._method)
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._cursor.close()
+
+
+class InstrumentedConnection:
+    """Соединение, выдающее инструментированные курсоры"""
+
+    def __init__(self, connection, pool, metrics: QueryMetrics, method: str):
+        self._connection = connection
+        self._pool = pool
+        self._metrics = metrics
+        self._method = method
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def cursor(self, *args):
+        return _InstrumentedCursorContext(self._connection, self._pool, self._metrics, self._method, args)
+
+
+class _InstrumentedAcquire:
+    """Получение соединения из пула с учетом времени ожидания"""
+
+    def __init__(self, pool, metrics: QueryMetrics, method: str):
+        self._pool = pool
+        self._metrics = metrics
+        self._method = method
+        self._context = None
+
+    async def __aenter__(self):
+        started = time.perf_counter()
+        self._context = self._pool.acquire()
+        try:
+            connection = await self._context.__aenter__()
+        except Exception:
+            self._metrics.add_error(self._method)
+            raise
+        finally:
+            self._metrics.observe(self._method, 'acquire', time.perf_counter() - started)
+        return InstrumentedConnection(connection, self._pool, self._metrics, self._method)
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return await self._context.__aexit__(exc_type, exc, tb)
+
+
+class InstrumentedPool:
+    """Обертка пула aiomysql: метрики помечаются именем метода, получившего соединение"""
+
+    def __init__(self, pool, metrics: QueryMetrics):
+        self._pool = pool
+        self._metrics = metrics
+
+    def __getattr__(self, name):
+        return getattr(self._pool, name)
+
+    def acquire(self):
+        # Метка - функция, вызвавшая acquire() (метод DatabaseManager, PartitionManager и т.д.)
+        method = sys._getframe(1).f_code.co_name
+        return _InstrumentedAcquire(self._pool, self._metrics, method)
+
+
+async def explain_analyze(pool, method: str, query: str, args: Any):
+    """Снятие плана EXPLAIN ANALYZE медленного запроса на отдельном соединении"""
+    try:
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(f'EXPLAIN ANALYZE {query}', args)
+                plan = '\n'.join(row[0] for row in await cursor.fetchall())
+        slow_query_logger.warning(f"EXPLAIN ANALYZE {method}:\n{plan}")
+    except Exception as e:
+        logger.error(f"Ошибка получения плана запроса {method}: {e}")
@@ -0,0 +1,201 @@
+"""
+Обслуживание секций таблиц временных рядов
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import aiomysql
+from database.db_manager import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+# Секционированные таблицы и столбец времени, по которому они секционированы
+PARTITIONED_TABLES = {
+    'energy_readings': 'energy_readings_timestamp',
+    'equipment_states': 'state_timestamp',
+    'logs': 'log_timestamp',
+}
+
+FUTURE_PARTITION = 'p_future'
+
+
+class PartitionManager:
+    """Создание будущих и удаление устаревших секций по RANGE (UNIX_TIMESTAMP(...)).
+
+    Удаление секции выполняется мгновенно и не нагружает undo-лог в отличие от
+    построчного DELETE. Запросы с фильтром по времени автоматически обращаются
+    только к нужным секциям (partition pruning).
+    """
+
+    def __init__(self, db_manager: DatabaseManager, granularity: str = None, periods_ahead: int = None):
+        settings = db_manager.settings
+        self.db_manager = db_manager
+        self.granularity = granularity or getattr(settings, 'PARTITION_GRANULARITY', 'month')
+        self.periods_ahead = periods_ahead or getattr(settings, 'PARTITIONS_AHEAD', 3)
+        self.running = False
+
+        if self.granularity not in ('month', 'day'):
+            raise ValueError(f"Неподдерживаемая гранулярность секций: {self.granularity}")
+
+    def _period_start(self, moment: datetime) -> datetime:
+        """Начало периода секции, содержащего момент времени"""
+        if self.granularity == 'day':
+            return datetime(moment.year, moment.month, moment.day)
+        return datetime(moment.year, moment.month, 1)
+
+    def _next_period(self, period_start: datetime) -> datetime:
+        """Начало следующего периода"""
+        if self.granularity == 'day':
+            return period_start + timedelta(days=1)
+        if period_start.month == 12:
+            return datetime(period_start.year + 1, 1, 1)
+        return datetime(period_start.year, period_start.month + 1, 1)
+
+    def _partition_name(self, period_start: datetime) -> str:
+        """Имя секции по началу периода: p202401 или p20240115"""
+        if self.granularity == 'day':
+            return period_start.strftime('p%Y%m%d')
+        return period_start.strftime('p%Y%m')
+
+    async def get_partitions(self, table: str) -> List[Dict[str, Any]]:
+        """Список секций таблицы с верхней границей (None для p_future)"""
+        sql = '''
+            SELECT
+                PARTITION_NAME as name,
+                IF(PARTITION_DESCRIPTION = 'MAXVALUE', NULL, FROM_UNIXTIME(PARTITION_DESCRIPTION)) as upper_bound,
+                TABLE_ROWS as table_rows
+            FROM information_schema.PARTITIONS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+            ORDER BY PARTITION_ORDINAL_POSITION
+        '''
+
+        async with self.db_manager.pool.acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                await cursor.execute(sql, (table,))
+                return await cursor.fetchall()
+
+    async def ensure_future_partitions(self, table: str) -> List[str]:
+        """Создание секций вперед на periods_ahead периодов разбиением p_future"""
+        partitions = await self.get_partitions(table)
+        if not partitions:
+            logger.warning(f"Таблица {table} не секционирована, обслуживание секций пропущено")
+            return []
+
+        bounds = [p['upper_bound'] for p in partitions if p['upper_bound'] is not None]
+        last_bound = max(bounds) if bounds else None
+
+        # Первая секция покрывает текущий период и все более ранние данные
+        period_start = self._period_start(datetime.now())
+        if last_bound is not None and last_bound > period_start:
+            period_start = self._period_start(last_bound)
+
+        horizon = self._period_start(datetime.now())
+        for _ in range(self.periods_ahead + 1):
+            horizon = self._next_period(horizon)
+
+        new_partitions = []
+        while period_start < horizon:
+            upper_bound = self._next_period(period_start)
+            if last_bound is None or upper_bound > last_bound:
+                new_partitions.append((self._partition_name(period_start), upper_bound))
+            period_start = upper_bound
+
+        if not new_partitions:
+            return []
+
+        definitions = ', '.join(
+            f"PARTITION {name} VALUES LESS THAN (UNIX_TIMESTAMP('{bound:%Y-%m-%d %H:%M:%S}'))"
+            for name, bound in new_partitions
+        )
+        sql = f'''
+            ALTER TABLE {table} REORGANIZE PARTITION {FUTURE_PARTITION} INTO (
+                {definitions},
+                PARTITION {FUTURE_PARTITION} VALUES LESS THAN MAXVALUE
+            )
+        '''
+
+        async with self.db_manager.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(sql)
+
+        created = [name for name, _ in new_partitions]
+        logger.info(f"Созданы секции {table}: {', '.join(created)}")
+        return created
+
+    async def drop_expired_partitions(self, table: str, retention_days: int) -> List[str]:
+        """Удаление секций, все данные которых старше срока хранения"""
+        cutoff = datetime.now() - timedelta(days=retention_days)
+        partitions = await self.get_partitions(table)
+
+        # Последняя датированная секция не удаляется, чтобы не оставить таблицу только с p_future
+        dated = [p for p in partitions if p['upper_bound'] is not None]
+        expired = [p['name'] for p in dated[:-1] if p['upper_bound'] <= cutoff]
+
+        if table == 'logs':
+            expired = await self._exclude_partitions_with_open_logs(expired)
+
+        if not expired:
+            return []
+
+        async with self.db_manager.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(f"ALTER TABLE {table} DROP PARTITION {', '.join(expired)}")
+
+        logger.info(f"Удалены устаревшие секции {table}: {', '.join(expired)}")
+        return expired
+
+    async def _exclude_partitions_with_open_logs(self, partition_names: List[str]) -> List[str]:
+        """Секции логов с неразрешенными уведомлениями не удаляются"""
+        droppable = []
+
+        async with self.db_manager.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                for name in partition_names:
+                    await cursor.execute(
+                        f"SELECT COUNT(*) FROM logs PARTITION ({name}) "
+                        f"WHERE log_status IN ('new', 'acknowledged')"
+                    )
+                    (open_count,) = await cursor.fetchone()
+                    if open_count:
+                        logger.warning(f"Секция logs {name} содержит {open_count} активных уведомлений и не удалена")
+                    else:
+                        droppable.append(name)
+
+        return droppable
+
+    async def _get_retention_days(self) -> int:
+        """Срок хранения данных из системных настроек"""
+        return await self.db_manager.settings_cache.get('data_retention_days', 365)
+
+    async def run_maintenance(self, retention_days: Optional[int] = None) -> Dict[str, Any]:
+        """Полный цикл обслуживания секций всех таблиц"""
+        if retention_days is None:
+            retention_days = await self._get_retention_days()
+
+        result = {}
+        for table in PARTITIONED_TABLES:
+            try:
+                result[table] = {
+                    'created': await self.ensure_future_partitions(table),
+                    'dropped': await self.drop_expired_partitions(table, retention_days),
+                }
+            except Exception as e:
+                logger.error(f"Ошибка обслуживания секций {table}: {e}")
+                result[table] = {'error': str(e)}
+
+        return result
+
+    async def run_forever(self, interval_hours: int = None):
+        """Периодическое обслуживание секций"""
+        interval_hours = interval_hours or getattr(self.db_manager.settings, 'MAINTENANCE_INTERVAL_HOURS', 24)
+        self.running = True
+
+        while self.running:
+            await self.run_maintenance()
+            await asyncio.sleep(interval_hours * 3600)
+
+    def stop(self):
+        """Остановка периодического обслуживания"""
+        self.running = False
@@ -0,0 +1,230 @@
+"""
+Фоновая очистка устаревших строк пакетами по первичному ключу
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import aiomysql
+from database.db_manager import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+# Очищаемые таблицы: ключ пакетов (первый столбец первичного ключа), столбец времени и условие отбора
+PURGE_TABLES = {
+    'logs': {
+        'key': 'log_id',
+        'time': 'log_timestamp',
+        'condition': "log_status IN ('resolved', 'ignored')",
+    },
+    'equipment_states': {
+        'key': 'state_id',
+        'time': 'state_timestamp',
+        'condition': None,
+    },
+}
+
+# Метод, по задержке которого судят о нагрузке на запись показаний
+INGEST_METHOD = 'save_energy_readings'
+
+
+class PurgeJob:
+    """Построчная очистка строк старше срока хранения, не мешающая записи показаний.
+
+    Целые устаревшие секции удаляет PartitionManager; здесь удаляются строки из
+    секций, которые еще нельзя сбросить. Каждый пакет - отдельная короткая
+    транзакция вместе с сохранением прогресса в purge_progress, поэтому после
+    перезапуска очистка продолжается с последнего ключа. Пауза между пакетами
+    растет при отставании реплики или росте задержки записи показаний.
+    """
+
+    def __init__(self, db_manager: DatabaseManager, batch_size: int = None,
+                 max_insert_latency: float = None):
+        settings = db_manager.settings
+        self.db_manager = db_manager
+        self.batch_size = batch_size or getattr(settings, 'PURGE_BATCH_SIZE', 5000)
+        self.max_insert_latency = max_insert_latency or getattr(settings, 'PURGE_MAX_INSERT_LATENCY', 0.5)
+        self.backoff = 1
+        self.ingest_snapshot = (0.0, 0)
+        self.task: Optional[asyncio.Task] = None
+        self.running = False
+
+    @property
+    def is_active(self) -> bool:
+        """Выполняется ли очистка"""
+        return self.task is not None and not self.task.done()
+
+    def start(self, retention_days: Optional[int] = None) -> bool:
+        """Запуск очистки в фоне (если она еще не выполняется)"""
+        if self.is_active:
+            return False
+        self.task = asyncio.create_task(self.run(retention_days))
+        return True
+
+    async def run(self, retention_days: Optional[int] = None) -> Dict[str, int]:
+        """Очистка всех таблиц; прерванная очистка продолжается с сохраненного ключа"""
+        if retention_days is None:
+            retention_days = await self._get_retention_days()
+        cutoff = datetime.now() - timedelta(days=retention_days)
+
+        result = {}
+        for table in PURGE_TABLES:
+            try:
+                result[table] = await self.purge_table(table, cutoff)
+            except Exception as e:
+                logger.error(f"Ошибка очистки {table}: {e}")
+                await self._save_status(table, 'failed', str(e))
+                result[table] = 0
+
+        return result
+
+    async def purge_table(self, table: str, cutoff: datetime) -> int:
+        """Очистка таблицы пакетами по batch_size строк"""
+        config = PURGE_TABLES[table]
+        progress = await self._load_progress(table)
+
+        if progress and progress['purge_status'] == 'running':
+            cutoff = progress['purge_cutoff']
+            last_key = progress['purge_last_key']
+            deleted = progress['purge_rows_deleted']
+            logger.info(f"Продолжение очистки {table} с ключа {last_key} (граница {cutoff})")
+        else:
+            last_key, deleted = 0, 0
+            await self._start_progress(table, cutoff)
+
+        condition = f"{config['time']} < %s"
+        if config['condition']:
+            condition += f" AND {config['condition']}"
+
+        select_sql = f'''
+            SELECT {config['key']} FROM {table}
+            WHERE {config['key']} > %s AND {condition}
+            ORDER BY {config['key']}
+            LIMIT %s
+        '''
+
+        while True:
+            started = time.perf_counter()
+
+            async with self.db_manager.pool.acquire() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(select_sql, (last_key, cutoff, self.batch_size))
+                    keys = [row[0] for row in await cursor.fetchall()]
+                    if not keys:
+                        break
+
+                    # Условие повторяется: строка могла измениться после выборки ключей
+                    placeholders = ', '.join(['%s'] * len(keys))
+                    await conn.begin()
+                    try:
+                        await cursor.execute(
+                            f"DELETE FROM {table} WHERE {config['key']} IN ({placeholders}) AND {condition}",
+                            (*keys, cutoff)
+                        )
+                        deleted += cursor.rowcount
+                        last_key = keys[-1]
+                        await cursor.execute('''
+                            UPDATE purge_progress
+                            SET purge_last_key = %s, purge_rows_deleted = %s
+                            WHERE purge_table = %s
+                        ''', (last_key, deleted, table))
+                        await conn.commit()
+                    except Exception:
+                        await conn.rollback()
+                        raise
+
+            await asyncio.sleep(await self._throttle_delay(time.perf_counter() - started))
+
+        await self._save_status(table, 'completed')
+        logger.info(f"Очистка {table} завершена: удалено {deleted} строк старше {cutoff}")
+        return deleted
+
+    async def _throttle_delay(self, batch_seconds: float) -> float:
+        """Пауза после пакета: не меньше времени пакета, больше при отставании реплики и медленной записи"""
+        latency = self._recent_ingest_latency()
+        if latency is not None and latency > self.max_insert_latency:
+            self.backoff = min(self.backoff * 2, 64)
+        else:
+            self.backoff = 1
+        delay = max(batch_seconds, 0.05) * self.backoff
+
+        lag = await self.db_manager.get_replica_lag()
+        if lag is not None and lag > self.db_manager.settings.DATABASE.replica_max_lag_seconds:
+            delay = max(delay, float(lag))
+
+        return delay
+
+    def _recent_ingest_latency(self) -> Optional[float]:
+        """Средняя задержка записи показаний с момента предыдущей проверки"""
+        histogram = self.db_manager.metrics.histograms.get((INGEST_METHOD, 'execute'))
+        if histogram is None:
+            return None
+
+        previous_sum, previous_count = self.ingest_snapshot
+        self.ingest_snapshot = (histogram.sum, histogram.count)
+        count = histogram.count - previous_count
+        return (histogram.sum - previous_sum) / count if count > 0 else None
+
+    async def _get_retention_days(self) -> int:
+        """Срок хранения данных из системных настроек"""
+        return await self.db_manager.settings_cache.get('data_retention_days', 365)
+
+    async def _load_progress(self, table: str) -> Optional[Dict[str, Any]]:
+        """Сохраненный прогресс очистки таблицы"""
+        async with self.db_manager.pool.acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                await cursor.execute('SELECT * FROM purge_progress WHERE purge_table = %s', (table,))
+                return await cursor.fetchone()
+
+    async def _start_progress(self, table: str, cutoff: datetime):
+        """Начало нового прохода очистки"""
+        async with self.db_manager.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute('''
+                    INSERT INTO purge_progress
+                    (purge_table, purge_cutoff, purge_last_key, purge_rows_deleted, purge_status,
+                     purge_started_at, purge_finished_at, purge_error)
+                    VALUES (%s, %s, 0, 0, 'running', NOW(), NULL, NULL)
+                    ON DUPLICATE KEY UPDATE
+                        purge_cutoff = VALUES(purge_cutoff),
+                        purge_last_key = 0,
+                        purge_rows_deleted = 0,
+                        purge_status = 'running',
+                        purge_started_at = NOW(),
+                        purge_finished_at = NULL,
+                        purge_error = NULL
+                ''', (table, cutoff))
+
+    async def _save_status(self, table: str, status: str, error: str = None):
+        """Завершение прохода очистки"""
+        async with self.db_manager.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute('''
+                    UPDATE purge_progress
+                    SET purge_status = %s, purge_finished_at = NOW(), purge_error = %s
+                    WHERE purge_table = %s
+                ''', (status, error, table))
+
+    async def get_progress(self) -> List[Dict[str, Any]]:
+        """Прогресс очистки по таблицам"""
+        async with self.db_manager.pool.acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                await cursor.execute('SELECT * FROM purge_progress ORDER BY purge_table')
+                return await cursor.fetchall()
+
+    async def run_forever(self, interval_hours: int = None):
+        """Периодическая очистка (первый проход сразу - продолжает прерванную очистку)"""
+        interval_hours = interval_hours or getattr(self.db_manager.settings, 'PURGE_INTERVAL_HOURS', 24)
+        self.running = True
+
+        while self.running:
+            if not self.is_active:
+                self.task = asyncio.create_task(self.run())
+            await asyncio.wait({self.task})
+            await asyncio.sleep(interval_hours * 3600)
+
+    def stop(self):
+        """Остановка периодической очистки"""
+        self.running = False
@@ -0,0 +1,73 @@
+"""
+Построитель SQL-запросов с условиями только по заданным фильтрам
+"""
+import logging
+from typing import Any, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBuilder:
+    """Сборка SELECT с необязательными фильтрами.
+
+    В отличие от условий вида "(%s IS NULL OR col = %s)" в запрос попадают
+    только заданные фильтры, поэтому оптимизатор видит точные предикаты и
+    может использовать составные индексы (например, (meter_id, timestamp)).
+    """
+
+    def __init__(self, select: str, source: str, source_params: Sequence[Any] = ()):
+        self.select = select
+        self.source = source
+        # Параметры подзапросов в source предшествуют параметрам условий WHERE
+        self.source_params = list(source_params)
+        self.conditions: List[str] = []
+        self.params: List[Any] = []
+        self.group_by = ''
+        self.order_by = ''
+        self.limit = None
+
+    def where(self, condition: str, *params: Any) -> 'QueryBuilder':
+        """Добавление условия с параметрами"""
+        self.conditions.append(condition)
+        self.params.extend(params)
+        return self
+
+    def where_equals(self, column: str, value: Any) -> 'QueryBuilder':
+        """Условие равенства, если значение задано"""
+        if value is not None:
+            self.where(f'{column} = %s', value)
+        return self
+
+    def where_in(self, column: str, values: Sequence[Any]) -> 'QueryBuilder':
+        """Условие принадлежности списку (пустой список - пустой результат)"""
+        if not values:
+            return self.where('1 = 0')
+        placeholders = ', '.join(['%s'] * len(values))
+        return self.where(f'{column} IN ({placeholders})', *values)
+
+    def where_between(self, column: str, start: Any, end: Any) -> 'QueryBuilder':
+        """Условие по диапазону с необязательными границами"""
+        if start is not None and end is not None:
+            self.where(f'{column} BETWEEN %s AND %s', start, end)
+        elif start is not None:
+            self.where(f'{column} >= %s', start)
+        elif end is not None:
+            self.where(f'{column} <= %s', end)
+        return self
+
+    def build(self) -> Tuple[str, List[Any]]:
+        """Текст запроса и список параметров"""
+        sql = f'SELECT {self.select} FROM {self.source}'
+        if self.conditions:
+            sql += ' WHERE ' + ' AND '.join(self.conditions)
+        if self.group_by:
+            sql += f' GROUP BY {self.group_by}'
+        if self.order_by:
+            sql += f' ORDER BY {self.order_by}'
+
+        params = self.source_params + self.params
+        if self.limit is not None:
+            sql += ' LIMIT %s'
+            params.append(self.limit)
+
+        return sql, params
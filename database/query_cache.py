@@ -0,0 +1,151 @@
+"""
+Кэш результатов запросов чтения с временем жизни и сбросом при записи
+"""
+import asyncio
+import functools
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCache:
+    """Кэш результатов запросов в памяти процесса.
+
+    Записи живут не дольше ttl_seconds, при превышении max_entries удаляются
+    давно не использованные (LRU). Одновременные одинаковые запросы выполняются
+    один раз (single-flight): остальные вызовы ожидают результат первого.
+    Каждая запись помечена таблицами, от которых зависит; запись в таблицу
+    сбрасывает все зависящие от нее записи. Результаты отдаются вызывающим
+    без копирования и не должны изменяться.
+    """
+
+    def __init__(self, ttl_seconds: float = 30.0, max_entries: int = 256):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.entries: 'OrderedDict[Hashable, Tuple[float, Tuple[str, ...], Any]]' = OrderedDict()
+        self.inflight: Dict[Hashable, asyncio.Future] = {}
+        # Версии таблиц: результат запроса, начатого до записи в таблицу, не кэшируется
+        self.table_versions: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get_or_load(self, key: Hashable, tables: Iterable[str], loader: Callable[[], Awaitable[Any]],
+                          ttl_seconds: Optional[float] = None) -> Any:
+        """Значение из кэша или результат loader() с сохранением в кэш"""
+        entry = self.entries.get(key)
+        if entry is not None:
+            expires_at, _, value = entry
+            if expires_at > time.monotonic():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self.entries[key]
+
+        future = self.inflight.get(key)
+        if future is not None:
+            self.hits += 1
+            return await asyncio.shield(future)
+
+        self.misses += 1
+        tables = tuple(tables)
+        versions = self._versions(tables)
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[key] = future
+
+        try:
+            value = await loader()
+        except Exception as e:
+            future.set_exception(e)
+            # Исключение получают ожидающие вызовы; без них не логируем "never retrieved"
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+        finally:
+            self.inflight.pop(key, None)
+            if not future.done():
+                future.cancel()
+
+        if self._versions(tables) == versions:
+            self._store(key, tables, value, self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        return value
+
+    def invalidate(self, *tables: str):
+        """Сброс записей, зависящих от указанных таблиц"""
+        for table in tables:
+            self.table_versions[table] = self.table_versions.get(table, 0) + 1
+
+        stale = [key for key, (_, entry_tables, _) in self.entries.items()
+                 if any(table in entry_tables for table in tables)]
+        for key in stale:
+            del self.entries[key]
+
+    def clear(self):
+        """Полная очистка кэша"""
+        self.entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика использования кэша"""
+        total = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'inflight': len(self.inflight),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / total, 3) if total else 0.0
+        }
+
+    def _versions(self, tables: Tuple[str, ...]) -> Tuple[int, ...]:
+        """Текущие версии таблиц"""
+        return tuple(self.table_versions.get(table, 0) for table in tables)
+
+    def _store(self, key: Hashable, tables: Tuple[str, ...], value: Any, ttl_seconds: float):
+        """Сохранение значения с вытеснением давно не использованных записей"""
+        if ttl_seconds <= 0:
+            return
+
+        self.entries[key] = (time.monotonic() + ttl_seconds, tables, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+def cached_query(*tables: str, ttl_seconds: Optional[float] = None):
+    """Кэширование результата метода чтения (ключ - имя метода и аргументы).
+
+    Метод должен принадлежать объекту с атрибутом query_cache.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        async def wrapper(self, *args, **kwargs):
+            cache: Optional[QueryCache] = getattr(self, 'query_cache', None)
+            if cache is None:
+                return await method(self, *args, **kwargs)
+
+            key = (method.__name__, args, tuple(sorted(kwargs.items())))
+            try:
+                hash(key)
+            except TypeError:
+                return await method(self, *args, **kwargs)
+
+            return await cache.get_or_load(key, tables, lambda: method(self, *args, **kwargs), ttl_seconds)
+        return wrapper
+    return decorator
+
+
+def invalidates(*tables: str):
+    """Сброс кэша зависимых запросов после метода записи (и при ошибке - запись могла пройти частично)"""
+    def decorator(method):
+        @functools.wraps(method)
+        async def wrapper(self, *args, **kwargs):
+            try:
+                return await method(self, *args, **kwargs)
+            finally:
+                cache: Optional[QueryCache] = getattr(self, 'query_cache', None)
+                if cache is not None:
+                    cache.invalidate(*tables)
+        return wrapper
+    return decorator
@@ -0,0 +1,197 @@
+"""
+Инкрементальные агрегаты показаний по счетчикам (1 минута / 1 час / 1 сутки)
+"""
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Уровни агрегации от мелкого к крупному: (название, таблица, длительность интервала в секундах)
+ROLLUP_LEVELS = [
+    ('1m', 'energy_rollup_1m', 60),
+    ('1h', 'energy_rollup_1h', 3600),
+    ('1d', 'energy_rollup_1d', 86400),
+]
+
+# Разрыв между показаниями, после которого энергия интервала не учитывается (как в RebuildEnergyRollups)
+MAX_ENERGY_GAP_SECONDS = 900
+
+ROLLUP_UPSERT_SQL = '''
+    INSERT INTO {table} (
+        rollup_meter_id, rollup_bucket_start, readings_count, active_power_count, active_power_sum,
+        active_power_min, active_power_max, active_power_last, last_timestamp,
+        power_factor_count, power_factor_sum, power_factor_min, energy_kwh,
+        good_count, poor_count, bad_count
+    )
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        readings_count = readings_count + VALUES(readings_count),
+        active_power_count = active_power_count + VALUES(active_power_count),
+        active_power_sum = active_power_sum + VALUES(active_power_sum),
+        active_power_min = LEAST(COALESCE(active_power_min, VALUES(active_power_min)),
+                                 COALESCE(VALUES(active_power_min), active_power_min)),
+        active_power_max = GREATEST(COALESCE(active_power_max, VALUES(active_power_max)),
+                                    COALESCE(VALUES(active_power_max), active_power_max)),
+        active_power_last = IF(last_timestamp IS NULL OR VALUES(last_timestamp) >= last_timestamp,
+                               VALUES(active_power_last), active_power_last),
+        last_timestamp = GREATEST(COALESCE(last_timestamp, VALUES(last_timestamp)), VALUES(last_timestamp)),
+        power_factor_count = power_factor_count + VALUES(power_factor_count),
+        power_factor_sum = power_factor_sum + VALUES(power_factor_sum),
+        power_factor_min = LEAST(COALESCE(power_factor_min, VALUES(power_factor_min)),
+                                 COALESCE(VALUES(power_factor_min), power_factor_min)),
+        energy_kwh = energy_kwh + VALUES(energy_kwh),
+        good_count = good_count + VALUES(good_count),
+        poor_count = poor_count + VALUES(poor_count),
+        bad_count = bad_count + VALUES(bad_count)
+'''
+
+
+def bucket_start(timestamp: datetime, seconds: int) -> datetime:
+    """Начало интервала агрегации, содержащего момент времени"""
+    if seconds == 60:
+        return timestamp.replace(second=0, microsecond=0)
+    if seconds == 3600:
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def select_rollup_level(start_time: datetime, end_time: datetime, resolution_seconds: int) -> Tuple[str, str, int]:
+    """Выбор самого крупного уровня агрегации, не превышающего разрешение и длину периода"""
+    period_seconds = (end_time - start_time).total_seconds()
+    selected = ROLLUP_LEVELS[0]
+
+    for level in ROLLUP_LEVELS:
+        _, _, level_seconds = level
+        if level_seconds <= resolution_seconds and level_seconds <= period_seconds:
+            selected = level
+
+    return selected
+
+
+class RollupAccumulator:
+    """Расчет энергии интервалов и свертка пакета показаний в строки агрегатов.
+
+    Для расчета энергии интервала (метод трапеций) хранит в памяти последнее
+    показание каждого счетчика. Запоздавшие показания (старше последнего
+    известного) учитываются в количестве, сумме, минимуме и максимуме, но не в
+    энергии - ее уточняет пересчет RebuildEnergyRollups.
+    """
+
+    def __init__(self):
+        self.last_readings: Dict[int, Tuple[datetime, Optional[float]]] = {}
+
+    def interval_energy(self, meter_id: int, timestamp: datetime, active_power: Optional[float],
+                        pending: Dict[int, Tuple[datetime, Optional[float]]] = None) -> float:
+        """Энергия интервала от предыдущего показания счетчика по методу трапеций, кВт·ч.
+
+        Новое последнее показание записывается в pending (если задан) вместо last_readings.
+        """
+        state = self.last_readings if pending is None else pending
+        previous = state.get(meter_id, self.last_readings.get(meter_id))
+
+        if previous is not None and timestamp <= previous[0]:
+            return 0.0
+
+        state[meter_id] = (timestamp, active_power)
+
+        if previous is None or active_power is None or previous[1] is None:
+            return 0.0
+
+        gap_seconds = (timestamp - previous[0]).total_seconds()
+        if gap_seconds > MAX_ENERGY_GAP_SECONDS:
+            return 0.0
+
+        return (previous[1] + active_power) / 2 * gap_seconds / 3600
+
+    def interval_energies(self, readings_data: List[Dict[str, Any]]):
+        """Энергия интервала для каждого показания пакета (в порядке пакета) и новые последние показания.
+
+        last_readings не изменяется: новые последние показания применяются методом
+        advance после успешной записи пакета, чтобы повторная запись после ошибки
+        получила ту же энергию.
+        """
+        energies = [0.0] * len(readings_data)
+        pending: Dict[int, Tuple[datetime, Optional[float]]] = {}
+        order = sorted(range(len(readings_data)),
+                       key=lambda i: readings_data[i].get('timestamp') or datetime.min)
+
+        for index in order:
+            record = readings_data[index]
+            meter_id = record.get('meter_id')
+            timestamp = record.get('timestamp')
+            if meter_id is None or not isinstance(timestamp, datetime):
+                continue
+
+            active_power = record.get('active_power')
+            active_power = float(active_power) if active_power is not None else None
+            energies[index] = self.interval_energy(meter_id, timestamp, active_power, pending)
+
+        return energies, pending
+
+    def advance(self, pending: Dict[int, Tuple[datetime, Optional[float]]]):
+        """Применение последних показаний записанного пакета (более ранние не заменяют известные)"""
+        for meter_id, reading in pending.items():
+            current = self.last_readings.get(meter_id)
+            if current is None or reading[0] > current[0]:
+                self.last_readings[meter_id] = reading
+
+    def aggregate(self, readings_data: List[Dict[str, Any]], energies: List[float]) -> Dict[str, List[tuple]]:
+        """Агрегаты пакета по уровням: {таблица: [строки для ROLLUP_UPSERT_SQL]}"""
+        buckets: Dict[str, Dict[Tuple[int, datetime], Dict[str, Any]]] = {
+            table: {} for _, table, _ in ROLLUP_LEVELS
+        }
+
+        for record, energy in zip(readings_data, energies):
+            meter_id = record.get('meter_id')
+            timestamp = record.get('timestamp')
+            if meter_id is None or not isinstance(timestamp, datetime):
+                continue
+
+            active_power = record.get('active_power')
+            active_power = float(active_power) if active_power is not None else None
+            power_factor = record.get('power_factor')
+            power_factor = float(power_factor) if power_factor is not None else None
+            quality = record.get('data_quality', 'good')
+
+            for _, table, seconds in ROLLUP_LEVELS:
+                key = (meter_id, bucket_start(timestamp, seconds))
+                agg = buckets[table].get(key)
+                if agg is None:
+                    agg = buckets[table][key] = {
+                        'readings_count': 0, 'active_power_count': 0, 'active_power_sum': 0.0,
+                        'active_power_min': None, 'active_power_max': None,
+                        'active_power_last': None, 'last_timestamp': None,
+                        'power_factor_count': 0, 'power_factor_sum': 0.0, 'power_factor_min': None,
+                        'energy_kwh': 0.0, 'good_count': 0, 'poor_count': 0, 'bad_count': 0
+                    }
+
+                agg['readings_count'] += 1
+                if active_power is not None:
+                    agg['active_power_count'] += 1
+                    agg['active_power_sum'] += active_power
+                    agg['active_power_min'] = active_power if agg['active_power_min'] is None else min(agg['active_power_min'], active_power)
+                    agg['active_power_max'] = active_power if agg['active_power_max'] is None else max(agg['active_power_max'], active_power)
+                if agg['last_timestamp'] is None or timestamp >= agg['last_timestamp']:
+                    agg['last_timestamp'] = timestamp
+                    agg['active_power_last'] = active_power
+                if power_factor is not None:
+                    agg['power_factor_count'] += 1
+                    agg['power_factor_sum'] += power_factor
+                    agg['power_factor_min'] = power_factor if agg['power_factor_min'] is None else min(agg['power_factor_min'], power_factor)
+                agg['energy_kwh'] += energy
+                if quality in ('good', 'poor', 'bad'):
+                    agg[f'{quality}_count'] += 1
+
+        return {
+            table: [
+                (
+                    meter_id, bucket, agg['readings_count'], agg['active_power_count'], agg['active_power_sum'],
+                    agg['active_power_min'], agg['active_power_max'], agg['active_power_last'], agg['last_timestamp'],
+                    agg['power_factor_count'], agg['power_factor_sum'], agg['power_factor_min'], agg['energy_kwh'],
+                    agg['good_count'], agg['poor_count'], agg['bad_count']
+                )
+                for (meter_id, bucket), agg in table_buckets.items()
+            ]
+            for table, table_buckets in buckets.items()
+        }
@@ -0,0 +1,109 @@
+"""
+Кэш системных настроек процесса с проверкой версии
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def convert_setting(value: Optional[str], setting_type: str) -> Any:
+    """Значение настройки в тип из setting_type"""
+    if value is None:
+        return None
+    if setting_type == 'integer':
+        return int(value)
+    if setting_type == 'float':
+        return float(value)
+    if setting_type == 'boolean':
+        return value.strip().lower() in ('true', '1', 'yes', 'on')
+    if setting_type == 'json':
+        return json.loads(value) if value else None
+    return value
+
+
+class SettingsCache:
+    """Все строки system_settings в памяти, с уже преобразованными типами.
+
+    Номер версии хранится в settings_version и увеличивается в
+    update_system_setting. Кэш сверяет номер не чаще раза в check_interval
+    секунд и перечитывает настройки только при его изменении. Изменение в
+    этом же процессе сбрасывает кэш сразу.
+    """
+
+    def __init__(self, db_manager, check_interval: float = None):
+        self.db_manager = db_manager
+        self.check_interval = check_interval or getattr(db_manager.settings, 'SETTINGS_CACHE_CHECK_SECONDS', 5.0)
+        self.values: Dict[str, Any] = {}
+        self.categories: Dict[str, Dict[str, Any]] = {}
+        self.version: Optional[int] = None
+        self.checked_at: Optional[float] = None
+        self.lock = asyncio.Lock()
+
+    async def get(self, key: str, default: Any = None) -> Any:
+        """Значение настройки (default - если настройки нет или она пустая)"""
+        await self._ensure_current()
+        value = self.values.get(key)
+        return default if value is None else value
+
+    async def get_category(self, category: str) -> Dict[str, Any]:
+        """Настройки категории: ключ -> значение"""
+        await self._ensure_current()
+        return dict(self.categories.get(category, {}))
+
+    def invalidate(self):
+        """Сброс кэша: следующее чтение перечитает настройки"""
+        self.version = None
+        self.checked_at = None
+
+    async def _ensure_current(self):
+        """Перечитывание настроек при изменении версии"""
+        if not self._check_due():
+            return
+
+        async with self.lock:
+            if not self._check_due():
+                return
+            try:
+                version = await self._load_version()
+                if version != self.version:
+                    await self._load()
+                    self.version = version
+            except Exception as e:
+                # Остаются прежние значения; проверка повторится через check_interval
+                logger.error(f"Ошибка обновления кэша системных настроек: {e}")
+            self.checked_at = time.monotonic()
+
+    def _check_due(self) -> bool:
+        """Пора ли сверить версию настроек"""
+        return self.checked_at is None or time.monotonic() - self.checked_at >= self.check_interval
+
+    async def _load_version(self) -> int:
+        """Текущий номер версии настроек (с основного сервера)"""
+        async with self.db_manager.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute('SELECT version_value FROM settings_version WHERE version_id = 1')
+                row = await cursor.fetchone()
+                return row[0] if row else 0
+
+    async def _load(self):
+        """Загрузка всех настроек"""
+        values = {}
+        categories: Dict[str, Dict[str, Any]] = {}
+        async with self.db_manager.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute('SELECT setting_key, setting_value, setting_type, category FROM system_settings')
+                for key, value, setting_type, category in await cursor.fetchall():
+                    try:
+                        values[key] = convert_setting(value, setting_type)
+                    except (ValueError, TypeError) as e:
+                        logger.error(f"Некорректное значение настройки {key} ({setting_type}): {e}")
+                        values[key] = None
+                    categories.setdefault(category, {})[key] = values[key]
+
+        self.values = values
+        self.categories = categories
+        logger.info(f"Загружено системных настроек: {len(values)}")
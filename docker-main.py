@@ -7,13 +7,20 @@ import os
 import sys
 from datetime import datetime
 from nicegui import ui, app
+from fastapi.responses import PlainTextResponse
 from database.db_manager import DatabaseManager
 from data_collection.modbus_client import ModbusDataCollector
+from data_collection.communication_watchdog import CommunicationWatchdog
 from data_processing.processor import DataProcessor
 from analysis.analyzer import EnergyAnalyzer
+from analysis.backtesting import ForecastBacktester
 from web_interface.dashboard import Dashboard
+from web_interface.log_browser import LogBrowser
 from web_interface.reports import ReportsManager
 from web_interface.admin import AdminPanel
+from database.partition_manager import PartitionManager
+from database.purge_job import PurgeJob
+from database.cold_archiver import ColdArchiver
 from config.docker_settings import DockerSettings
 
 # Настройка логирования для Docker
@@ -46,8 +53,13 @@ class DockerEnergyMonitoringSystem:
         self.data_processor = DataProcessor(self.settings)
         self.analyzer = EnergyAnalyzer(self.settings)
         self.dashboard = Dashboard()
-        self.reports_manager = ReportsManager()
-        self.admin_panel = AdminPanel()
+        self.reports_manager = ReportsManager(self.db_manager)
+        self.partition_manager = PartitionManager(self.db_manager)
+        self.purge_job = PurgeJob(self.db_manager)
+        self.cold_archiver = ColdArchiver(self.db_manager, self.partition_manager)
+        self.forecast_backtester = ForecastBacktester(self.db_manager)
+        self.admin_panel = AdminPanel(self.purge_job)
+        self.communication_watchdog = CommunicationWatchdog(self.db_manager)
         
         self.running = False
         
@@ -84,6 +96,9 @@ class DockerEnergyMonitoringSystem:
                 # Сбор данных с устройств
                 raw_data = await self.data_collector.collect_all_data()
                 
+                # Отметка связи с оборудованием (в БД пишется пакетно)
+                self.communication_watchdog.record_readings(raw_data)
+                
                 if raw_data:
                     # Обработка данных
                     processed_data = self.data_processor.process_data(raw_data)
@@ -135,6 +150,11 @@ async def health_check():
             'error': str(e)
         }
 
+@app.get('/metrics')
+async def metrics():
+    """Метрики запросов к БД в формате Prometheus"""
+    return PlainTextResponse(energy_system.db_manager.metrics.render_prometheus())
+
 @ui.page('/')
 async def main_page():
     """Главная страница системы"""
@@ -155,6 +175,7 @@ async def main_page():
         with ui.column():
             ui.button('Дашборд', on_click=lambda: ui.navigate.to('/')).classes('w-full')
             ui.button('Отчеты', on_click=lambda: ui.navigate.to('/reports')).classes('w-full')
+            ui.button('Журнал событий', on_click=lambda: ui.navigate.to('/logs')).classes('w-full')
             ui.button('Администрирование', on_click=lambda: ui.navigate.to('/admin')).classes('w-full')
             ui.separator()
             
@@ -192,6 +213,12 @@ async def reports_page():
     ui.page_title('Отчеты')
     await energy_system.reports_manager.render()
 
+@ui.page('/logs')
+async def logs_page():
+    """Страница журнала событий"""
+    ui.page_title('Журнал событий')
+    await LogBrowser(energy_system.db_manager).render()
+
 @ui.page('/admin')
 async def admin_page():
     """Страница администрирования"""
@@ -207,6 +234,22 @@ async def startup():
         logger.error("Не удалось подключиться к базе данных. Завершение работы.")
         sys.exit(1)
     
+    # Обслуживание секций: создание будущих и удаление устаревших
+    asyncio.create_task(energy_system.partition_manager.run_forever())
+    
+    # Построчная очистка устаревших логов и состояний (продолжает прерванную)
+    asyncio.create_task(energy_system.purge_job.run_forever())
+    
+    # Перенос старых секций показаний в архив Parquet (если задан COLD_STORAGE_PATH)
+    if energy_system.db_manager.cold_storage is not None:
+        asyncio.create_task(energy_system.cold_archiver.run_forever())
+    
+    # Проверка точности прогноза нагрузки на истории
+    asyncio.create_task(energy_system.forecast_backtester.run_forever())
+    
+    # Пакетная запись статуса связи оборудования
+    asyncio.create_task(energy_system.communication_watchdog.run_forever())
+    
     # Автоматический запуск сбора данных
     if os.getenv('AUTO_START_COLLECTION', 'true').lower() == 'true':
         asyncio.create_task(energy_system.start_data_collection())
@@ -1,6 +1,11 @@
 -- Инициализация базы данных для системы мониторинга энергопотребления
 -- Обновленная схема БД
 
+-- Пользователю приложения нужен доступ к SHOW REPLICA STATUS для проверки отставания реплики
+GRANT REPLICATION CLIENT ON *.* TO 'energy_user'@'%';
+-- и к information_schema.INNODB_TRX: резервная копия ждет транзакций, открытых при фиксации водяных знаков
+GRANT PROCESS ON *.* TO 'energy_user'@'%';
+
 -- Создание таблиц согласно новой схеме
 
 -- Таблица типов оборудования
@@ -76,8 +81,13 @@ CREATE TABLE `meters` (
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- Таблица показаний энергопотребления
+-- Секционирована по времени: устаревшие секции удаляются целиком (database/partition_manager.py).
+-- Секционированные таблицы не поддерживают внешние ключи, поэтому целостность обеспечивает приложение.
+-- Кластеризована по (счетчик, время): показания одного счетчика лежат на соседних страницах,
+-- выборка по счетчику за период читает диапазон первичного ключа без обращений по вторичному индексу.
+-- Для существующих баз - миграция docker/mysql/migrations/001_energy_readings_clustered_pk.sql.
 CREATE TABLE `energy_readings` (
-    `energy_readings_id` BIGINT NOT NULL AUTO_INCREMENT UNIQUE,
+    `energy_readings_id` BIGINT NOT NULL AUTO_INCREMENT,
     `energy_readings_meter_id` INTEGER NOT NULL,
     `energy_readings_timestamp` TIMESTAMP(3) NOT NULL,
     `energy_readings_active_power_kw` DECIMAL(12,6),
@@ -93,18 +103,23 @@ CREATE TABLE `energy_readings` (
     `energy_readings_frequency` DECIMAL(6,3),
     `energy_readings_total_active_energy` DECIMAL(15,6),
     `energy_readings_total_reactive_energy` DECIMAL(15,6),
+    -- Энергия от предыдущего показания счетчика (метод трапеций), рассчитывается при записи
+    `energy_readings_interval_energy_kwh` DOUBLE,
     `data_quality` ENUM('good', 'poor', 'bad') DEFAULT 'good',
     `created_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    PRIMARY KEY(`energy_readings_id`),
-    INDEX idx_meter_timestamp (energy_readings_meter_id, energy_readings_timestamp),
-    INDEX idx_timestamp (energy_readings_timestamp),
-    INDEX idx_data_quality (data_quality),
-    FOREIGN KEY(`energy_readings_meter_id`) REFERENCES `meters`(`meter_id`) ON UPDATE CASCADE ON DELETE CASCADE
-) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+    PRIMARY KEY(`energy_readings_meter_id`, `energy_readings_timestamp`, `energy_readings_id`),
+    -- Индекс для AUTO_INCREMENT
+    INDEX idx_reading_id (energy_readings_id),
+    -- Выборки по времени без фильтра по счетчику и постраничное чтение по (timestamp, id)
+    INDEX idx_timestamp (energy_readings_timestamp, energy_readings_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+PARTITION BY RANGE (UNIX_TIMESTAMP(energy_readings_timestamp)) (
+    PARTITION p_future VALUES LESS THAN MAXVALUE
+);
 
--- Таблица состояний оборудования
+-- Таблица состояний оборудования (секционирована по времени)
 CREATE TABLE `equipment_states` (
-    `state_id` BIGINT NOT NULL AUTO_INCREMENT UNIQUE,
+    `state_id` BIGINT NOT NULL AUTO_INCREMENT,
     `state_equipment_id` INTEGER NOT NULL,
     `state_name` VARCHAR(255),
     `state_timestamp` TIMESTAMP(3) NOT NULL,
@@ -115,12 +130,14 @@ CREATE TABLE `equipment_states` (
     `state_efficiency_percent` DECIMAL(5,2),
     `additional_data` JSON,
     `created_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    PRIMARY KEY(`state_id`),
+    PRIMARY KEY(`state_id`, `state_timestamp`),
     INDEX idx_equipment_timestamp (state_equipment_id, state_timestamp),
     INDEX idx_state_name (state_name),
-    INDEX idx_operation_code (state_operation_code),
-    FOREIGN KEY(`state_equipment_id`) REFERENCES `equipment`(`equipment_id`) ON UPDATE CASCADE ON DELETE CASCADE
-) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+    INDEX idx_operation_code (state_operation_code)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+PARTITION BY RANGE (UNIX_TIMESTAMP(state_timestamp)) (
+    PARTITION p_future VALUES LESS THAN MAXVALUE
+);
 
 -- Таблица пользователей
 CREATE TABLE `users` (
@@ -166,9 +183,9 @@ CREATE TABLE `threshold` (
     FOREIGN KEY(`threshold_area_id`) REFERENCES `areas`(`area_id`) ON UPDATE CASCADE ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
--- Таблица логов/уведомлений
+-- Таблица логов/уведомлений (секционирована по времени)
 CREATE TABLE `logs` (
-    `log_id` BIGINT NOT NULL AUTO_INCREMENT UNIQUE,
+    `log_id` BIGINT NOT NULL AUTO_INCREMENT,
     `log_equipment_id` INTEGER,
     `log_meter_id` INTEGER,
     `log_timestamp` TIMESTAMP(3) NOT NULL,
@@ -184,17 +201,19 @@ CREATE TABLE `logs` (
     `severity` ENUM('low', 'medium', 'high', 'critical') DEFAULT 'medium',
     `additional_data` JSON,
     `created_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    PRIMARY KEY(`log_id`),
+    `log_updated_at` TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3),
+    PRIMARY KEY(`log_id`, `log_timestamp`),
     INDEX idx_equipment_timestamp (log_equipment_id, log_timestamp),
     INDEX idx_meter_timestamp (log_meter_id, log_timestamp),
-    INDEX idx_type_status (log_type, log_status),
+    INDEX idx_type_status (log_type, log_status, log_timestamp),
     INDEX idx_severity (severity),
     INDEX idx_timestamp (log_timestamp),
     INDEX idx_acknowledged (log_acknowledged_by_user_id),
-    FOREIGN KEY(`log_equipment_id`) REFERENCES `equipment`(`equipment_id`) ON UPDATE CASCADE ON DELETE CASCADE,
-    FOREIGN KEY(`log_meter_id`) REFERENCES `meters`(`meter_id`) ON UPDATE CASCADE ON DELETE CASCADE,
-    FOREIGN KEY(`log_acknowledged_by_user_id`) REFERENCES `users`(`user_id`) ON UPDATE CASCADE ON DELETE SET NULL
-) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+    INDEX idx_updated_at (log_updated_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+PARTITION BY RANGE (UNIX_TIMESTAMP(log_timestamp)) (
+    PARTITION p_future VALUES LESS THAN MAXVALUE
+);
 
 -- Таблица системных настроек
 CREATE TABLE `system_settings` (
@@ -212,6 +231,201 @@ CREATE TABLE `system_settings` (
     INDEX idx_category (category)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- Версия системных настроек (одна строка). Увеличивается при изменении настроек
+-- (DatabaseManager.update_system_setting); кэши настроек процессов перечитывают их при смене версии.
+CREATE TABLE `settings_version` (
+    `version_id` TINYINT NOT NULL,
+    `version_value` BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY(`version_id`)
+) ENGINE=InnoDB;
+
+INSERT INTO settings_version (version_id, version_value) VALUES (1, 0);
+
+-- Агрегаты показаний по счетчикам с разрешением 1 минута.
+-- Обновляются приложением инкрементально при записи пакета показаний (database/rollups.py),
+-- пересчитываются из сырых данных процедурой RebuildEnergyRollups.
+CREATE TABLE `energy_rollup_1m` (
+    `rollup_meter_id` INTEGER NOT NULL,
+    `rollup_bucket_start` DATETIME NOT NULL,
+    `readings_count` INTEGER NOT NULL DEFAULT 0,
+    `active_power_count` INTEGER NOT NULL DEFAULT 0,
+    `active_power_sum` DOUBLE NOT NULL DEFAULT 0,
+    `active_power_min` DECIMAL(12,6),
+    `active_power_max` DECIMAL(12,6),
+    `active_power_last` DECIMAL(12,6),
+    `last_timestamp` TIMESTAMP(3) NULL,
+    `power_factor_count` INTEGER NOT NULL DEFAULT 0,
+    `power_factor_sum` DOUBLE NOT NULL DEFAULT 0,
+    `power_factor_min` DECIMAL(5,3),
+    `energy_kwh` DOUBLE NOT NULL DEFAULT 0,
+    `good_count` INTEGER NOT NULL DEFAULT 0,
+    `poor_count` INTEGER NOT NULL DEFAULT 0,
+    `bad_count` INTEGER NOT NULL DEFAULT 0,
+    `updated_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY(`rollup_meter_id`, `rollup_bucket_start`),
+    INDEX idx_bucket_start (rollup_bucket_start)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Агрегаты с разрешением 1 час и 1 сутки (та же структура)
+CREATE TABLE `energy_rollup_1h` LIKE `energy_rollup_1m`;
+CREATE TABLE `energy_rollup_1d` LIKE `energy_rollup_1m`;
+
+-- Последнее показание каждого счетчика (одна строка на счетчик).
+-- Обновляется в той же транзакции, что и запись пакета показаний (database/meter_latest.py),
+-- после массовой загрузки - процедурой RefreshMeterLatest.
+CREATE TABLE `meter_latest` (
+    `energy_readings_meter_id` INTEGER NOT NULL,
+    `energy_readings_timestamp` TIMESTAMP(3) NOT NULL,
+    `energy_readings_active_power_kw` DECIMAL(12,6),
+    `energy_readings_reactive_power_kvar` DECIMAL(12,6),
+    `energy_readings_apparent_power_kva` DECIMAL(12,6),
+    `energy_readings_power_factor` DECIMAL(5,3),
+    `energy_readings_voltage_l1` DECIMAL(8,2),
+    `energy_readings_voltage_l2` DECIMAL(8,2),
+    `energy_readings_voltage_l3` DECIMAL(8,2),
+    `energy_readings_current_l1` DECIMAL(8,3),
+    `energy_readings_current_l2` DECIMAL(8,3),
+    `energy_readings_current_l3` DECIMAL(8,3),
+    `energy_readings_frequency` DECIMAL(6,3),
+    `data_quality` ENUM('good', 'poor', 'bad') DEFAULT 'good',
+    `updated_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY(`energy_readings_meter_id`),
+    FOREIGN KEY(`energy_readings_meter_id`) REFERENCES `meters`(`meter_id`) ON UPDATE CASCADE ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Активные уведомления (статус 'new' или 'acknowledged'), одна строка на уведомление.
+-- Поддерживается триггерами на logs; каждое изменение получает номер из alert_sequence
+-- и записывается в alert_changes, чтобы клиенты запрашивали только изменения после номера N.
+CREATE TABLE `active_alerts` (
+    `log_id` BIGINT NOT NULL,
+    `log_equipment_id` INTEGER,
+    `log_meter_id` INTEGER,
+    `log_timestamp` TIMESTAMP(3) NOT NULL,
+    `log_type` ENUM('info', 'warning', 'error', 'critical', 'threshold_exceeded', 'communication_error', 'state_change') NOT NULL,
+    `log_parameter_name` VARCHAR(255),
+    `log_value` DECIMAL(15,6),
+    `log_threshold_value` DECIMAL(15,6),
+    `log_status` ENUM('new', 'acknowledged') NOT NULL,
+    `log_message` TEXT,
+    `log_acknowledged_by_user_id` INTEGER,
+    `log_acknowledged_at` TIMESTAMP NULL,
+    `severity` ENUM('low', 'medium', 'high', 'critical') DEFAULT 'medium',
+    `alert_change_seq` BIGINT NOT NULL,
+    PRIMARY KEY(`log_id`),
+    INDEX idx_severity_timestamp (severity, log_timestamp),
+    UNIQUE INDEX idx_change_seq (alert_change_seq)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Счетчик номеров изменений активных уведомлений (одна строка).
+-- Блокировка строки до фиксации транзакции гарантирует, что номера становятся видимы по возрастанию.
+CREATE TABLE `alert_sequence` (
+    `sequence_id` TINYINT NOT NULL,
+    `sequence_value` BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY(`sequence_id`)
+) ENGINE=InnoDB;
+
+INSERT INTO alert_sequence (sequence_id, sequence_value) VALUES (1, 0);
+
+-- Журнал изменений активных уведомлений (хранится 24 часа, см. событие prune_alert_changes)
+CREATE TABLE `alert_changes` (
+    `change_seq` BIGINT NOT NULL,
+    `change_log_id` BIGINT NOT NULL,
+    `change_type` ENUM('upsert', 'remove') NOT NULL,
+    `changed_at` TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3),
+    PRIMARY KEY(`change_seq`),
+    INDEX idx_changed_at (changed_at)
+) ENGINE=InnoDB;
+
+-- Прогресс фоновой очистки устаревших строк (database/purge_job.py).
+-- После перезапуска незавершенная очистка продолжается с purge_last_key.
+CREATE TABLE `purge_progress` (
+    `purge_table` VARCHAR(64) NOT NULL,
+    `purge_cutoff` TIMESTAMP(3) NOT NULL,
+    `purge_last_key` BIGINT NOT NULL DEFAULT 0,
+    `purge_rows_deleted` BIGINT NOT NULL DEFAULT 0,
+    `purge_status` ENUM('running', 'completed', 'failed') NOT NULL DEFAULT 'running',
+    `purge_started_at` TIMESTAMP NULL,
+    `purge_finished_at` TIMESTAMP NULL,
+    `purge_error` TEXT,
+    `updated_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY(`purge_table`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Секции energy_readings, перенесенные в архив Parquet (database/cold_archiver.py).
+-- 'exported' - файлы записаны, секция еще не удалена; 'archived' - показания периода только в архиве.
+CREATE TABLE `cold_archive` (
+    `archive_partition` VARCHAR(64) NOT NULL,
+    `archive_table` VARCHAR(64) NOT NULL DEFAULT 'energy_readings',
+    `archive_range_start` TIMESTAMP(3) NULL,
+    `archive_range_end` TIMESTAMP(3) NOT NULL,
+    `archive_rows` BIGINT NOT NULL DEFAULT 0,
+    `archive_files` JSON,
+    `archive_status` ENUM('exported', 'archived') NOT NULL DEFAULT 'exported',
+    `archived_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY(`archive_table`, `archive_partition`),
+    INDEX idx_range_end (archive_table, archive_status, archive_range_end)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Оценки точности прогноза нагрузки (analysis/backtesting.py).
+-- Строки одного прогона проверки имеют общее accuracy_evaluated_at; accuracy_equipment_id NULL - весь цех.
+CREATE TABLE `forecast_accuracy` (
+    `accuracy_id` BIGINT NOT NULL AUTO_INCREMENT,
+    `accuracy_model` VARCHAR(50) NOT NULL,
+    `accuracy_equipment_id` INTEGER NULL,
+    `accuracy_horizon_hours` SMALLINT NOT NULL,
+    `accuracy_mape` DECIMAL(10,3) NULL,
+    `accuracy_rmse` DECIMAL(12,4) NULL,
+    `accuracy_bias` DECIMAL(12,4) NULL,
+    `accuracy_samples` INTEGER NOT NULL DEFAULT 0,
+    `accuracy_period_start` TIMESTAMP NOT NULL,
+    `accuracy_period_end` TIMESTAMP NOT NULL,
+    `accuracy_evaluated_at` TIMESTAMP NOT NULL,
+    PRIMARY KEY(`accuracy_id`),
+    INDEX idx_model_run (accuracy_model, accuracy_evaluated_at),
+    INDEX idx_lookup (accuracy_model, accuracy_equipment_id, accuracy_evaluated_at, accuracy_horizon_hours)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Тарифы на электроэнергию (analysis/tariffs.py). Действует активный тариф с наибольшей
+-- tariff_valid_from не позже начала расчетного периода; без тарифа используется energy_cost_per_kwh.
+-- Ставка за мощность (руб/кВт в месяц) применяется к среднему по рабочим дням наибольшему
+-- часовому потреблению цеха в часы зоны tariff_demand_zone (NULL - все часы).
+CREATE TABLE `tariffs` (
+    `tariff_id` INTEGER NOT NULL AUTO_INCREMENT UNIQUE,
+    `tariff_name` VARCHAR(100) NOT NULL,
+    `tariff_valid_from` DATE NOT NULL,
+    `tariff_demand_charge_per_kw` DECIMAL(12,4) NOT NULL DEFAULT 0,
+    `tariff_demand_zone` VARCHAR(20) NULL,
+    `tariff_is_active` BOOLEAN DEFAULT TRUE,
+    `created_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    `updated_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY(`tariff_id`),
+    INDEX idx_valid_from (tariff_is_active, tariff_valid_from)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Зоны суток тарифа: часы [zone_start_hour, zone_end_hour) для рабочих или выходных дней.
+-- Зона через полночь задается концом меньше начала (23 - 7); каждый час суток должен входить в зону.
+CREATE TABLE `tariff_zones` (
+    `zone_id` INTEGER NOT NULL AUTO_INCREMENT UNIQUE,
+    `zone_tariff_id` INTEGER NOT NULL,
+    `zone_name` VARCHAR(20) NOT NULL,
+    `zone_day_type` ENUM('workday', 'weekend') NOT NULL,
+    `zone_start_hour` TINYINT NOT NULL,
+    `zone_end_hour` TINYINT NOT NULL,
+    `zone_price_per_kwh` DECIMAL(10,4) NOT NULL,
+    PRIMARY KEY(`zone_id`),
+    INDEX idx_tariff (zone_tariff_id),
+    FOREIGN KEY (zone_tariff_id) REFERENCES tariffs(tariff_id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Исключения тарифного календаря: праздники ('weekend') и рабочие дни переноса ('workday').
+-- Остальные дни определяются днем недели (суббота и воскресенье - выходные).
+CREATE TABLE `tariff_calendar` (
+    `calendar_date` DATE NOT NULL,
+    `calendar_day_type` ENUM('workday', 'weekend') NOT NULL,
+    `calendar_note` VARCHAR(100),
+    PRIMARY KEY(`calendar_date`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 -- Таблица отчетов
 CREATE TABLE `reports` (
     `report_id` INTEGER NOT NULL AUTO_INCREMENT UNIQUE,
@@ -335,14 +549,47 @@ INSERT INTO system_settings (setting_key, setting_value, setting_type, descripti
 ('system_name', 'Система мониторинга энергопотребления', 'string', 'Название системы', 'general'),
 ('company_name', 'ООО "Металлообрабатывающий завод"', 'string', 'Название компании', 'general'),
 ('auto_acknowledge_timeout', '24', 'integer', 'Автоматическое подтверждение уведомлений через часы', 'notifications'),
-('energy_cost_per_kwh', '4.5', 'float', 'Стоимость электроэнергии за кВт·ч', 'economics');
+('energy_cost_per_kwh', '4.5', 'float', 'Стоимость электроэнергии за кВт·ч', 'economics'),
+('threshold_reload_seconds', '300', 'integer', 'Период обновления пороговых значений при обработке показаний в секундах', 'data_processing');
+
+-- Трехзонный тариф (пример): пик, полупик и ночь по рабочим дням, день и ночь по выходным
+INSERT INTO tariffs (tariff_name, tariff_valid_from, tariff_demand_charge_per_kw, tariff_demand_zone) VALUES
+('Трехзонный', '2024-01-01', 850.0, 'peak');
+
+INSERT INTO tariff_zones (zone_tariff_id, zone_name, zone_day_type, zone_start_hour, zone_end_hour, zone_price_per_kwh) VALUES
+(1, 'night', 'workday', 23, 7, 3.20),
+(1, 'peak', 'workday', 7, 10, 6.80),
+(1, 'half_peak', 'workday', 10, 17, 4.50),
+(1, 'peak', 'workday', 17, 21, 6.80),
+(1, 'half_peak', 'workday', 21, 23, 4.50),
+(1, 'night', 'weekend', 23, 7, 3.20),
+(1, 'half_peak', 'weekend', 7, 23, 4.50);
+
+-- Праздничные дни и переносы 2025 года (пример заполнения календаря)
+INSERT INTO tariff_calendar (calendar_date, calendar_day_type, calendar_note) VALUES
+('2025-01-01', 'weekend', 'Новогодние каникулы'),
+('2025-01-02', 'weekend', 'Новогодние каникулы'),
+('2025-01-03', 'weekend', 'Новогодние каникулы'),
+('2025-01-06', 'weekend', 'Новогодние каникулы'),
+('2025-01-07', 'weekend', 'Рождество Христово'),
+('2025-01-08', 'weekend', 'Новогодние каникулы'),
+('2025-05-01', 'weekend', 'Праздник Весны и Труда'),
+('2025-05-02', 'weekend', 'Перенос выходного дня'),
+('2025-05-08', 'weekend', 'Перенос выходного дня'),
+('2025-05-09', 'weekend', 'День Победы'),
+('2025-06-12', 'weekend', 'День России'),
+('2025-06-13', 'weekend', 'Перенос выходного дня'),
+('2025-11-01', 'workday', 'Рабочая суббота'),
+('2025-11-03', 'weekend', 'Перенос выходного дня'),
+('2025-11-04', 'weekend', 'День народного единства'),
+('2025-12-31', 'weekend', 'Перенос выходного дня');
 
 -- Создание представлений для удобства работы с данными
 
 -- Представление последних показаний по оборудованию
 CREATE VIEW latest_energy_readings AS
 SELECT 
-    er.*,
+    ml.*,
     e.equipment_name,
     e.equipment_nominal_power_kw,
     e.equipment_status,
@@ -351,58 +598,46 @@ SELECT
     et.type_name as equipment_type,
     m.meter_model,
     m.meter_serial_number
-FROM energy_readings er
-INNER JOIN meters m ON er.energy_readings_meter_id = m.meter_id
+FROM meter_latest ml
+INNER JOIN meters m ON ml.energy_readings_meter_id = m.meter_id
 INNER JOIN equipment e ON m.meter_equipment_id = e.equipment_id
 INNER JOIN areas a ON e.equipment_area_id = a.area_id
-INNER JOIN equipment_types et ON e.equipment_type_id = et.type_id
-INNER JOIN (
-    SELECT energy_readings_meter_id, MAX(energy_readings_timestamp) as max_timestamp
-    FROM energy_readings
-    GROUP BY energy_readings_meter_id
-) latest ON er.energy_readings_meter_id = latest.energy_readings_meter_id 
-    AND er.energy_readings_timestamp = latest.max_timestamp;
+INNER JOIN equipment_types et ON e.equipment_type_id = et.type_id;
 
--- Представление активных уведомлений
+-- Представление активных уведомлений (по таблице active_alerts)
 CREATE VIEW active_logs AS
 SELECT 
-    l.*,
+    aa.*,
     e.equipment_name,
     a.name as area_name,
     et.type_name as equipment_type,
     u.user_full_name as acknowledged_by_name
-FROM logs l
-LEFT JOIN equipment e ON l.log_equipment_id = e.equipment_id
+FROM active_alerts aa
+LEFT JOIN equipment e ON aa.log_equipment_id = e.equipment_id
 LEFT JOIN areas a ON e.equipment_area_id = a.area_id
 LEFT JOIN equipment_types et ON e.equipment_type_id = et.type_id
-LEFT JOIN users u ON l.log_acknowledged_by_user_id = u.user_id
-WHERE l.log_status IN ('new', 'acknowledged') AND l.log_resolved_at IS NULL
-ORDER BY l.severity DESC, l.log_timestamp DESC;
+LEFT JOIN users u ON aa.log_acknowledged_by_user_id = u.user_id;
 
--- Представление статистики энергопотребления по участкам за последние 24 часа
+-- Представление статистики энергопотребления по участкам за последние 24 часа (по минутным агрегатам)
 CREATE VIEW area_energy_stats_24h AS
 SELECT 
     a.area_id,
     a.name as area_name,
-    COUNT(er.energy_readings_id) as total_readings,
-    AVG(er.energy_readings_active_power_kw) as avg_power_kw,
-    MAX(er.energy_readings_active_power_kw) as max_power_kw,
-    MIN(er.energy_readings_active_power_kw) as min_power_kw,
-    SUM(er.energy_readings_active_power_kw * 
-        TIMESTAMPDIFF(SECOND, 
-            LAG(er.energy_readings_timestamp) OVER (PARTITION BY a.area_id ORDER BY er.energy_readings_timestamp), 
-            er.energy_readings_timestamp
-        ) / 3600) as total_energy_kwh,
-    AVG(er.energy_readings_power_factor) as avg_power_factor,
+    SUM(r.readings_count) as total_readings,
+    SUM(r.active_power_sum) / NULLIF(SUM(r.active_power_count), 0) as avg_power_kw,
+    MAX(r.active_power_max) as max_power_kw,
+    MIN(r.active_power_min) as min_power_kw,
+    SUM(r.energy_kwh) as total_energy_kwh,
+    SUM(r.power_factor_sum) / NULLIF(SUM(r.power_factor_count), 0) as avg_power_factor,
     COUNT(DISTINCT e.equipment_id) as equipment_count
 FROM areas a
-LEFT JOIN equipment e ON a.area_id = e.equipment_area_id
-LEFT JOIN meters m ON e.equipment_id = m.meter_equipment_id
-LEFT JOIN energy_readings er ON m.meter_id = er.energy_readings_meter_id
-WHERE er.energy_readings_timestamp >= DATE_SUB(NOW(), INTERVAL 24 HOUR)
+INNER JOIN equipment e ON a.area_id = e.equipment_area_id
+INNER JOIN meters m ON e.equipment_id = m.meter_equipment_id
+INNER JOIN energy_rollup_1m r ON m.meter_id = r.rollup_meter_id
+WHERE r.rollup_bucket_start >= DATE_SUB(NOW(), INTERVAL 24 HOUR)
 GROUP BY a.area_id, a.name;
 
--- Представление эффективности оборудования
+-- Представление эффективности оборудования (по минутным агрегатам)
 CREATE VIEW equipment_efficiency AS
 SELECT 
     e.equipment_id,
@@ -410,86 +645,194 @@ SELECT
     e.equipment_nominal_power_kw,
     a.name as area_name,
     et.type_name as equipment_type,
-    AVG(er.energy_readings_active_power_kw) as avg_actual_power_kw,
-    (AVG(er.energy_readings_active_power_kw) / e.equipment_nominal_power_kw * 100) as load_factor_percent,
-    AVG(er.energy_readings_power_factor) as avg_power_factor,
-    COUNT(er.energy_readings_id) as readings_count,
-    MAX(er.energy_readings_timestamp) as last_reading_time
+    SUM(r.active_power_sum) / NULLIF(SUM(r.active_power_count), 0) as avg_actual_power_kw,
+    (SUM(r.active_power_sum) / NULLIF(SUM(r.active_power_count), 0) / e.equipment_nominal_power_kw * 100) as load_factor_percent,
+    SUM(r.power_factor_sum) / NULLIF(SUM(r.power_factor_count), 0) as avg_power_factor,
+    SUM(r.readings_count) as readings_count,
+    MAX(r.last_timestamp) as last_reading_time
 FROM equipment e
 LEFT JOIN areas a ON e.equipment_area_id = a.area_id
 LEFT JOIN equipment_types et ON e.equipment_type_id = et.type_id
-LEFT JOIN meters m ON e.equipment_id = m.meter_equipment_id
-LEFT JOIN energy_readings er ON m.meter_id = er.energy_readings_meter_id
-WHERE er.energy_readings_timestamp >= DATE_SUB(NOW(), INTERVAL 24 HOUR)
+INNER JOIN meters m ON e.equipment_id = m.meter_equipment_id
+INNER JOIN energy_rollup_1m r ON m.meter_id = r.rollup_meter_id
+WHERE r.rollup_bucket_start >= DATE_SUB(NOW(), INTERVAL 24 HOUR)
 GROUP BY e.equipment_id, e.equipment_name, e.equipment_nominal_power_kw, a.name, et.type_name;
 
 -- Создание хранимых процедур
 
 DELIMITER //
 
--- Процедура очистки старых данных
-CREATE PROCEDURE CleanupOldData(IN retention_days INT)
+-- Процедура пересчета энергии интервалов и агрегатов из сырых показаний (история, массовая загрузка, запоздавшие данные).
+-- Границы выравниваются по суткам, чтобы все уровни агрегации пересчитывались согласованно.
+CREATE PROCEDURE RebuildEnergyRollups(
+    IN start_date DATETIME,
+    IN end_date DATETIME
+)
 BEGIN
+    DECLARE range_start DATETIME DEFAULT DATE(start_date);
+    DECLARE range_end DATETIME DEFAULT DATE(end_date) + INTERVAL 1 DAY;
     DECLARE EXIT HANDLER FOR SQLEXCEPTION
     BEGIN
         ROLLBACK;
         RESIGNAL;
     END;
     
+    -- Удаление и пересчет одной транзакцией: при ошибке агрегаты периода остаются прежними,
+    -- а запись пакетов показаний в удаляемые интервалы ждет завершения пересчета
     START TRANSACTION;
     
-    -- Удаление старых показаний энергопотребления
-    DELETE FROM energy_readings 
-    WHERE energy_readings_timestamp < DATE_SUB(NOW(), INTERVAL retention_days DAY);
+    DELETE FROM energy_rollup_1m WHERE rollup_bucket_start >= range_start AND rollup_bucket_start < range_end;
+    DELETE FROM energy_rollup_1h WHERE rollup_bucket_start >= range_start AND rollup_bucket_start < range_end;
+    DELETE FROM energy_rollup_1d WHERE rollup_bucket_start >= range_start AND rollup_bucket_start < range_end;
+    
+    -- Энергия интервала по методу трапеций от предыдущего показания счетчика
+    -- (разрывы более 15 минут не учитываются); исправляет запоздавшие и загруженные массово данные
+    UPDATE energy_readings er
+    INNER JOIN (
+        SELECT 
+            energy_readings_meter_id,
+            energy_readings_timestamp,
+            energy_readings_id,
+            IF(TIMESTAMPDIFF(SECOND, LAG(energy_readings_timestamp) OVER w, energy_readings_timestamp) <= 900,
+                (LAG(energy_readings_active_power_kw) OVER w + energy_readings_active_power_kw) / 2 *
+                TIMESTAMPDIFF(MICROSECOND, LAG(energy_readings_timestamp) OVER w, energy_readings_timestamp) / 3600000000,
+                0) as interval_energy_kwh
+        FROM energy_readings
+        WHERE energy_readings_timestamp >= range_start - INTERVAL 15 MINUTE
+            AND energy_readings_timestamp < range_end
+        WINDOW w AS (PARTITION BY energy_readings_meter_id ORDER BY energy_readings_timestamp)
+    ) r ON er.energy_readings_meter_id = r.energy_readings_meter_id
+        AND er.energy_readings_timestamp = r.energy_readings_timestamp
+        AND er.energy_readings_id = r.energy_readings_id
+    SET er.energy_readings_interval_energy_kwh = COALESCE(r.interval_energy_kwh, 0)
+    WHERE er.energy_readings_timestamp >= range_start AND er.energy_readings_timestamp < range_end;
+    
+    INSERT INTO energy_rollup_1m (
+        rollup_meter_id, rollup_bucket_start, readings_count, active_power_count, active_power_sum,
+        active_power_min, active_power_max, active_power_last, last_timestamp,
+        power_factor_count, power_factor_sum, power_factor_min, energy_kwh,
+        good_count, poor_count, bad_count
+    )
+    SELECT 
+        energy_readings_meter_id,
+        DATE_FORMAT(energy_readings_timestamp, '%Y-%m-%d %H:%i:00'),
+        COUNT(*),
+        COUNT(energy_readings_active_power_kw),
+        COALESCE(SUM(energy_readings_active_power_kw), 0),
+        MIN(energy_readings_active_power_kw),
+        MAX(energy_readings_active_power_kw),
+        SUBSTRING_INDEX(GROUP_CONCAT(energy_readings_active_power_kw ORDER BY energy_readings_timestamp DESC), ',', 1),
+        MAX(energy_readings_timestamp),
+        COUNT(energy_readings_power_factor),
+        COALESCE(SUM(energy_readings_power_factor), 0),
+        MIN(energy_readings_power_factor),
+        COALESCE(SUM(energy_readings_interval_energy_kwh), 0),
+        SUM(data_quality = 'good'),
+        SUM(data_quality = 'poor'),
+        SUM(data_quality = 'bad')
+    FROM energy_readings
+    WHERE energy_readings_timestamp >= range_start AND energy_readings_timestamp < range_end
+    GROUP BY energy_readings_meter_id, DATE_FORMAT(energy_readings_timestamp, '%Y-%m-%d %H:%i:00');
     
-    -- Удаление старых состояний оборудования
-    DELETE FROM equipment_states 
-    WHERE state_timestamp < DATE_SUB(NOW(), INTERVAL retention_days DAY);
+    -- Часовые агрегаты из минутных
+    INSERT INTO energy_rollup_1h (
+        rollup_meter_id, rollup_bucket_start, readings_count, active_power_count, active_power_sum,
+        active_power_min, active_power_max, active_power_last, last_timestamp,
+        power_factor_count, power_factor_sum, power_factor_min, energy_kwh,
+        good_count, poor_count, bad_count
+    )
+    SELECT 
+        rollup_meter_id,
+        DATE_FORMAT(rollup_bucket_start, '%Y-%m-%d %H:00:00'),
+        SUM(readings_count), SUM(active_power_count), SUM(active_power_sum),
+        MIN(active_power_min), MAX(active_power_max),
+        SUBSTRING_INDEX(GROUP_CONCAT(active_power_last ORDER BY last_timestamp DESC), ',', 1),
+        MAX(last_timestamp),
+        SUM(power_factor_count), SUM(power_factor_sum), MIN(power_factor_min), SUM(energy_kwh),
+        SUM(good_count), SUM(poor_count), SUM(bad_count)
+    FROM energy_rollup_1m
+    WHERE rollup_bucket_start >= range_start AND rollup_bucket_start < range_end
+    GROUP BY rollup_meter_id, DATE_FORMAT(rollup_bucket_start, '%Y-%m-%d %H:00:00');
     
-    -- Удаление старых разрешенных логов
-    DELETE FROM logs 
-    WHERE log_status = 'resolved' AND log_resolved_at < DATE_SUB(NOW(), INTERVAL retention_days DAY);
+    -- Суточные агрегаты из часовых
+    INSERT INTO energy_rollup_1d (
+        rollup_meter_id, rollup_bucket_start, readings_count, active_power_count, active_power_sum,
+        active_power_min, active_power_max, active_power_last, last_timestamp,
+        power_factor_count, power_factor_sum, power_factor_min, energy_kwh,
+        good_count, poor_count, bad_count
+    )
+    SELECT 
+        rollup_meter_id,
+        DATE(rollup_bucket_start),
+        SUM(readings_count), SUM(active_power_count), SUM(active_power_sum),
+        MIN(active_power_min), MAX(active_power_max),
+        SUBSTRING_INDEX(GROUP_CONCAT(active_power_last ORDER BY last_timestamp DESC), ',', 1),
+        MAX(last_timestamp),
+        SUM(power_factor_count), SUM(power_factor_sum), MIN(power_factor_min), SUM(energy_kwh),
+        SUM(good_count), SUM(poor_count), SUM(bad_count)
+    FROM energy_rollup_1h
+    WHERE rollup_bucket_start >= range_start AND rollup_bucket_start < range_end
+    GROUP BY rollup_meter_id, DATE(rollup_bucket_start);
     
     COMMIT;
 END //
 
--- Процедура получения статистики энергопотребления
-CREATE PROCEDURE GetEnergyStatistics(
-    IN equipment_id_param INT,
-    IN area_id_param INT,
+-- Процедура обновления последних показаний счетчиков по сырым данным периода (после массовой загрузки)
+CREATE PROCEDURE RefreshMeterLatest(
     IN start_date DATETIME,
     IN end_date DATETIME
 )
 BEGIN
+    INSERT INTO meter_latest (
+        energy_readings_meter_id, energy_readings_timestamp, energy_readings_active_power_kw,
+        energy_readings_reactive_power_kvar, energy_readings_apparent_power_kva, energy_readings_power_factor,
+        energy_readings_voltage_l1, energy_readings_voltage_l2, energy_readings_voltage_l3,
+        energy_readings_current_l1, energy_readings_current_l2, energy_readings_current_l3,
+        energy_readings_frequency, data_quality
+    )
     SELECT 
-        e.equipment_id,
-        e.equipment_name,
-        a.name as area_name,
-        et.type_name as equipment_type,
-        COUNT(er.energy_readings_id) as total_measurements,
-        AVG(er.energy_readings_active_power_kw) as avg_active_power,
-        MAX(er.energy_readings_active_power_kw) as max_active_power,
-        MIN(er.energy_readings_active_power_kw) as min_active_power,
-        SUM(er.energy_readings_active_power_kw * 
-            TIMESTAMPDIFF(SECOND, 
-                LAG(er.energy_readings_timestamp) OVER (PARTITION BY e.equipment_id ORDER BY er.energy_readings_timestamp), 
-                er.energy_readings_timestamp
-            ) / 3600) as total_energy_kwh,
-        AVG(er.energy_readings_power_factor) as avg_power_factor,
-        MIN(er.energy_readings_power_factor) as min_power_factor,
-        COUNT(CASE WHEN er.data_quality = 'poor' THEN 1 END) as poor_quality_count,
-        COUNT(CASE WHEN er.data_quality = 'bad' THEN 1 END) as bad_quality_count,
-        (AVG(er.energy_readings_active_power_kw) / e.equipment_nominal_power_kw * 100) as avg_load_factor_percent
-    FROM equipment e
-    LEFT JOIN areas a ON e.equipment_area_id = a.area_id
-    LEFT JOIN equipment_types et ON e.equipment_type_id = et.type_id
-    LEFT JOIN meters m ON e.equipment_id = m.meter_equipment_id
-    LEFT JOIN energy_readings er ON m.meter_id = er.energy_readings_meter_id
-    WHERE (equipment_id_param IS NULL OR e.equipment_id = equipment_id_param)
-        AND (area_id_param IS NULL OR e.equipment_area_id = area_id_param)
-        AND (er.energy_readings_timestamp IS NULL OR er.energy_readings_timestamp BETWEEN start_date AND end_date)
-    GROUP BY e.equipment_id, e.equipment_name, a.name, et.type_name, e.equipment_nominal_power_kw
-    ORDER BY e.equipment_name;
+        er.energy_readings_meter_id, er.energy_readings_timestamp, er.energy_readings_active_power_kw,
+        er.energy_readings_reactive_power_kvar, er.energy_readings_apparent_power_kva, er.energy_readings_power_factor,
+        er.energy_readings_voltage_l1, er.energy_readings_voltage_l2, er.energy_readings_voltage_l3,
+        er.energy_readings_current_l1, er.energy_readings_current_l2, er.energy_readings_current_l3,
+        er.energy_readings_frequency, er.data_quality
+    FROM energy_readings er
+    INNER JOIN (
+        SELECT energy_readings_meter_id, MAX(energy_readings_timestamp) as max_timestamp
+        FROM energy_readings
+        WHERE energy_readings_timestamp BETWEEN start_date AND end_date
+        GROUP BY energy_readings_meter_id
+    ) latest ON er.energy_readings_meter_id = latest.energy_readings_meter_id 
+        AND er.energy_readings_timestamp = latest.max_timestamp
+    WHERE er.energy_readings_timestamp BETWEEN start_date AND end_date
+    ON DUPLICATE KEY UPDATE
+        energy_readings_active_power_kw = IF(VALUES(energy_readings_timestamp) >= energy_readings_timestamp, VALUES(energy_readings_active_power_kw), energy_readings_active_power_kw),
+        energy_readings_reactive_power_kvar = IF(VALUES(energy_readings_timestamp) >= energy_readings_timestamp, VALUES(energy_readings_reactive_power_kvar), energy_readings_reactive_power_kvar),
+        energy_readings_apparent_power_kva = IF(VALUES(energy_readings_timestamp) >= energy_readings_timestamp, VALUES(energy_readings_apparent_power_kva), energy_readings_apparent_power_kva),
+        energy_readings_power_factor = IF(VALUES(energy_readings_timestamp) >= energy_readings_timestamp, VALUES(energy_readings_power_factor), energy_readings_power_factor),
+        energy_readings_voltage_l1 = IF(VALUES(energy_readings_timestamp) >= energy_readings_timestamp, VALUES(energy_readings_voltage_l1), energy_readings_voltage_l1),
+        energy_readings_voltage_l2 = IF(VALUES(energy_readings_timestamp) >= energy_readings_timestamp, VALUES(energy_readings_voltage_l2), energy_readings_voltage_l2),
+        energy_readings_voltage_l3 = IF(VALUES(energy_readings_timestamp) >= energy_readings_timestamp, VALUES(energy_readings_voltage_l3), energy_readings_voltage_l3),
+        energy_readings_current_l1 = IF(VALUES(energy_readings_timestamp) >= energy_readings_timestamp, VALUES(energy_readings_current_l1), energy_readings_current_l1),
+        energy_readings_current_l2 = IF(VALUES(energy_readings_timestamp) >= energy_readings_timestamp, VALUES(energy_readings_current_l2), energy_readings_current_l2),
+        energy_readings_current_l3 = IF(VALUES(energy_readings_timestamp) >= energy_readings_timestamp, VALUES(energy_readings_current_l3), energy_readings_current_l3),
+        energy_readings_frequency = IF(VALUES(energy_readings_timestamp) >= energy_readings_timestamp, VALUES(energy_readings_frequency), energy_readings_frequency),
+        data_quality = IF(VALUES(energy_readings_timestamp) >= energy_readings_timestamp, VALUES(data_quality), data_quality),
+        energy_readings_timestamp = GREATEST(energy_readings_timestamp, VALUES(energy_readings_timestamp));
+END //
+
+-- Регистрация изменения активного уведомления: следующий номер изменения и запись в журнал
+CREATE PROCEDURE RecordAlertChange(
+    IN log_id_param BIGINT,
+    IN change_type_param VARCHAR(10),
+    OUT change_seq_param BIGINT
+)
+BEGIN
+    UPDATE alert_sequence SET sequence_value = sequence_value + 1 WHERE sequence_id = 1;
+    SELECT sequence_value INTO change_seq_param FROM alert_sequence WHERE sequence_id = 1;
+    
+    INSERT INTO alert_changes (change_seq, change_log_id, change_type)
+    VALUES (change_seq_param, log_id_param, change_type_param);
 END //
 
 -- Процедура создания уведомления
@@ -531,143 +874,173 @@ DELIMITER ;
 
 -- Создание триггеров
 
--- Триггер для обновления статуса связи оборудования
+-- Статус связи оборудования (last_communication, communication_status) обновляется
+-- приложением пакетно (data_collection/communication_watchdog.py), а не триггером на каждое показание
+
+-- Триггер для автоматического создания уведомлений при превышении порогов
 DELIMITER //
-CREATE TRIGGER update_equipment_communication_status
+CREATE TRIGGER check_thresholds_after_energy_reading
 AFTER INSERT ON energy_readings
 FOR EACH ROW
 BEGIN
-    UPDATE equipment e
-    INNER JOIN meters m ON e.equipment_id = m.meter_equipment_id
-    SET 
-        e.last_communication = NEW.energy_readings_timestamp,
-        e.communication_status = 'online'
-    WHERE m.meter_id = NEW.energy_readings_meter_id;
+    DECLARE equipment_id_var INT;
+    DECLARE area_id_var INT;
+    
+    -- Исторические данные при массовой загрузке не проверяются на пороги
+    IF @disable_energy_triggers IS NULL THEN
+        -- Получение ID оборудования и участка
+        SELECT e.equipment_id, e.equipment_area_id INTO equipment_id_var, area_id_var
+        FROM equipment e
+        INNER JOIN meters m ON e.equipment_id = m.meter_equipment_id
+        WHERE m.meter_id = NEW.energy_readings_meter_id;
+    
+        -- Проверка активной мощности
+        IF NEW.energy_readings_active_power_kw IS NOT NULL THEN
+            -- Проверка порогов для конкретного оборудования
+            INSERT INTO logs (log_equipment_id, log_meter_id, log_timestamp, log_type, log_parameter_name, 
+                             log_value, log_threshold_value, log_message, severity)
+            SELECT 
+                equipment_id_var,
+                NEW.energy_readings_meter_id,
+                NEW.energy_readings_timestamp,
+                'threshold_exceeded',
+                'energy_readings_active_power_kw',
+                NEW.energy_readings_active_power_kw,
+                CASE 
+                    WHEN NEW.energy_readings_active_power_kw > t.critical_level THEN t.critical_level
+                    ELSE t.warning_level
+                END,
+                CONCAT('Превышение мощности: ', NEW.energy_readings_active_power_kw, ' кВт (порог: ', 
+                       CASE 
+                           WHEN NEW.energy_readings_active_power_kw > t.critical_level THEN t.critical_level
+                           ELSE t.warning_level
+                       END, ' кВт)'),
+                CASE 
+                    WHEN NEW.energy_readings_active_power_kw > t.critical_level THEN 'critical'
+                    ELSE 'high'
+                END
+            FROM threshold t
+            WHERE t.parameter_name = 'energy_readings_active_power_kw'
+                AND t.is_active = TRUE
+                AND (t.threshold_equipment_id = equipment_id_var OR 
+                     (t.threshold_equipment_id IS NULL AND t.threshold_area_id IS NULL) OR
+                     t.threshold_area_id = area_id_var)
+                AND (
+                    (t.critical_level IS NOT NULL AND NEW.energy_readings_active_power_kw > t.critical_level) OR
+                    (t.warning_level IS NOT NULL AND NEW.energy_readings_active_power_kw > t.warning_level)
+                )
+            ORDER BY t.threshold_equipment_id DESC, t.threshold_area_id DESC
+            LIMIT 1;
+        END IF;
+    
+        -- Проверка коэффициента мощности
+        IF NEW.energy_readings_power_factor IS NOT NULL THEN
+            INSERT INTO logs (log_equipment_id, log_meter_id, log_timestamp, log_type, log_parameter_name, 
+                             log_value, log_threshold_value, log_message, severity)
+            SELECT 
+                equipment_id_var,
+                NEW.energy_readings_meter_id,
+                NEW.energy_readings_timestamp,
+                'threshold_exceeded',
+                'energy_readings_power_factor',
+                NEW.energy_readings_power_factor,
+                CASE 
+                    WHEN NEW.energy_readings_power_factor < t.min_critical_level THEN t.min_critical_level
+                    ELSE t.min_warning_level
+                END,
+                CONCAT('Низкий коэффициент мощности: ', NEW.energy_readings_power_factor, 
+                       ' (минимум: ', 
+                       CASE 
+                           WHEN NEW.energy_readings_power_factor < t.min_critical_level THEN t.min_critical_level
+                           ELSE t.min_warning_level
+                       END, ')'),
+                CASE 
+                    WHEN NEW.energy_readings_power_factor < t.min_critical_level THEN 'critical'
+                    ELSE 'high'
+                END
+            FROM threshold t
+            WHERE t.parameter_name = 'energy_readings_power_factor'
+                AND t.is_active = TRUE
+                AND (t.threshold_equipment_id = equipment_id_var OR 
+                     (t.threshold_equipment_id IS NULL AND t.threshold_area_id IS NULL) OR
+                     t.threshold_area_id = area_id_var)
+                AND (
+                    (t.min_critical_level IS NOT NULL AND NEW.energy_readings_power_factor < t.min_critical_level) OR
+                    (t.min_warning_level IS NOT NULL AND NEW.energy_readings_power_factor < t.min_warning_level)
+                )
+            ORDER BY t.threshold_equipment_id DESC, t.threshold_area_id DESC
+            LIMIT 1;
+        END IF;
+    END IF;
 END //
 DELIMITER ;
 
--- Триггер для автоматического создания уведомлений при превышении порогов
+-- Триггеры поддержки таблицы активных уведомлений и журнала изменений
 DELIMITER //
-CREATE TRIGGER check_thresholds_after_energy_reading
-AFTER INSERT ON energy_readings
+CREATE TRIGGER active_alerts_after_log_insert
+AFTER INSERT ON logs
 FOR EACH ROW
 BEGIN
-    DECLARE equipment_id_var INT;
-    DECLARE area_id_var INT;
+    DECLARE change_seq_var BIGINT;
     
-    -- Получение ID оборудования и участка
-    SELECT e.equipment_id, e.equipment_area_id INTO equipment_id_var, area_id_var
-    FROM equipment e
-    INNER JOIN meters m ON e.equipment_id = m.meter_equipment_id
-    WHERE m.meter_id = NEW.energy_readings_meter_id;
+    IF NEW.log_status IN ('new', 'acknowledged') AND NEW.log_resolved_at IS NULL THEN
+        CALL RecordAlertChange(NEW.log_id, 'upsert', change_seq_var);
+        INSERT INTO active_alerts (
+            log_id, log_equipment_id, log_meter_id, log_timestamp, log_type, log_parameter_name,
+            log_value, log_threshold_value, log_status, log_message, log_acknowledged_by_user_id,
+            log_acknowledged_at, severity, alert_change_seq
+        ) VALUES (
+            NEW.log_id, NEW.log_equipment_id, NEW.log_meter_id, NEW.log_timestamp, NEW.log_type, NEW.log_parameter_name,
+            NEW.log_value, NEW.log_threshold_value, NEW.log_status, NEW.log_message, NEW.log_acknowledged_by_user_id,
+            NEW.log_acknowledged_at, NEW.severity, change_seq_var
+        );
+    END IF;
+END //
+
+CREATE TRIGGER active_alerts_after_log_update
+AFTER UPDATE ON logs
+FOR EACH ROW
+BEGIN
+    DECLARE change_seq_var BIGINT;
     
-    -- Проверка активной мощности
-    IF NEW.energy_readings_active_power_kw IS NOT NULL THEN
-        -- Проверка порогов для конкретного оборудования
-        INSERT INTO logs (log_equipment_id, log_meter_id, log_timestamp, log_type, log_parameter_name, 
-                         log_value, log_threshold_value, log_message, severity)
-        SELECT 
-            equipment_id_var,
-            NEW.energy_readings_meter_id,
-            NEW.energy_readings_timestamp,
-            'threshold_exceeded',
-            'energy_readings_active_power_kw',
-            NEW.energy_readings_active_power_kw,
-            CASE 
-                WHEN NEW.energy_readings_active_power_kw > t.critical_level THEN t.critical_level
-                ELSE t.warning_level
-            END,
-            CONCAT('Превышение мощности: ', NEW.energy_readings_active_power_kw, ' кВт (порог: ', 
-                   CASE 
-                       WHEN NEW.energy_readings_active_power_kw > t.critical_level THEN t.critical_level
-                       ELSE t.warning_level
-                   END, ' кВт)'),
-            CASE 
-                WHEN NEW.energy_readings_active_power_kw > t.critical_level THEN 'critical'
-                ELSE 'high'
-            END
-        FROM threshold t
-        WHERE t.parameter_name = 'energy_readings_active_power_kw'
-            AND t.is_active = TRUE
-            AND (t.threshold_equipment_id = equipment_id_var OR 
-                 (t.threshold_equipment_id IS NULL AND t.threshold_area_id IS NULL) OR
-                 t.threshold_area_id = area_id_var)
-            AND (
-                (t.critical_level IS NOT NULL AND NEW.energy_readings_active_power_kw > t.critical_level) OR
-                (t.warning_level IS NOT NULL AND NEW.energy_readings_active_power_kw > t.warning_level)
-            )
-        ORDER BY t.threshold_equipment_id DESC, t.threshold_area_id DESC
-        LIMIT 1;
+    IF NEW.log_status IN ('new', 'acknowledged') AND NEW.log_resolved_at IS NULL THEN
+        CALL RecordAlertChange(NEW.log_id, 'upsert', change_seq_var);
+        REPLACE INTO active_alerts (
+            log_id, log_equipment_id, log_meter_id, log_timestamp, log_type, log_parameter_name,
+            log_value, log_threshold_value, log_status, log_message, log_acknowledged_by_user_id,
+            log_acknowledged_at, severity, alert_change_seq
+        ) VALUES (
+            NEW.log_id, NEW.log_equipment_id, NEW.log_meter_id, NEW.log_timestamp, NEW.log_type, NEW.log_parameter_name,
+            NEW.log_value, NEW.log_threshold_value, NEW.log_status, NEW.log_message, NEW.log_acknowledged_by_user_id,
+            NEW.log_acknowledged_at, NEW.severity, change_seq_var
+        );
+    ELSEIF OLD.log_status IN ('new', 'acknowledged') AND OLD.log_resolved_at IS NULL THEN
+        CALL RecordAlertChange(OLD.log_id, 'remove', change_seq_var);
+        DELETE FROM active_alerts WHERE log_id = OLD.log_id;
     END IF;
+END //
+
+CREATE TRIGGER active_alerts_after_log_delete
+AFTER DELETE ON logs
+FOR EACH ROW
+BEGIN
+    DECLARE change_seq_var BIGINT;
     
-    -- Проверка коэффициента мощности
-    IF NEW.energy_readings_power_factor IS NOT NULL THEN
-        INSERT INTO logs (log_equipment_id, log_meter_id, log_timestamp, log_type, log_parameter_name, 
-                         log_value, log_threshold_value, log_message, severity)
-        SELECT 
-            equipment_id_var,
-            NEW.energy_readings_meter_id,
-            NEW.energy_readings_timestamp,
-            'threshold_exceeded',
-            'energy_readings_power_factor',
-            NEW.energy_readings_power_factor,
-            CASE 
-                WHEN NEW.energy_readings_power_factor < t.min_critical_level THEN t.min_critical_level
-                ELSE t.min_warning_level
-            END,
-            CONCAT('Низкий коэффициент мощности: ', NEW.energy_readings_power_factor, 
-                   ' (минимум: ', 
-                   CASE 
-                       WHEN NEW.energy_readings_power_factor < t.min_critical_level THEN t.min_critical_level
-                       ELSE t.min_warning_level
-                   END, ')'),
-            CASE 
-                WHEN NEW.energy_readings_power_factor < t.min_critical_level THEN 'critical'
-                ELSE 'high'
-            END
-        FROM threshold t
-        WHERE t.parameter_name = 'energy_readings_power_factor'
-            AND t.is_active = TRUE
-            AND (t.threshold_equipment_id = equipment_id_var OR 
-                 (t.threshold_equipment_id IS NULL AND t.threshold_area_id IS NULL) OR
-                 t.threshold_area_id = area_id_var)
-            AND (
-                (t.min_critical_level IS NOT NULL AND NEW.energy_readings_power_factor < t.min_critical_level) OR
-                (t.min_warning_level IS NOT NULL AND NEW.energy_readings_power_factor < t.min_warning_level)
-            )
-        ORDER BY t.threshold_equipment_id DESC, t.threshold_area_id DESC
-        LIMIT 1;
+    IF OLD.log_status IN ('new', 'acknowledged') AND OLD.log_resolved_at IS NULL THEN
+        CALL RecordAlertChange(OLD.log_id, 'remove', change_seq_var);
+        DELETE FROM active_alerts WHERE log_id = OLD.log_id;
     END IF;
 END //
 DELIMITER ;
 
 -- Создание индексов для оптимизации производительности
-CREATE INDEX idx_energy_readings_composite ON energy_readings (energy_readings_meter_id, energy_readings_timestamp, energy_readings_active_power_kw);
 CREATE INDEX idx_logs_composite ON logs (log_equipment_id, log_type, log_status, log_timestamp);
 CREATE INDEX idx_equipment_states_composite ON equipment_states (state_equipment_id, state_timestamp, state_name);
 
--- Настройка автоматической очистки данных
+-- Планировщик событий (подтверждение старых уведомлений, очистка журнала изменений).
+-- Устаревшие строки logs и equipment_states удаляются приложением пакетами (database/purge_job.py)
 SET GLOBAL event_scheduler = ON;
 
-DELIMITER //
-CREATE EVENT IF NOT EXISTS cleanup_old_data_event
-ON SCHEDULE EVERY 1 DAY
-STARTS CURRENT_TIMESTAMP
-DO
-BEGIN
-    DECLARE retention_days INT DEFAULT 365;
-    
-    -- Получение настройки периода хранения
-    SELECT CAST(setting_value AS UNSIGNED) INTO retention_days
-    FROM system_settings 
-    WHERE setting_key = 'data_retention_days' 
-    LIMIT 1;
-    
-    -- Вызов процедуры очистки
-    CALL CleanupOldData(retention_days);
-END //
-DELIMITER ;
-
 -- Создание события для автоматического подтверждения старых уведомлений
 DELIMITER //
 CREATE EVENT IF NOT EXISTS auto_acknowledge_old_logs
@@ -692,3 +1065,21 @@ BEGIN
         AND log_type IN ('warning', 'info');
 END //
 DELIMITER ;
+
+-- Создание события для очистки журнала изменений активных уведомлений
+-- (последняя запись сохраняется, чтобы клиенты могли определить текущий номер)
+DELIMITER //
+CREATE EVENT IF NOT EXISTS prune_alert_changes
+ON SCHEDULE EVERY 1 HOUR
+STARTS CURRENT_TIMESTAMP
+DO
+BEGIN
+    DECLARE last_seq BIGINT;
+    
+    SELECT MAX(change_seq) INTO last_seq FROM alert_changes;
+    
+    DELETE FROM alert_changes 
+    WHERE changed_at < DATE_SUB(NOW(), INTERVAL 24 HOUR)
+        AND change_seq < last_seq;
+END //
+DELIMITER ;
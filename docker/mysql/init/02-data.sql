@@ -381,6 +381,10 @@ CALL GenerateTestData();
 CALL GenerateEquipmentStates();
 CALL GenerateTestLogs();
 
+-- Построение агрегатов и последних показаний по сгенерированным данным
+CALL RebuildEnergyRollups(DATE_SUB(NOW(), INTERVAL 8 DAY), NOW());
+CALL RefreshMeterLatest(DATE_SUB(NOW(), INTERVAL 8 DAY), NOW());
+
 -- Удаление временных процедур
 DROP PROCEDURE GenerateTestData;
 DROP PROCEDURE GenerateEquipmentStates;
@@ -0,0 +1,33 @@
+-- Миграция energy_readings на кластеризацию по (счетчик, время)
+--
+-- Было:  PRIMARY KEY (energy_readings_id, energy_readings_timestamp)
+--        + idx_meter_timestamp, idx_energy_readings_composite, idx_timestamp, idx_data_quality
+-- Стало: PRIMARY KEY (energy_readings_meter_id, energy_readings_timestamp, energy_readings_id)
+--        + idx_reading_id (для AUTO_INCREMENT), idx_timestamp (timestamp, id)
+--
+-- Выполняется онлайн (ALGORITHM=INPLACE, LOCK=NONE): запись показаний продолжается, таблица
+-- перестраивается по секциям. Нужно свободное место на диске примерно равное размеру таблицы
+-- и innodb_online_alter_log_max_size, достаточный для записей за время перестроения.
+-- На реплике команда выполняется после основного сервера - на это время отставание реплики
+-- растет и DatabaseManager направляет чтение на основной сервер.
+--
+-- Сравнение до и после на тестовом сервере: python -m database.layout_benchmark
+
+-- Проверка текущей схемы (ожидается PRIMARY = energy_readings_id, energy_readings_timestamp)
+SELECT INDEX_NAME, GROUP_CONCAT(COLUMN_NAME ORDER BY SEQ_IN_INDEX) as columns_list
+FROM information_schema.STATISTICS
+WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'energy_readings'
+GROUP BY INDEX_NAME;
+
+ALTER TABLE energy_readings
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (energy_readings_meter_id, energy_readings_timestamp, energy_readings_id),
+    ADD INDEX idx_reading_id (energy_readings_id),
+    DROP INDEX idx_meter_timestamp,
+    DROP INDEX idx_energy_readings_composite,
+    DROP INDEX idx_data_quality,
+    DROP INDEX idx_timestamp,
+    ADD INDEX idx_timestamp (energy_readings_timestamp, energy_readings_id),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+ANALYZE TABLE energy_readings;
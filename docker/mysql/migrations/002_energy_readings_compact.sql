@@ -0,0 +1,48 @@
+-- Необязательный перевод energy_readings на компактную схему (после миграции 001)
+--
+-- - мощности, напряжения, токи, коэффициент мощности и частота хранятся в FLOAT: счетчик отдает
+--   значения IEEE 754 одинарной точности, поэтому точность не теряется;
+-- - накопленные счетчики энергии хранятся в DOUBLE (FLOAT не хватает разрядов для больших значений);
+-- - created_at удаляется (время показания хранится в energy_readings_timestamp);
+-- - качество данных хранится в битовом поле quality_flags (бит 0 - 'poor', бит 1 - 'bad'),
+--   data_quality остается виртуальным столбцом для запросов, процедур и триггеров.
+--
+-- Приложение определяет схему по наличию quality_flags при запуске (DatabaseManager.compact_readings),
+-- поэтому после миграции его нужно перезапустить. Изменение типов столбцов требует копирования
+-- таблицы (ALGORITHM=COPY, запись блокируется) - выполнять в окно обслуживания с остановленным
+-- сбором данных либо через pt-online-schema-change / gh-ost.
+--
+-- Сравнение размера и скорости: python -m database.layout_benchmark --layout meter_clustered --layout compact --days 365
+
+-- 1. Битовое поле качества (мгновенное добавление столбца в конец таблицы)
+ALTER TABLE energy_readings
+    ADD COLUMN quality_flags TINYINT UNSIGNED NOT NULL DEFAULT 0,
+    ALGORITHM=INSTANT;
+
+-- 2. Перенос качества: по умолчанию 'good' = 0, обновляются только строки с плохим качеством
+UPDATE energy_readings
+SET quality_flags = CASE data_quality WHEN 'bad' THEN 2 WHEN 'poor' THEN 1 ELSE 0 END
+WHERE data_quality <> 'good';
+
+-- 3. Компактные типы и виртуальный data_quality
+ALTER TABLE energy_readings
+    MODIFY `energy_readings_active_power_kw` FLOAT,
+    MODIFY `energy_readings_reactive_power_kvar` FLOAT,
+    MODIFY `energy_readings_apparent_power_kva` FLOAT,
+    MODIFY `energy_readings_power_factor` FLOAT,
+    MODIFY `energy_readings_voltage_l1` FLOAT,
+    MODIFY `energy_readings_voltage_l2` FLOAT,
+    MODIFY `energy_readings_voltage_l3` FLOAT,
+    MODIFY `energy_readings_current_l1` FLOAT,
+    MODIFY `energy_readings_current_l2` FLOAT,
+    MODIFY `energy_readings_current_l3` FLOAT,
+    MODIFY `energy_readings_frequency` FLOAT,
+    MODIFY `energy_readings_total_active_energy` DOUBLE,
+    MODIFY `energy_readings_total_reactive_energy` DOUBLE,
+    DROP COLUMN `created_at`,
+    DROP COLUMN `data_quality`,
+    ADD COLUMN `data_quality` ENUM('good', 'poor', 'bad')
+        AS (CASE WHEN quality_flags & 2 THEN 'bad' WHEN quality_flags & 1 THEN 'poor' ELSE 'good' END) VIRTUAL,
+    ALGORITHM=COPY;
+
+ANALYZE TABLE energy_readings;
@@ -0,0 +1,12 @@
+-- Время изменения записи лога для инкрементного резервного копирования (database/backup.py)
+--
+-- Статус уведомления меняется после вставки (подтверждение, решение), поэтому логи копируются
+-- по времени изменения, а не по log_timestamp. Существующие строки получают время выполнения
+-- миграции и попадут в следующую копию целиком.
+--
+-- Выполняется онлайн (ALGORITHM=INPLACE, LOCK=NONE), индекс строится по секциям.
+
+ALTER TABLE logs
+    ADD COLUMN `log_updated_at` TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3),
+    ADD INDEX idx_updated_at (log_updated_at),
+    ALGORITHM=INPLACE, LOCK=NONE;
@@ -0,0 +1,13 @@
+-- Индекс журнала событий по типу и статусу, упорядоченный по времени
+--
+-- Было:  idx_type_status (log_type, log_status) - строки упорядочены по первичному ключу,
+--        выборка страницы журнала по типу и статусу сортировала все подходящие строки
+-- Стало: idx_type_status (log_type, log_status, log_timestamp) - страница журнала
+--        (DatabaseManager.get_logs_page) читает только запрошенное число строк
+--
+-- Выполняется онлайн (ALGORITHM=INPLACE, LOCK=NONE), индекс строится по секциям.
+
+ALTER TABLE logs
+    DROP INDEX idx_type_status,
+    ADD INDEX idx_type_status (log_type, log_status, log_timestamp),
+    ALGORITHM=INPLACE, LOCK=NONE;
@@ -0,0 +1,20 @@
+-- Версия системных настроек для кэша настроек процессов (database/settings_cache.py)
+--
+-- Было:  каждое чтение настройки (стоимость кВт·ч, срок хранения) выполняло запрос к system_settings,
+--        в том числе в циклах анализа по оборудованию и участкам
+-- Стало: процесс держит все настройки в памяти и сверяет только номер версии из settings_version;
+--        DatabaseManager.update_system_setting увеличивает номер, и кэши перечитывают настройки
+--
+-- Изменения system_settings в обход update_system_setting должны также увеличивать версию:
+--   UPDATE settings_version SET version_value = version_value + 1 WHERE version_id = 1;
+
+CREATE TABLE IF NOT EXISTS `settings_version` (
+    `version_id` TINYINT NOT NULL,
+    `version_value` BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY(`version_id`)
+) ENGINE=InnoDB;
+
+INSERT IGNORE INTO settings_version (version_id, version_value) VALUES (1, 0);
+
+INSERT IGNORE INTO system_settings (setting_key, setting_value, setting_type, description, category) VALUES
+('threshold_reload_seconds', '300', 'integer', 'Период обновления пороговых значений при обработке показаний в секундах', 'data_processing');
@@ -0,0 +1,41 @@
+-- Зонные тарифы на электроэнергию (analysis/tariffs.py)
+--
+-- Было:  стоимость = энергия × одноставочная цена energy_cost_per_kwh
+-- Стало: стоимость по зонам суток (рабочие и выходные дни, праздники по tariff_calendar)
+--        и ставке за мощность; пока тариф не заведен, используется energy_cost_per_kwh.
+--
+-- Тариф заводится строкой tariffs и зонами tariff_zones, покрывающими все 24 часа
+-- рабочих и выходных дней (пример - в docker/mysql/init/01-init.sql).
+
+CREATE TABLE IF NOT EXISTS `tariffs` (
+    `tariff_id` INTEGER NOT NULL AUTO_INCREMENT UNIQUE,
+    `tariff_name` VARCHAR(100) NOT NULL,
+    `tariff_valid_from` DATE NOT NULL,
+    `tariff_demand_charge_per_kw` DECIMAL(12,4) NOT NULL DEFAULT 0,
+    `tariff_demand_zone` VARCHAR(20) NULL,
+    `tariff_is_active` BOOLEAN DEFAULT TRUE,
+    `created_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    `updated_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY(`tariff_id`),
+    INDEX idx_valid_from (tariff_is_active, tariff_valid_from)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS `tariff_zones` (
+    `zone_id` INTEGER NOT NULL AUTO_INCREMENT UNIQUE,
+    `zone_tariff_id` INTEGER NOT NULL,
+    `zone_name` VARCHAR(20) NOT NULL,
+    `zone_day_type` ENUM('workday', 'weekend') NOT NULL,
+    `zone_start_hour` TINYINT NOT NULL,
+    `zone_end_hour` TINYINT NOT NULL,
+    `zone_price_per_kwh` DECIMAL(10,4) NOT NULL,
+    PRIMARY KEY(`zone_id`),
+    INDEX idx_tariff (zone_tariff_id),
+    FOREIGN KEY (zone_tariff_id) REFERENCES tariffs(tariff_id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS `tariff_calendar` (
+    `calendar_date` DATE NOT NULL,
+    `calendar_day_type` ENUM('workday', 'weekend') NOT NULL,
+    `calendar_note` VARCHAR(100),
+    PRIMARY KEY(`calendar_date`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,127 @@
+-- Пересчет агрегатов RebuildEnergyRollups одной транзакцией
+--
+-- Было:  удаление и вставка агрегатов периода выполнялись отдельными автоматически
+--        фиксируемыми командами; если запись пакета показаний успевала добавить интервал
+--        между DELETE и INSERT, вставка завершалась ошибкой дубликата ключа, и агрегаты
+--        части периода оставались удаленными
+-- Стало: тело процедуры выполняется в транзакции, при ошибке она откатывается
+--        (агрегаты периода остаются прежними), ошибка передается вызывающему
+
+DROP PROCEDURE IF EXISTS RebuildEnergyRollups;
+
+DELIMITER //
+
+CREATE PROCEDURE RebuildEnergyRollups(
+    IN start_date DATETIME,
+    IN end_date DATETIME
+)
+BEGIN
+    DECLARE range_start DATETIME DEFAULT DATE(start_date);
+    DECLARE range_end DATETIME DEFAULT DATE(end_date) + INTERVAL 1 DAY;
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        ROLLBACK;
+        RESIGNAL;
+    END;
+    
+    -- Удаление и пересчет одной транзакцией: при ошибке агрегаты периода остаются прежними,
+    -- а запись пакетов показаний в удаляемые интервалы ждет завершения пересчета
+    START TRANSACTION;
+    
+    DELETE FROM energy_rollup_1m WHERE rollup_bucket_start >= range_start AND rollup_bucket_start < range_end;
+    DELETE FROM energy_rollup_1h WHERE rollup_bucket_start >= range_start AND rollup_bucket_start < range_end;
+    DELETE FROM energy_rollup_1d WHERE rollup_bucket_start >= range_start AND rollup_bucket_start < range_end;
+    
+    -- Энергия интервала по методу трапеций от предыдущего показания счетчика
+    -- (разрывы более 15 минут не учитываются); исправляет запоздавшие и загруженные массово данные
+    UPDATE energy_readings er
+    INNER JOIN (
+        SELECT 
+            energy_readings_meter_id,
+            energy_readings_timestamp,
+            energy_readings_id,
+            IF(TIMESTAMPDIFF(SECOND, LAG(energy_readings_timestamp) OVER w, energy_readings_timestamp) <= 900,
+                (LAG(energy_readings_active_power_kw) OVER w + energy_readings_active_power_kw) / 2 *
+                TIMESTAMPDIFF(MICROSECOND, LAG(energy_readings_timestamp) OVER w, energy_readings_timestamp) / 3600000000,
+                0) as interval_energy_kwh
+        FROM energy_readings
+        WHERE energy_readings_timestamp >= range_start - INTERVAL 15 MINUTE
+            AND energy_readings_timestamp < range_end
+        WINDOW w AS (PARTITION BY energy_readings_meter_id ORDER BY energy_readings_timestamp)
+    ) r ON er.energy_readings_meter_id = r.energy_readings_meter_id
+        AND er.energy_readings_timestamp = r.energy_readings_timestamp
+        AND er.energy_readings_id = r.energy_readings_id
+    SET er.energy_readings_interval_energy_kwh = COALESCE(r.interval_energy_kwh, 0)
+    WHERE er.energy_readings_timestamp >= range_start AND er.energy_readings_timestamp < range_end;
+    
+    INSERT INTO energy_rollup_1m (
+        rollup_meter_id, rollup_bucket_start, readings_count, active_power_count, active_power_sum,
+        active_power_min, active_power_max, active_power_last, last_timestamp,
+        power_factor_count, power_factor_sum, power_factor_min, energy_kwh,
+        good_count, poor_count, bad_count
+    )
+    SELECT 
+        energy_readings_meter_id,
+        DATE_FORMAT(energy_readings_timestamp, '%Y-%m-%d %H:%i:00'),
+        COUNT(*),
+        COUNT(energy_readings_active_power_kw),
+        COALESCE(SUM(energy_readings_active_power_kw), 0),
+        MIN(energy_readings_active_power_kw),
+        MAX(energy_readings_active_power_kw),
+        SUBSTRING_INDEX(GROUP_CONCAT(energy_readings_active_power_kw ORDER BY energy_readings_timestamp DESC), ',', 1),
+        MAX(energy_readings_timestamp),
+        COUNT(energy_readings_power_factor),
+        COALESCE(SUM(energy_readings_power_factor), 0),
+        MIN(energy_readings_power_factor),
+        COALESCE(SUM(energy_readings_interval_energy_kwh), 0),
+        SUM(data_quality = 'good'),
+        SUM(data_quality = 'poor'),
+        SUM(data_quality = 'bad')
+    FROM energy_readings
+    WHERE energy_readings_timestamp >= range_start AND energy_readings_timestamp < range_end
+    GROUP BY energy_readings_meter_id, DATE_FORMAT(energy_readings_timestamp, '%Y-%m-%d %H:%i:00');
+    
+    -- Часовые агрегаты из минутных
+    INSERT INTO energy_rollup_1h (
+        rollup_meter_id, rollup_bucket_start, readings_count, active_power_count, active_power_sum,
+        active_power_min, active_power_max, active_power_last, last_timestamp,
+        power_factor_count, power_factor_sum, power_factor_min, energy_kwh,
+        good_count, poor_count, bad_count
+    )
+    SELECT 
+        rollup_meter_id,
+        DATE_FORMAT(rollup_bucket_start, '%Y-%m-%d %H:00:00'),
+        SUM(readings_count), SUM(active_power_count), SUM(active_power_sum),
+        MIN(active_power_min), MAX(active_power_max),
+        SUBSTRING_INDEX(GROUP_CONCAT(active_power_last ORDER BY last_timestamp DESC), ',', 1),
+        MAX(last_timestamp),
+        SUM(power_factor_count), SUM(power_factor_sum), MIN(power_factor_min), SUM(energy_kwh),
+        SUM(good_count), SUM(poor_count), SUM(bad_count)
+    FROM energy_rollup_1m
+    WHERE rollup_bucket_start >= range_start AND rollup_bucket_start < range_end
+    GROUP BY rollup_meter_id, DATE_FORMAT(rollup_bucket_start, '%Y-%m-%d %H:00:00');
+    
+    -- Суточные агрегаты из часовых
+    INSERT INTO energy_rollup_1d (
+        rollup_meter_id, rollup_bucket_start, readings_count, active_power_count, active_power_sum,
+        active_power_min, active_power_max, active_power_last, last_timestamp,
+        power_factor_count, power_factor_sum, power_factor_min, energy_kwh,
+        good_count, poor_count, bad_count
+    )
+    SELECT 
+        rollup_meter_id,
+        DATE(rollup_bucket_start),
+        SUM(readings_count), SUM(active_power_count), SUM(active_power_sum),
+        MIN(active_power_min), MAX(active_power_max),
+        SUBSTRING_INDEX(GROUP_CONCAT(active_power_last ORDER BY last_timestamp DESC), ',', 1),
+        MAX(last_timestamp),
+        SUM(power_factor_count), SUM(power_factor_sum), MIN(power_factor_min), SUM(energy_kwh),
+        SUM(good_count), SUM(poor_count), SUM(bad_count)
+    FROM energy_rollup_1h
+    WHERE rollup_bucket_start >= range_start AND rollup_bucket_start < range_end
+    GROUP BY rollup_meter_id, DATE(rollup_bucket_start);
+    
+    COMMIT;
+END //
+
+DELIMITER ;
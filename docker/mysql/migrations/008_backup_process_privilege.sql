@@ -0,0 +1,9 @@
+-- Привилегия PROCESS для резервного копирования (database/backup.py)
+--
+-- Было:  водяной знак показаний и состояний - наибольший ключ AUTO_INCREMENT на момент копии;
+--        строка, получившая меньший ключ в еще не зафиксированной транзакции (пакет показаний,
+--        порция массовой загрузки), фиксировалась позже и пропускалась следующей копией (ключ > since)
+-- Стало: копия ждет завершения транзакций, открытых при фиксации водяных знаков,
+--        по information_schema.INNODB_TRX - для чтения этой таблицы нужна привилегия PROCESS
+
+GRANT PROCESS ON *.* TO 'energy_user'@'%';
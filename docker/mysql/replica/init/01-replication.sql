@@ -0,0 +1,13 @@
+-- Настройка репликации с основного сервера по GTID.
+-- Схема, пользователи и данные приходят с основного сервера, поэтому реплику
+-- нужно подключать к заново инициализированному основному серверу или
+-- предварительно восстановить на ней дамп основного.
+CHANGE REPLICATION SOURCE TO
+    SOURCE_HOST = 'mysql',
+    SOURCE_PORT = 3306,
+    SOURCE_USER = 'root',
+    SOURCE_PASSWORD = 'root_password_123',
+    SOURCE_AUTO_POSITION = 1,
+    GET_SOURCE_PUBLIC_KEY = 1;
+
+START REPLICA;
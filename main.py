@@ -5,13 +5,20 @@ import asyncio
 import logging
 from datetime import datetime
 from nicegui import ui, app
+from fastapi.responses import PlainTextResponse
 from database.db_manager import DatabaseManager
 from data_collection.modbus_client import ModbusDataCollector
+from data_collection.communication_watchdog import CommunicationWatchdog
 from data_processing.processor import DataProcessor
 from analysis.analyzer import EnergyAnalyzer
+from analysis.backtesting import ForecastBacktester
 from web_interface.dashboard import Dashboard
+from web_interface.log_browser import LogBrowser
 from web_interface.reports import ReportsManager
 from web_interface.admin import AdminPanel
+from database.partition_manager import PartitionManager
+from database.purge_job import PurgeJob
+from database.cold_archiver import ColdArchiver
 from config.settings import Settings
 
 # Настройка логирования
@@ -34,8 +41,13 @@ class EnergyMonitoringSystem:
         self.data_processor = DataProcessor(self.db_manager)
         self.analyzer = EnergyAnalyzer(self.db_manager)
         self.dashboard = Dashboard(self.db_manager)
-        self.reports_manager = ReportsManager()
-        self.admin_panel = AdminPanel()
+        self.reports_manager = ReportsManager(self.db_manager)
+        self.partition_manager = PartitionManager(self.db_manager)
+        self.purge_job = PurgeJob(self.db_manager)
+        self.cold_archiver = ColdArchiver(self.db_manager, self.partition_manager)
+        self.forecast_backtester = ForecastBacktester(self.db_manager)
+        self.admin_panel = AdminPanel(self.purge_job)
+        self.communication_watchdog = CommunicationWatchdog(self.db_manager)
         
         # Флаг для остановки сбора данных
         self.running = False
@@ -50,6 +62,9 @@ class EnergyMonitoringSystem:
                 # Сбор данных с устройств
                 raw_data = await self.data_collector.collect_all_data()
                 
+                # Отметка связи с оборудованием (в БД пишется пакетно)
+                self.communication_watchdog.record_readings(raw_data)
+                
                 if raw_data:
                     # Обработка данных
                     processed_data = self.data_processor.process_data(raw_data)
@@ -92,6 +107,7 @@ async def main_page():
         with ui.column():
             ui.button('Дашборд', on_click=lambda: ui.navigate.to('/')).classes('w-full')
             ui.button('Отчеты', on_click=lambda: ui.navigate.to('/reports')).classes('w-full')
+            ui.button('Журнал событий', on_click=lambda: ui.navigate.to('/logs')).classes('w-full')
             ui.button('Администрирование', on_click=lambda: ui.navigate.to('/admin')).classes('w-full')
             ui.separator()
             
@@ -113,21 +129,42 @@ def stop_monitoring():
     energy_system.stop_data_collection()
     ui.notify('Мониторинг остановлен', type='warning')
 
+async def startup():
+    """Запуск фоновых задач обслуживания БД"""
+    asyncio.create_task(energy_system.partition_manager.run_forever())
+    asyncio.create_task(energy_system.purge_job.run_forever())
+    if energy_system.db_manager.cold_storage is not None:
+        asyncio.create_task(energy_system.cold_archiver.run_forever())
+    asyncio.create_task(energy_system.forecast_backtester.run_forever())
+    asyncio.create_task(energy_system.communication_watchdog.run_forever())
+
 @ui.page('/reports')
 async def reports_page():
     """Страница отчетов"""
     ui.page_title('Отчеты')
     await energy_system.reports_manager.render()
 
+@ui.page('/logs')
+async def logs_page():
+    """Страница журнала событий"""
+    ui.page_title('Журнал событий')
+    await LogBrowser(energy_system.db_manager).render()
+
 @ui.page('/admin')
 async def admin_page():
     """Страница администрирования"""
     ui.page_title('Администрирование')
     await energy_system.admin_panel.render()
 
+@app.get('/metrics')
+async def metrics():
+    """Метрики запросов к БД в формате Prometheus"""
+    return PlainTextResponse(energy_system.db_manager.metrics.render_prometheus())
+
 if __name__ in {"__main__", "__mp_main__"}:
     # Инициализация базы данных
     asyncio.run(energy_system.db_manager.initialize())
+    app.on_startup(startup)
     
     # Запуск веб-приложения
     ui.run(
@@ -1,29 +1,22 @@
 #!/bin/bash
 
 # Скрипт резервного копирования базы данных
-
-BACKUP_DIR="./backups"
-DATE=$(date +%Y%m%d_%H%M%S)
-BACKUP_FILE="energy_monitoring_backup_$DATE.sql"
+#
+# Справочники копируются целиком, показания, логи и состояния - только изменения
+# с предыдущей копии (database/backup.py). Раз в BACKUP_FULL_INTERVAL_DAYS дней
+# начинается новая цепочка с полной копии; --full начинает ее принудительно.
+# Восстановление: docker-compose exec energy_app python -m database.backup restore [backup_id]
 
 echo "=== Создание резервной копии базы данных ==="
 
-# Создание директории для бэкапов
-mkdir -p $BACKUP_DIR
-
-# Создание дампа базы данных
-echo "📦 Создание дампа базы данных..."
-docker-compose exec mysql mysqldump -u energy_user -penergy_password_123 energy_monitoring > "$BACKUP_DIR/$BACKUP_FILE"
+echo "📦 Выгрузка изменений..."
+docker-compose exec -T energy_app python -m database.backup create "$@"
 
 if [ $? -eq 0 ]; then
-    echo "✅ Резервная копия создана: $BACKUP_DIR/$BACKUP_FILE"
-    
-    # Сжатие бэкапа
-    gzip "$BACKUP_DIR/$BACKUP_FILE"
-    echo "🗜️  Файл сжат: $BACKUP_DIR/$BACKUP_FILE.gz"
+    echo "✅ Резервная копия создана в ./backups"
     
-    # Удаление старых бэкапов (старше 30 дней)
-    find $BACKUP_DIR -name "*.gz" -mtime +30 -delete
+    # Удаление старых цепочек (остаются BACKUP_KEEP_FULL последних)
+    docker-compose exec -T energy_app python -m database.backup prune
     echo "🧹 Старые бэкапы удалены"
 else
     echo "❌ Ошибка создания резервной копии"
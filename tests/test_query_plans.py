@@ -0,0 +1,189 @@
+"""
+Планы запросов к показаниям (EXPLAIN) и итоги статистики по оборудованию.
+
+Тесты выполняются на тестовой БД со схемой docker/mysql/init/01-init.sql:
+адрес задается переменной TEST_DB_HOST (и TEST_DB_PORT), учетные данные - как у
+приложения (DB_NAME, DB_USER, DB_PASSWORD). Без TEST_DB_HOST тесты пропускаются.
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip('aiomysql')
+
+from config.docker_settings import DockerSettings
+from database.columnar import select_expressions
+from database.db_manager import DatabaseManager
+from database.rollups import ROLLUP_LEVELS
+
+pytestmark = pytest.mark.skipif(not os.getenv('TEST_DB_HOST'), reason='TEST_DB_HOST не задан (нет тестовой MySQL)')
+
+# Индексы energy_readings, по которым допустимо читать показания
+READINGS_KEYS = {'PRIMARY', 'idx_timestamp'}
+
+FILTERS = ['equipment', 'area', 'none']
+
+
+def run_with_manager(test):
+    """Выполнение test(db_manager) с отдельным менеджером БД (без реплики и архива)"""
+    settings = DockerSettings()
+    settings.DATABASE.host = os.environ['TEST_DB_HOST']
+    settings.DATABASE.port = int(os.getenv('TEST_DB_PORT', '3306'))
+    settings.DATABASE.replica_host = ''
+    settings.COLD_STORAGE_PATH = ''
+
+    async def main():
+        db_manager = DatabaseManager(settings)
+        await db_manager.initialize()
+        try:
+            return await test(db_manager)
+        finally:
+            await db_manager.close()
+
+    return asyncio.run(main())
+
+
+async def filter_arguments(db_manager, kind):
+    """Фильтр equipment_id/area_id по оборудованию, у которого есть счетчик"""
+    if kind == 'none':
+        return {}
+
+    async with db_manager.pool.acquire() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute('''
+                SELECT e.equipment_id, e.equipment_area_id
+                FROM meters m INNER JOIN equipment e ON m.meter_equipment_id = e.equipment_id
+                WHERE e.equipment_area_id IS NOT NULL
+                ORDER BY m.meter_id LIMIT 1
+            ''')
+            row = await cursor.fetchone()
+
+    if row is None:
+        pytest.skip('В тестовой БД нет счетчиков оборудования с участком')
+    return {'equipment_id': row[0]} if kind == 'equipment' else {'area_id': row[1]}
+
+
+async def explain(db_manager, sql, params):
+    """Строки EXPLAIN для запроса"""
+    async with db_manager.pool.acquire() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute(f'EXPLAIN {sql}', params)
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in await cursor.fetchall()]
+
+
+def assert_readings_indexed(plan):
+    """Показания читаются по первичному ключу или idx_timestamp, без полного просмотра"""
+    readings = [row for row in plan if row['table'] == 'er']
+    assert readings, plan
+    for row in readings:
+        assert row['type'] != 'ALL', row
+        assert row['key'] in READINGS_KEYS, row
+
+
+def period():
+    """Последний час: диапазон по времени заведомо избирательный"""
+    end = datetime.now()
+    return end - timedelta(hours=1), end
+
+
+@pytest.mark.parametrize('kind', FILTERS)
+def test_period_query_plan(kind):
+    async def test(db_manager):
+        filters = await filter_arguments(db_manager, kind)
+        sql, params = await db_manager._readings_period_query(*period(), **filters)
+        assert_readings_indexed(await explain(db_manager, sql, params))
+
+    run_with_manager(test)
+
+
+@pytest.mark.parametrize('kind', FILTERS)
+def test_page_query_plan(kind):
+    async def test(db_manager):
+        filters = await filter_arguments(db_manager, kind)
+        start, end = period()
+        sql, params = await db_manager._readings_period_query(start, end, after=(start, 0), limit=5000, **filters)
+        assert_readings_indexed(await explain(db_manager, sql, params))
+
+    run_with_manager(test)
+
+
+@pytest.mark.parametrize('kind', FILTERS)
+def test_columnar_query_plan(kind):
+    async def test(db_manager):
+        filters = await filter_arguments(db_manager, kind)
+        sql, params = await db_manager._readings_period_query(
+            *period(), select_columns=select_expressions(['timestamp', 'meter_id', 'active_power']), **filters
+        )
+        assert_readings_indexed(await explain(db_manager, sql, params))
+
+    run_with_manager(test)
+
+
+@pytest.mark.parametrize('kind', FILTERS)
+def test_statistics_query_plan(kind):
+    async def test(db_manager):
+        filters = await filter_arguments(db_manager, kind)
+        start, end = period()
+        sql, params = await db_manager._energy_statistics_query(start_date=start, end_date=end, **filters)
+        assert_readings_indexed(await explain(db_manager, sql, params))
+
+    run_with_manager(test)
+
+
+def test_statistics_energy_is_summed_per_meter():
+    """Энергия интервалов считается по каждому счетчику, энергия оборудования - их сумма.
+
+    Показания двух счетчиков одного оборудования чередуются через 5 минут:
+    счетчик A - 12 кВт (4 кВт·ч за 20 минут), счетчик B - 24 кВт (8 кВт·ч).
+    Трапеции по общей последовательности показаний оборудования дали бы 7.5 кВт·ч.
+    """
+    start = datetime(2001, 1, 1)
+
+    async def test(db_manager):
+        async with db_manager.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    "INSERT INTO equipment (equipment_name, equipment_nominal_power_kw) VALUES ('test_per_meter_energy', 100)"
+                )
+                equipment_id = cursor.lastrowid
+                meter_ids = []
+                for serial in ('test-a', 'test-b'):
+                    await cursor.execute(
+                        'INSERT INTO meters (meter_equipment_id, meter_serial_number) VALUES (%s, %s)',
+                        (equipment_id, serial)
+                    )
+                    meter_ids.append(cursor.lastrowid)
+            await conn.commit()
+
+        try:
+            readings = []
+            for meter_id, power, offset in ((meter_ids[0], 12.0, 0), (meter_ids[1], 24.0, 5)):
+                readings += [
+                    {'meter_id': meter_id, 'timestamp': start + timedelta(minutes=offset + step), 'active_power': power}
+                    for step in (0, 10, 20)
+                ]
+            readings.sort(key=lambda record: record['timestamp'])
+            await db_manager.save_energy_readings(readings)
+
+            statistics = await db_manager.get_energy_statistics(
+                equipment_id=equipment_id, start_date=start, end_date=start + timedelta(hours=1)
+            )
+            assert len(statistics) == 1
+            assert statistics[0]['total_measurements'] == 6
+            assert float(statistics[0]['total_energy_kwh']) == pytest.approx(12.0)
+        finally:
+            async with db_manager.pool.acquire() as conn:
+                async with conn.cursor() as cursor:
+                    placeholders = ', '.join(['%s'] * len(meter_ids))
+                    await cursor.execute(
+                        f'DELETE FROM energy_readings WHERE energy_readings_meter_id IN ({placeholders})', meter_ids
+                    )
+                    for _, table, _ in ROLLUP_LEVELS:
+                        await cursor.execute(f'DELETE FROM {table} WHERE rollup_meter_id IN ({placeholders})', meter_ids)
+                    await cursor.execute('DELETE FROM equipment WHERE equipment_id = %s', (equipment_id,))
+                await conn.commit()
+
+    run_with_manager(test)
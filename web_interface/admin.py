@@ -8,8 +8,10 @@ import logging
 logger = logging.getLogger(__name__)
 
 class AdminPanel:
-    def __init__(self):
+    def __init__(self, purge_job=None):
         self.db_manager = None  # Будет инициализирован в main.py
+        self.purge_job = purge_job
+        self.purge_progress_container = None
     
     async def render(self):
         """Отрисовка панели администрирования"""
@@ -223,6 +225,11 @@ class AdminPanel:
                     ui.button('Сохранить', on_click=lambda: self.save_system_setting('retention_period', retention_period.value)).classes('bg-blue-500')
                 
                 ui.button('Очистить старые данные', on_click=self.cleanup_old_data).classes('bg-red-500 mt-4')
+                
+                # Прогресс фоновой очистки
+                self.purge_progress_container = ui.column().classes('w-full gap-1 mt-2')
+                await self.update_purge_progress()
+                ui.timer(5.0, self.update_purge_progress)
             
             # Системная информация
             with ui.card().classes('w-full'):
@@ -293,8 +300,40 @@ class AdminPanel:
     
     def cleanup_old_data(self):
         """Очистка старых данных"""
-        ui.notify('Очистка старых данных запущена', type='positive')
-        logger.info("Запущена очистка старых данных")
+        if self.purge_job is None:
+            ui.notify('Фоновая очистка недоступна', type='negative')
+            return
+        
+        if self.purge_job.start():
+            ui.notify('Очистка старых данных запущена', type='positive')
+            logger.info("Запущена очистка старых данных")
+        else:
+            ui.notify('Очистка старых данных уже выполняется', type='info')
+    
+    async def update_purge_progress(self):
+        """Обновление прогресса фоновой очистки"""
+        if self.purge_job is None or self.purge_progress_container is None:
+            return
+        
+        try:
+            progress = await self.purge_job.get_progress()
+        except Exception as e:
+            logger.error(f"Ошибка получения прогресса очистки: {e}")
+            return
+        
+        status_names = {'running': 'выполняется', 'completed': 'завершена', 'failed': 'ошибка'}
+        self.purge_progress_container.clear()
+        with self.purge_progress_container:
+            if not progress:
+                ui.label('Очистка еще не выполнялась').classes('text-sm text-gray-600')
+            for row in progress:
+                text = (f"{row['purge_table']}: {status_names.get(row['purge_status'], row['purge_status'])}, "
+                        f"удалено {row['purge_rows_deleted']} строк старше {row['purge_cutoff']:%Y-%m-%d}")
+                if row['purge_finished_at']:
+                    text += f", завершена {row['purge_finished_at']:%Y-%m-%d %H:%M}"
+                ui.label(text).classes('text-sm')
+                if row['purge_error']:
+                    ui.label(row['purge_error']).classes('text-xs text-red-600')
     
     def restart_system(self):
         """Перезапуск системы"""
@@ -11,6 +11,9 @@ from typing import Dict, Any, List
 
 logger = logging.getLogger(__name__)
 
+# Порядок отображения уведомлений по серьезности
+SEVERITY_ORDER = {'critical': 3, 'high': 2, 'medium': 1, 'low': 0}
+
 class Dashboard:
     def __init__(self, db_manager):
         self.db_manager = db_manager
@@ -20,6 +23,11 @@ class Dashboard:
         self.current_time_label = None
         self.alerts_container = None
         self.stats_container = None
+        # Копия активных уведомлений, обновляемая по журналу изменений
+        self.active_alerts: Dict[int, Dict[str, Any]] = {}
+        self.alert_seq = 0
+        # Списки уведомлений всех открытых страниц: изменения показываются всем клиентам
+        self.alert_views: List[ui.column] = []
     
     def start_time_update(self):
         """Запуск обновления времени каждую секунду"""
@@ -124,6 +132,7 @@ class Dashboard:
                 ui.button('Обновить', on_click=self.refresh_alerts).classes('bg-blue-500 text-xs')
             
             self.alerts_container = ui.column().classes('w-full gap-2 max-h-64 overflow-y-auto')
+            self.register_alert_view(self.alerts_container)
             
             # Загрузка активных уведомлений
             await self.load_active_alerts()
@@ -136,16 +145,21 @@ class Dashboard:
             with ui.column().classes('w-full gap-2'):
                 ui.button('Экспорт отчета', on_click=self.export_quick_report).classes('w-full bg-green-500')
                 ui.button('Сброс уведомлений', on_click=self.reset_alerts).classes('w-full bg-orange-500')
+                ui.button('Разрешить уведомления старше суток', on_click=self.resolve_old_alerts).classes('w-full bg-gray-500')
                 ui.button('Обновить данные', on_click=self.refresh_all_data).classes('w-full bg-blue-500')
     
     async def load_historical_data(self):
         """Загрузка исторических данных"""
         try:
-            # Получение данных за последние 7 дней
-            end_time = datetime.now()
+            # Получение данных за последние 7 дней; граница выровнена по минуте,
+            # чтобы одновременно открытые страницы попадали в одну запись кэша запросов
+            end_time = datetime.now().replace(second=0, microsecond=0) + timedelta(minutes=1)
             start_time = end_time - timedelta(days=7)
             
-            historical_data = await self.db_manager.get_energy_readings_by_period(start_time, end_time)
+            # Суточные агрегаты вместо всех сырых показаний за неделю
+            historical_data = await self.db_manager.get_energy_aggregates(
+                start_time, end_time, resolution_seconds=86400, group_by=None
+            )
             
             if historical_data:
                 await self.update_historical_chart(historical_data)
@@ -155,11 +169,40 @@ class Dashboard:
         except Exception as e:
             logger.error(f"Ошибка загрузки исторических данных: {e}")
     
+    async def sync_active_alerts(self) -> List[Dict[str, Any]]:
+        """Применение изменений активных уведомлений с последнего запроса"""
+        changes = await self.db_manager.get_alert_changes(self.alert_seq)
+        
+        if changes['reset']:
+            self.active_alerts = {}
+        for log_id in changes['removed']:
+            self.active_alerts.pop(log_id, None)
+        for alert in changes['alerts']:
+            self.active_alerts[alert['log_id']] = alert
+        self.alert_seq = changes['seq']
+        
+        return sorted(
+            self.active_alerts.values(),
+            key=lambda a: (SEVERITY_ORDER.get(a['severity'], 0), a['log_timestamp']),
+            reverse=True
+        )
+    
+    def register_alert_view(self, container: ui.column):
+        """Регистрация списка уведомлений страницы до отключения ее клиента"""
+        self.alert_views.append(container)
+        
+        def unregister():
+            if container in self.alert_views:
+                self.alert_views.remove(container)
+        
+        container.client.on_disconnect(unregister)
+    
     async def load_active_alerts(self):
-        """Загрузка активных уведомлений"""
+        """Загрузка активных уведомлений и отображение на всех открытых страницах"""
         try:
-            active_alerts = await self.db_manager.get_active_logs(limit=10)
-            await self.update_alerts_display(active_alerts)
+            active_alerts = (await self.sync_active_alerts())[:10]
+            for container in list(self.alert_views):
+                await self.update_alerts_display(active_alerts, container)
         
         except Exception as e:
             logger.error(f"Ошибка загрузки уведомлений: {e}")
@@ -207,27 +250,10 @@ class Dashboard:
     async def update_historical_chart(self, historical_data):
         """Обновление исторического графика"""
         try:
-            # Группировка данных по дням
-            daily_data = {}
-            
-            for record in historical_data:
-                date = record['energy_readings_timestamp'].date()
-                if date not in daily_data:
-                    daily_data[date] = []
-                daily_data[date].append(record['energy_readings_active_power_kw'] or 0)
-            
-            # Расчет средних значений по дням
-            dates = []
-            avg_powers = []
-            max_powers = []
-            min_powers = []
-            
-            for date in sorted(daily_data.keys()):
-                powers = daily_data[date]
-                dates.append(date)
-                avg_powers.append(sum(powers) / len(powers))
-                max_powers.append(max(powers))
-                min_powers.append(min(powers))
+            dates = [record['bucket_start'].date() for record in historical_data]
+            avg_powers = [record['avg_power_kw'] or 0 for record in historical_data]
+            max_powers = [record['max_power_kw'] or 0 for record in historical_data]
+            min_powers = [record['min_power_kw'] or 0 for record in historical_data]
             
             fig = go.Figure()
             
@@ -455,7 +481,7 @@ class Dashboard:
                 ui.label(f"Последнее обновление: {datetime.now().strftime('%H:%M:%S')}").classes('text-xs text-gray-600')
                 
                 # Активные уведомления
-                active_alerts = await self.db_manager.get_active_logs(limit=5)
+                active_alerts = (await self.sync_active_alerts())[:5]
                 critical_count = len([alert for alert in active_alerts if alert['severity'] == 'critical'])
                 high_count = len([alert for alert in active_alerts if alert['severity'] == 'high'])
                 
@@ -471,11 +497,12 @@ class Dashboard:
                 logger.error(f"Ошибка обновления статистики: {e}")
                 ui.label('Ошибка загрузки статистики').classes('text-sm text-red-600')
     
-    async def update_alerts_display(self, alerts):
+    async def update_alerts_display(self, alerts, container: ui.column = None):
         """Обновление отображения уведомлений"""
-        self.alerts_container.clear()
+        container = container or self.alerts_container
+        container.clear()
         
-        with self.alerts_container:
+        with container:
             if not alerts:
                 ui.label('Нет активных уведомлений').classes('text-green-600 text-sm')
                 return
@@ -544,18 +571,26 @@ class Dashboard:
     async def reset_alerts(self):
         """Сброс всех уведомлений"""
         try:
-            # Подтверждение всех новых уведомлений
-            active_alerts = await self.db_manager.get_active_logs()
-            for alert in active_alerts:
-                if alert['log_status'] == 'new':
-                    await self.db_manager.acknowledge_log(alert['log_id'], 1)
+            # Подтверждение всех новых уведомлений одним запросом
+            acknowledged = await self.db_manager.acknowledge_logs(user_id=1)  # Временно используем ID=1
             
-            ui.notify('Все уведомления подтверждены', type='positive')
+            ui.notify(f'Подтверждено уведомлений: {acknowledged}', type='positive')
             await self.load_active_alerts()
         except Exception as e:
             logger.error(f"Ошибка сброса уведомлений: {e}")
             ui.notify('Ошибка сброса уведомлений', type='negative')
     
+    async def resolve_old_alerts(self):
+        """Разрешение уведомлений старше суток"""
+        try:
+            resolved = await self.db_manager.resolve_logs(older_than=datetime.now() - timedelta(days=1))
+            
+            ui.notify(f'Разрешено уведомлений: {resolved}', type='positive')
+            await self.load_active_alerts()
+        except Exception as e:
+            logger.error(f"Ошибка разрешения уведомлений: {e}")
+            ui.notify('Ошибка разрешения уведомлений', type='negative')
+    
     async def refresh_all_data(self):
         """Обновление всех данных"""
         try:
@@ -0,0 +1,122 @@
+"""
+Журнал событий: просмотр таблицы logs с пагинацией по ключу и виртуальной прокруткой
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+from nicegui import ui
+import logging
+
+logger = logging.getLogger(__name__)
+
+LOG_TYPES = ['info', 'warning', 'error', 'critical', 'threshold_exceeded', 'communication_error', 'state_change']
+LOG_STATUSES = ['new', 'acknowledged', 'resolved', 'ignored']
+SEVERITIES = ['low', 'medium', 'high', 'critical']
+
+# Строк в одной странице и запас до конца таблицы, при котором подгружается следующая
+PAGE_SIZE = 200
+PREFETCH_ROWS = 50
+
+
+class LogBrowser:
+    """Просмотр журнала событий одной страницы браузера.
+
+    Строки подгружаются страницами по ключу (log_timestamp, log_id) по мере
+    прокрутки таблицы, поэтому глубина просмотра не влияет на скорость запроса.
+    """
+
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+        self.table = None
+        self.status_label = None
+        self.filters: Dict[str, Any] = {}
+        self.next_after: Optional[Tuple[datetime, int]] = None
+        self.loading = False
+
+    async def render(self):
+        """Отрисовка журнала событий"""
+        with ui.column().classes('w-full gap-4'):
+            ui.label('Журнал событий').classes('text-2xl font-bold')
+
+            equipment = await self.db_manager.get_equipment_list()
+            equipment_options = {e['equipment_id']: e['equipment_name'] for e in equipment}
+
+            with ui.card().classes('w-full'):
+                with ui.row().classes('w-full gap-4 items-end'):
+                    start_date = ui.input('Начало', value=(datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')).props('type=date')
+                    end_date = ui.input('Окончание', value=datetime.now().strftime('%Y-%m-%d')).props('type=date')
+                    equipment_select = ui.select(equipment_options, label='Оборудование', clearable=True).classes('w-48')
+                    type_select = ui.select(LOG_TYPES, label='Тип', clearable=True).classes('w-40')
+                    status_select = ui.select(LOG_STATUSES, label='Статус', clearable=True).classes('w-40')
+                    severity_select = ui.select(SEVERITIES, label='Важность', clearable=True).classes('w-32')
+                    ui.button('Показать', on_click=lambda: self.apply_filters(
+                        start_date.value, end_date.value, equipment_select.value,
+                        type_select.value, status_select.value, severity_select.value
+                    )).classes('bg-blue-500')
+
+            columns = [
+                {'name': 'log_timestamp', 'label': 'Время', 'field': 'log_timestamp', 'align': 'left'},
+                {'name': 'equipment_name', 'label': 'Оборудование', 'field': 'equipment_name', 'align': 'left'},
+                {'name': 'log_type', 'label': 'Тип', 'field': 'log_type', 'align': 'left'},
+                {'name': 'severity', 'label': 'Важность', 'field': 'severity', 'align': 'left'},
+                {'name': 'log_status', 'label': 'Статус', 'field': 'log_status', 'align': 'left'},
+                {'name': 'log_message', 'label': 'Сообщение', 'field': 'log_message', 'align': 'left'},
+            ]
+            self.table = ui.table(columns=columns, rows=[], row_key='log_id').classes('w-full').style('height: 70vh')
+            self.table.props('virtual-scroll :virtual-scroll-item-size="32" :rows-per-page-options="[0]" hide-bottom')
+            self.table.on('virtual-scroll', self.on_scroll)
+
+            self.status_label = ui.label('').classes('text-xs text-gray-600')
+
+            await self.apply_filters(start_date.value, end_date.value, None, None, None, None)
+
+    async def apply_filters(self, start_date: str, end_date: str, equipment_id: Optional[int],
+                            log_type: Optional[str], log_status: Optional[str], severity: Optional[str]):
+        """Новый просмотр с первой страницы"""
+        try:
+            start_time = datetime.strptime(start_date, '%Y-%m-%d') if start_date else None
+            end_time = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1) if end_date else None
+        except ValueError:
+            ui.notify('Неверный формат даты', type='negative')
+            return
+
+        self.filters = {
+            'start_time': start_time,
+            'end_time': end_time,
+            'equipment_id': equipment_id,
+            'log_type': log_type,
+            'log_status': log_status,
+            'severity': severity,
+        }
+        self.next_after = None
+        self.table.rows = []
+        await self.load_next_page(first=True)
+
+    async def on_scroll(self, event):
+        """Подгрузка следующей страницы при приближении к концу таблицы"""
+        if event.args.get('to', 0) >= len(self.table.rows) - PREFETCH_ROWS:
+            await self.load_next_page()
+
+    async def load_next_page(self, first: bool = False):
+        """Загрузка страницы после последней показанной строки"""
+        if self.loading or (self.next_after is None and not first):
+            return
+
+        self.loading = True
+        try:
+            page = await self.db_manager.get_logs_page(after=self.next_after, limit=PAGE_SIZE, **self.filters)
+            self.next_after = page['next_after']
+            self.table.rows.extend(
+                {**{key: row[key] for key in ('log_id', 'log_type', 'severity', 'log_status', 'log_message')},
+                 'equipment_name': row['equipment_name'] or 'Система',
+                 'log_timestamp': row['log_timestamp'].strftime('%Y-%m-%d %H:%M:%S')}
+                for row in page['rows']
+            )
+            self.table.update()
+
+            more = ', прокрутите для продолжения' if self.next_after else ''
+            self.status_label.text = f'Показано записей: {len(self.table.rows)}{more}'
+        except Exception as e:
+            logger.error(f"Ошибка загрузки журнала событий: {e}")
+            ui.notify('Ошибка загрузки журнала событий', type='negative')
+        finally:
+            self.loading = False
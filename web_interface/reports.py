@@ -13,12 +13,14 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Tabl
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib import colors
 import logging
+from analysis.tariffs import TariffCalculator, total_costs
 
 logger = logging.getLogger(__name__)
 
 class ReportsManager:
-    def __init__(self):
-        self.db_manager = None  # Будет инициализирован в main.py
+    def __init__(self, db_manager=None):
+        self.db_manager = db_manager
+        self.tariffs = TariffCalculator(db_manager) if db_manager is not None else None
     
     async def render(self):
         """Отрисовка интерфейса отчетов"""
@@ -62,7 +64,7 @@ class ReportsManager:
                     with ui.column().classes('w-1/2'):
                         ui.label('Тип отчета')
                         report_type = ui.select(
-                            ['Сводный', 'Детальный', 'Анализ эффективности', 'Нарушения'],
+                            ['Сводный', 'Детальный', 'Анализ эффективности', 'Нарушения', 'Стоимость по тарифу'],
                             value='Сводный'
                         ).classes('w-full')
                 
@@ -121,6 +123,8 @@ class ReportsManager:
                     await self.render_efficiency_report(data)
                 elif report_type == 'Нарушения':
                     await self.render_violations_report(data)
+                elif report_type == 'Стоимость по тарифу':
+                    await self.render_tariff_report(start_date, end_date, devices)
     
     async def get_report_data(self, start_date, end_date, devices):
         """Получение данных для отчета"""
@@ -359,6 +363,99 @@ class ReportsManager:
                 
                 ui.table(columns=columns, rows=rows).classes('w-full')
     
+    async def get_selected_equipment(self, devices):
+        """Выбранное оборудование: идентификатор -> название (None - весь цех: выбраны все устройства или ни одно не найдено)"""
+        names = devices if isinstance(devices, list) else [devices]
+        if not names or 'Все устройства' in names:
+            return None
+        
+        equipment = await self.db_manager.get_equipment_list()
+        selected = {item['equipment_id']: item['equipment_name'] for item in equipment if item['equipment_name'] in names}
+        return selected or None
+    
+    async def get_tariff_costs(self, start_date, end_date, devices=None):
+        """Стоимость потребления по тарифу за даты отчета (включительно) для выбранного оборудования.
+        
+        Одна единица оборудования считается только по своим счетчикам; для нескольких
+        берется расчет по цеху (мощность - в часы максимума цеха) и отбираются их счетчики.
+        """
+        start = datetime.strptime(str(start_date)[:10], '%Y-%m-%d')
+        end = datetime.strptime(str(end_date)[:10], '%Y-%m-%d') + timedelta(days=1)
+        
+        selected = await self.get_selected_equipment(devices)
+        if selected is not None and len(selected) == 1:
+            costs = await self.tariffs.calculate(start, end, equipment_id=next(iter(selected)))
+        else:
+            costs = await self.tariffs.calculate(start, end)
+            if selected is not None:
+                costs['meters'] = [meter for meter in costs['meters'] if meter['equipment_id'] in selected]
+                costs['total'] = total_costs(costs['meters'], costs['zones'])
+        
+        costs['scope'] = 'Весь цех' if selected is None else ', '.join(sorted(selected.values()))
+        return costs
+    
+    async def render_tariff_report(self, start_date, end_date, devices=None):
+        """Отрисовка отчета о стоимости по зонам тарифа"""
+        if self.tariffs is None:
+            ui.label('Отчет недоступен: нет подключения к базе данных').classes('text-sm text-red-600')
+            return
+        
+        try:
+            costs = await self.get_tariff_costs(start_date, end_date, devices)
+        except Exception as e:
+            logger.error(f"Ошибка расчета стоимости по тарифу: {e}")
+            ui.label('Ошибка расчета стоимости по тарифу').classes('text-sm text-red-600')
+            return
+        
+        total = costs['total']
+        with ui.column().classes('w-full gap-4'):
+            ui.label(f"Тариф: {costs['tariff_name']}").classes('text-lg font-bold')
+            ui.label(f"Оборудование: {costs['scope']}").classes('text-sm text-gray-600')
+            
+            with ui.row().classes('w-full gap-4'):
+                with ui.card().classes('w-1/4 text-center'):
+                    ui.label('Потребление').classes('text-sm text-gray-600')
+                    ui.label(f"{total['energy_kwh']:,.0f} кВт·ч").classes('text-2xl font-bold text-blue-600')
+                
+                with ui.card().classes('w-1/4 text-center'):
+                    ui.label('Стоимость энергии').classes('text-sm text-gray-600')
+                    ui.label(f"{total['energy_cost']:,.2f} руб").classes('text-2xl font-bold text-green-600')
+                
+                with ui.card().classes('w-1/4 text-center'):
+                    ui.label('Мощность').classes('text-sm text-gray-600')
+                    ui.label(f"{total['demand_kw']:,.1f} кВт").classes('text-2xl font-bold text-orange-600')
+                    ui.label(f"{total['demand_cost']:,.2f} руб").classes('text-sm text-gray-600')
+                
+                with ui.card().classes('w-1/4 text-center'):
+                    ui.label('Итого').classes('text-sm text-gray-600')
+                    ui.label(f"{total['total_cost']:,.2f} руб").classes('text-2xl font-bold text-red-600')
+            
+            # Стоимость по оборудованию
+            with ui.card().classes('w-full'):
+                ui.label('Стоимость по оборудованию').classes('text-lg font-bold mb-4')
+                
+                columns = [{'name': 'equipment_name', 'label': 'Оборудование', 'field': 'equipment_name', 'align': 'left'}]
+                columns += [{'name': zone, 'label': f'{zone}, кВт·ч', 'field': zone} for zone in costs['zones']]
+                columns += [
+                    {'name': 'energy_cost', 'label': 'Энергия, руб', 'field': 'energy_cost'},
+                    {'name': 'demand_kw', 'label': 'Мощность, кВт', 'field': 'demand_kw'},
+                    {'name': 'total_cost', 'label': 'Итого, руб', 'field': 'total_cost'},
+                ]
+                
+                rows = [
+                    {
+                        'meter_id': meter['meter_id'],
+                        'equipment_name': meter['equipment_name'] or f"Счетчик {meter['meter_id']}",
+                        **{zone: f"{energy:.1f}" for zone, energy in meter['energy_by_zone'].items()},
+                        'energy_cost': f"{meter['energy_cost']:.2f}",
+                        'demand_kw': f"{meter['demand_kw']:.1f}",
+                        'total_cost': f"{meter['total_cost']:.2f}"
+                    }
+                    for meter in sorted(costs['meters'], key=lambda meter: -meter['total_cost'])
+                ]
+                
+                ui.table(columns=columns, rows=rows, row_key='meter_id').classes('w-full')
+    
     async def export_pdf(self, period, start_date, end_date, devices, report_type):
         """Экспорт отчета в PDF"""
         try:
@@ -462,6 +559,24 @@ class ReportsManager:
                     
                     df_violations = pd.DataFrame(violations_data)
                     df_violations.to_excel(writer, sheet_name='Нарушения', index=False)
+                
+                # Лист стоимости по зонам тарифа
+                if self.tariffs is not None:
+                    costs = await self.get_tariff_costs(start_date, end_date, devices)
+                    df_costs = pd.DataFrame([
+                        {
+                            'Счетчик': meter['meter_id'],
+                            'Оборудование': meter['equipment_name'],
+                            'Участок': meter['area_name'],
+                            **{f'{zone}, кВт·ч': energy for zone, energy in meter['energy_by_zone'].items()},
+                            'Стоимость энергии, руб': meter['energy_cost'],
+                            'Мощность, кВт': meter['demand_kw'],
+                            'Стоимость мощности, руб': meter['demand_cost'],
+                            'Итого, руб': meter['total_cost']
+                        }
+                        for meter in costs['meters']
+                    ])
+                    df_costs.to_excel(writer, sheet_name='Стоимость по тарифу', index=False)
             
             # Скачивание файла
             buffer.seek(0)